@@ -0,0 +1,101 @@
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+# Resultado da admissão de uma leitura (e contadores por transporte)
+ADMITTED = "admitted"
+RATE_LIMITED = "rate_limited"
+QUEUE_FULL = "queue_full"
+LOAD_SHED = "load_shed"
+# Recusas antes da admissão: frame acima do limite ou mensagem que não é protobuf válido
+FRAME_TOO_LARGE = "frame_too_large"
+MALFORMED = "malformed"
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "last_refill")
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.last_refill = now
+
+
+# Controle de admissão comum a todos os caminhos de ingestão. Cada leitura passa
+# por um token bucket da sua origem (sensor_id ou IP) e entra numa fila limitada
+# entre os receptores e o store. Quem recebe decide a política ao ser recusado:
+# descartar (stream de telemetria), devolver com atraso (RabbitMQ) ou responder
+# com retry-after (TCP).
+# A fila é dividida em shards por origem, um worker de store por shard: leituras
+# do mesmo sensor são gravadas sempre pela mesma thread, na ordem de chegada.
+class AdmissionController:
+    def __init__(self, queue_size=10000, rate_per_source=5.0, burst=20, max_sources=100000,
+                 queue_retry_after=1.0, shards=1):
+        shard_size = -(-queue_size // shards) if queue_size else 0
+        self.queues = [queue.Queue(maxsize=shard_size) for _ in range(shards)]
+        self.rate_per_source = rate_per_source
+        self.burst = burst
+        self.max_sources = max_sources
+        self.queue_retry_after = queue_retry_after
+
+        # Buckets em ordem de uso: ao passar de max_sources sai a origem mais antiga
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: defaultdict(int))
+
+    def count(self, protocol, verdict):
+        with self.lock:
+            self.counters[protocol][verdict] += 1
+
+    def _take_token(self, source, now):
+        # Retorna 0 se a origem tem crédito, senão quantos segundos faltam para o próximo token
+        if not self.rate_per_source:
+            return 0
+        with self.lock:
+            bucket = self.buckets.get(source)
+            if bucket is None:
+                bucket = self.buckets[source] = TokenBucket(self.burst, now)
+                if len(self.buckets) > self.max_sources:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(source)
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.last_refill) * self.rate_per_source)
+                bucket.last_refill = now
+
+            if bucket.tokens < 1:
+                return (1 - bucket.tokens) / self.rate_per_source
+            bucket.tokens -= 1
+            return 0
+
+    def shard(self, source):
+        return self.queues[hash(source) % len(self.queues)]
+
+    def admit(self, item, source, protocol, block_timeout=0):
+        retry_after = self._take_token(source, time.monotonic())
+        if retry_after:
+            self.count(protocol, RATE_LIMITED)
+            return RATE_LIMITED, retry_after
+
+        try:
+            # block_timeout > 0: o receptor espera por espaço (backpressure) antes de desistir
+            self.shard(source).put(item, block=block_timeout > 0, timeout=block_timeout or None)
+        except queue.Full:
+            self.count(protocol, QUEUE_FULL)
+            return QUEUE_FULL, self.queue_retry_after
+
+        self.count(protocol, ADMITTED)
+        return ADMITTED, 0
+
+    def stats(self):
+        with self.lock:
+            counters = {protocol: dict(verdicts) for protocol, verdicts in self.counters.items()}
+            sources = len(self.buckets)
+        return {
+            "queue_depth": sum(q.qsize() for q in self.queues),
+            "queue_capacity": sum(q.maxsize for q in self.queues),
+            "queue_shards": len(self.queues),
+            "sources": sources,
+            "rate_per_source": self.rate_per_source,
+            "burst": self.burst,
+            "counters": counters,
+        }
@@ -1,13 +1,20 @@
 import asyncio
+import os
+import tempfile
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from google.protobuf.json_format import MessageToDict
 from fastapi.middleware.cors import CORSMiddleware
 
-from gateway import Gateway
+from gateway import Gateway, TRANSPORTS
+from command_queue import PRIORITY_HIGH, PRIORITY_NORMAL
+from rules import Rule
+from admission import LOAD_SHED
+from semaphore_scheduler import SemaphoreGroupPlan
 
 app = FastAPI(
     title="Gateway API",
@@ -23,30 +30,114 @@ app.add_middleware(
     allow_headers=["*"],  
 )
 
-gateway = Gateway()
+# GATEWAY_WORKERS > 0 separa a ingestão em processos que gravam num store em memória compartilhada
+GATEWAY_WORKERS = int(os.environ.get("GATEWAY_WORKERS", "0"))
+# GATEWAY_AIO=0 volta a despachar comandos com stubs gRPC bloqueantes em threads
+GATEWAY_AIO = os.environ.get("GATEWAY_AIO", "1") != "0"
+# GATEWAY_TRANSPORTS=tcp,telemetry sobe só os transportes listados (padrão: todos)
+GATEWAY_TRANSPORTS = [t for t in os.environ.get("GATEWAY_TRANSPORTS", ",".join(TRANSPORTS)).split(",") if t]
+if GATEWAY_WORKERS > 0:
+    from multiprocess_gateway import MultiProcessGateway
+    gateway = MultiProcessGateway(workers=GATEWAY_WORKERS, aio_grpc=GATEWAY_AIO, transports=GATEWAY_TRANSPORTS)
+else:
+    gateway = Gateway(aio_grpc=GATEWAY_AIO, transports=GATEWAY_TRANSPORTS)
+
+COMMAND_TIMEOUT = 10
+# Requisições simultâneas acima do limite recebem 503 com Retry-After
+API_MAX_INFLIGHT = int(os.environ.get("API_MAX_INFLIGHT", "64"))
+API_RETRY_AFTER = 1
+# Continuam respondendo mesmo com a API saturada, para acompanhar a sobrecarga
+SHED_EXEMPT_PATHS = {"/ingest/stats"}
+api_inflight = 0
+EXPORT_BLOCK_SIZE = 1 << 16
 
 def proto_to_dict(proto_message):
     return MessageToDict(proto_message, preserving_proto_field_name=True)
 
+# Resultado de wait_command quando o comando segue na fila depois do timeout
+QUEUED = object()
+
+async def wait_command(future, timeout=COMMAND_TIMEOUT, on_timeout=None):
+    try:
+        # shield: o timeout da requisição não cancela o comando que já está na fila
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=timeout)
+    except asyncio.TimeoutError:
+        return on_timeout
+
 class CommandPayload(BaseModel):
     command: str
     params: Dict[str, Any] = None
+    priority: int = PRIORITY_NORMAL
+
+class RulePayload(BaseModel):
+    op: Literal[">", ">=", "<", "<=", "==", "!="]
+    threshold: float
+    target_device: str
+    command: str
+    sensor_type: Optional[str] = None
+    location: Optional[str] = None
+    sensor_id: Optional[str] = None
+    duration: float = 0
+    params: Optional[Dict[str, Any]] = None
+    name: Optional[str] = None
+
+class SemaphorePlanPayload(BaseModel):
+    group: str
+    devices: List[str]
+    verde: float
+    vermelho: float
+    amarelo: float = 3
+    # Sem offsets explícitos: offset[i] = i * travel_time (onda verde na ordem de devices)
+    offsets: Optional[List[float]] = None
+    travel_time: float = 0
+    epoch: Optional[float] = None
+
+# Middleware ASGI puro: a vaga só é liberada quando a resposta termina de ser
+# enviada, inclusive o corpo de um StreamingResponse (ex.: /history/export)
+class ShedLoadMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global api_inflight
+        if scope["type"] != "http" or scope["path"] in SHED_EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+        if api_inflight >= API_MAX_INFLIGHT:
+            gateway.admission.count("API", LOAD_SHED)
+            response = JSONResponse(status_code=503, content={"detail": "API sobrecarregada, tente novamente"},
+                                    headers={"Retry-After": str(API_RETRY_AFTER)})
+            return await response(scope, receive, send)
+        api_inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            api_inflight -= 1
+
+app.add_middleware(ShedLoadMiddleware)
 
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     gateway.start()
+    if gateway.aio_grpc:
+        gateway.start_aio()
     print("✅ Serviços de do Gateway iniciara,.")
 
+@app.on_event("shutdown")
+def shutdown_event():
+    gateway.stop()
+
 @app.get("/devices", summary="Listar todos os dispositivos")
-def list_devices():
-    all_sensors = gateway.get_sensor_status()
+def list_devices(status: Optional[Literal["online", "offline"]] = None):
+    if status:
+        all_sensors = gateway.get_sensor_status_by_liveness(status)
+    else:
+        all_sensors = gateway.get_sensor_status()
     return [proto_to_dict(reading) for reading in all_sensors.values()]
 
 @app.get("/locations/{location_name}/devices", summary="Listar dispositivos por localização")
 def stream_location_data(location_name: str):
-    all_sensors = gateway.get_sensor_status()
     location_sensors = [
-        proto_to_dict(r) for r in all_sensors.values() if r.location == location_name
+        proto_to_dict(r) for r in gateway.get_sensor_status_by_location(location_name).values()
     ]
     if not location_sensors:
         raise HTTPException(status_code=404, detail=f"Sem dispositivos na localização '{location_name}'")
@@ -54,18 +145,17 @@ def stream_location_data(location_name: str):
 
 @app.get("/devices/{device_id}/data", summary="Pegar dados sob demanda")
 async def get_on_demand_data(device_id: str):
-    sensor_data = gateway.get_sensor_status()
-    last_reading = sensor_data.get(device_id)
+    last_reading = gateway.get_sensor_reading(device_id)
     last_timestamp = last_reading.timestamp if last_reading else 0
 
-    command_response = gateway.send_command_to_device(device_id, "send_tcp_data")
+    command_response = await wait_command(gateway.enqueue_command(device_id, "send_tcp_data", priority=PRIORITY_HIGH))
 
     if not command_response or not command_response.success:
         raise HTTPException(status_code=502, detail="Falha ao enviar comando para dispositivo. Pode ser que esteja offline")
 
     timeout = time.time() + 15
     while time.time() < timeout:
-        current_reading = gateway.get_sensor_status().get(device_id)
+        current_reading = gateway.get_sensor_reading(device_id)
         if current_reading and current_reading.timestamp > last_timestamp:
             return proto_to_dict(current_reading)
         await asyncio.sleep(0.1) 
@@ -73,11 +163,103 @@ async def get_on_demand_data(device_id: str):
     raise HTTPException(status_code=408, detail="Timeout")
 
 @app.post("/devices/{device_id}/command", summary="Envia comando a um dispositivo")
-def queue_command(device_id: str, payload: CommandPayload):
-    response = gateway.send_command_to_device(device_id, payload.command, payload.params)
+async def queue_command(device_id: str, payload: CommandPayload):
+    future = gateway.enqueue_command(device_id, payload.command, payload.params, payload.priority)
+    response = await wait_command(future, COMMAND_TIMEOUT, on_timeout=QUEUED)
+    if response is QUEUED:
+        # O comando continua na fila; o cliente não fica preso esperando o dispositivo
+        return JSONResponse(status_code=202, content={"status": "queued", "message": f"Comando '{payload.command}' enfileirado"})
 
     if response and response.success:
         return {"status": "success", "message": response.message}
     
     error_message = response.message if response else "Dispositivo não encontrado ou falhou ao responder"
-    raise HTTPException(status_code=500, detail=error_message)
\ No newline at end of file
+    raise HTTPException(status_code=500, detail=error_message)
+
+@app.get("/ingest/stats", summary="Filas de ingestão, recusas e duplicatas")
+def ingest_stats():
+    stats = gateway.ingest_stats()
+    stats["api_inflight"] = api_inflight
+    stats["api_max_inflight"] = API_MAX_INFLIGHT
+    return stats
+
+@app.get("/commands/queue", summary="Estado da fila de comandos")
+def command_queue_stats():
+    return gateway.command_queue.stats()
+
+@app.get("/rules", summary="Listar regras")
+def list_rules():
+    return [rule.to_dict() for rule in gateway.rules.list()]
+
+@app.post("/rules", summary="Criar regra", status_code=201)
+def create_rule(payload: RulePayload):
+    try:
+        rule = Rule(**payload.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return gateway.rules.add(rule).to_dict()
+
+@app.delete("/rules/{rule_id}", summary="Remover regra")
+def delete_rule(rule_id: int):
+    if not gateway.rules.remove(rule_id):
+        raise HTTPException(status_code=404, detail=f"Regra {rule_id} não encontrada")
+    return {"status": "success", "message": f"Regra {rule_id} removida"}
+
+@app.get("/history/export", summary="Exportar histórico de leituras (.npz colunar)")
+def export_history(start: Optional[int] = None, end: Optional[int] = None,
+                   sensor_id: Optional[str] = None, location: Optional[str] = None):
+    # O arquivo é montado em blocos num temporário (em memória até 8 MiB, depois em disco)
+    # e enviado em pedaços, sem carregar o histórico inteiro na memória
+    spool = tempfile.SpooledTemporaryFile(max_size=8 << 20)
+    try:
+        rows = gateway.export_history(spool, start, end, sensor_id, location)
+    except RuntimeError as e:
+        spool.close()
+        raise HTTPException(status_code=404, detail=str(e))
+    spool.seek(0)
+
+    def blocks():
+        with spool:
+            while block := spool.read(EXPORT_BLOCK_SIZE):
+                yield block
+
+    filename = f"readings_{start or 0}_{end or 'now'}.npz"
+    return StreamingResponse(blocks(), media_type="application/octet-stream", headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Row-Count": str(rows),
+    })
+
+@app.get("/semaphores/plans", summary="Listar planos de semáforos")
+def list_semaphore_plans():
+    return [plan.to_dict() for plan in gateway.semaphores.list()]
+
+@app.get("/semaphores/plans/{group}", summary="Plano e estado esperado de um grupo de semáforos")
+def get_semaphore_plan(group: str):
+    plan = gateway.semaphores.get(group)
+    if plan is None:
+        raise HTTPException(status_code=404, detail=f"Grupo '{group}' sem plano")
+    return plan.to_dict()
+
+@app.post("/semaphores/plans", summary="Aplicar plano coordenado a um grupo de semáforos", status_code=201)
+async def apply_semaphore_plan(payload: SemaphorePlanPayload):
+    try:
+        plan = SemaphoreGroupPlan(**payload.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    futures = gateway.semaphores.apply(plan)
+    waiters = {asyncio.ensure_future(asyncio.shield(asyncio.wrap_future(f))): device_id for device_id, f in futures.items()}
+    done, _ = await asyncio.wait(waiters, timeout=COMMAND_TIMEOUT)
+
+    # Quem não respondeu a tempo continua com o comando na fila
+    results = {device_id: "queued" for device_id in futures}
+    for waiter in done:
+        response = waiter.result()
+        results[waiters[waiter]] = "applied" if response and response.success else "failed"
+    return {**plan.to_dict(), "results": results}
+
+@app.delete("/semaphores/plans/{group}", summary="Parar de acompanhar o plano de um grupo")
+def delete_semaphore_plan(group: str):
+    if not gateway.semaphores.remove(group):
+        raise HTTPException(status_code=404, detail=f"Grupo '{group}' sem plano")
+    return {"status": "success", "message": f"Plano do grupo '{group}' removido; semáforos mantêm os últimos tempos"}
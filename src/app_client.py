@@ -0,0 +1,61 @@
+import socket
+import time
+from proto.sensor_data_pb2 import AppRequest, GatewayResponse
+from framing import send_message, recv_message
+
+# Respostas da API binária podem listar todos os dispositivos do gateway
+MAX_RESPONSE_SIZE = 64 * 1024 * 1024
+
+# Cliente da API binária do gateway (AppRequest/GatewayResponse sobre TCP)
+class GatewayAppClient:
+    def __init__(self, host='localhost', port=8082, timeout=20):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, request: AppRequest) -> GatewayResponse:
+        if self.sock is None:
+            self.connect()
+        send_message(self.sock, request)
+        response = recv_message(self.sock, GatewayResponse, MAX_RESPONSE_SIZE)
+        if response is None:
+            self.close()
+            raise ConnectionError("Gateway fechou a conexão")
+        return response
+
+    def list_devices(self):
+        response = self.request(AppRequest(type=AppRequest.LIST_DEVICES))
+        return list(response.device_list.devices)
+
+    def stream_location_data(self, location_name):
+        request = AppRequest(type=AppRequest.STREAM_LOCATION_DATA)
+        request.stream_request.location_name = location_name
+        return list(self.request(request).device_list.devices)
+
+    def get_on_demand_data(self, device_id):
+        request = AppRequest(type=AppRequest.GET_ON_DEMAND_DATA)
+        request.on_demand_request.device_id = device_id
+        return self.request(request)
+
+    def queue_command(self, device_id, command):
+        request = AppRequest(type=AppRequest.QUEUE_COMMAND)
+        request.command_request.target_id = device_id
+        request.command_request.command = command
+        request.command_request.timestamp = int(time.time())
+        return self.request(request)
@@ -0,0 +1,271 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import socket
+import sys
+import threading
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from google.protobuf.message import DecodeError
+from proto.sensor_data_pb2 import SensorReading, Response, DeviceType
+from framing import HEADER, MAX_FRAME_SIZE, FrameTooLarge, recv_frame
+
+# Fuzz do enquadramento TCP e do parsing de leituras. Cada caso é um fluxo de
+# bytes (frames válidos, truncados, com tamanho acima do limite, lixo, bits
+# trocados...) entregue em pedaços de tamanho aleatório para:
+#   framing  - recv_frame sobre uma conexão em memória
+#   gateway  - handle_tcp_client sobre um socketpair e handle_sensor_data (UDP)
+# Falha se algo levanta exceção inesperada, trava, aceita frame acima do limite
+# ou se o store do gateway dá erro com a leitura. A semente reproduz a execução.
+
+def random_reading(rng):
+    reading = SensorReading(
+        sensor_id=rng.choice(["", "TEMP-01", "Ç" * rng.randint(1, 64), f"S-{rng.getrandbits(32)}"]),
+        location=rng.choice(["", "Sala", "\x00\xff"]),
+        sensor_type=rng.choice(list(DeviceType.values()) + [rng.randint(-5, 1000)]),
+        value=rng.choice([0.0, -1.5, 1e308, float("inf"), float("nan"), rng.uniform(-1e6, 1e6)]),
+        unit=rng.choice(["", "°C", "%"]),
+        timestamp=rng.choice([0, 1700000000, rng.getrandbits(63), -rng.getrandbits(63)]),
+        sequence=rng.getrandbits(64),
+        boot_id=rng.getrandbits(64),
+    )
+    for i in range(rng.randint(0, 4)):
+        reading.metadata[f"k{i}"] = "v" * rng.randint(0, 32)
+    return reading
+
+def frame(payload):
+    return HEADER.pack(len(payload)) + payload
+
+# Geradores de caso: (bytes do fluxo, payloads que um leitor correto deve extrair)
+def case_valid(rng, max_size):
+    payload = random_reading(rng).SerializeToString()
+    return frame(payload), [payload]
+
+def case_concatenated(rng, max_size):
+    payloads = [random_reading(rng).SerializeToString() for _ in range(rng.randint(2, 6))]
+    return b"".join(frame(p) for p in payloads), payloads
+
+def case_zero_length(rng, max_size):
+    return frame(b""), [b""]
+
+def case_at_limit(rng, max_size):
+    payload = rng.randbytes(max_size)
+    return frame(payload), [payload]
+
+def case_truncated_header(rng, max_size):
+    return rng.randbytes(rng.randint(1, HEADER.size - 1)), []
+
+def case_truncated_body(rng, max_size):
+    payload = random_reading(rng).SerializeToString()
+    return frame(payload)[:rng.randint(HEADER.size, HEADER.size + len(payload) - 1)], []
+
+def case_oversized(rng, max_size):
+    # Só o cabeçalho e um pedaço do corpo: o leitor não pode tentar ler o resto
+    length = rng.choice([max_size + 1, rng.randint(max_size + 1, 2 ** 32 - 1), 2 ** 32 - 1])
+    return HEADER.pack(length) + rng.randbytes(rng.randint(0, 64)), None
+
+def case_garbage_body(rng, max_size):
+    payload = rng.randbytes(rng.randint(1, 256))
+    return frame(payload), [payload]
+
+def case_bit_flip(rng, max_size):
+    data = bytearray(frame(random_reading(rng).SerializeToString()))
+    for _ in range(rng.randint(1, 4)):
+        data[rng.randrange(len(data))] ^= 1 << rng.randrange(8)
+    return bytes(data), None
+
+def case_random_bytes(rng, max_size):
+    return rng.randbytes(rng.randint(0, 512)), None
+
+CASES = {
+    "valid": case_valid,
+    "concatenated": case_concatenated,
+    "zero_length": case_zero_length,
+    "at_limit": case_at_limit,
+    "truncated_header": case_truncated_header,
+    "truncated_body": case_truncated_body,
+    "oversized": case_oversized,
+    "garbage_body": case_garbage_body,
+    "bit_flip": case_bit_flip,
+    "random_bytes": case_random_bytes,
+}
+
+# Conexão em memória que entrega o fluxo em pedaços aleatórios (recv parcial)
+class FuzzConn:
+    def __init__(self, data, rng):
+        self.data = data
+        self.offset = 0
+        self.rng = rng
+
+    def _take(self, n):
+        count = min(n, self.rng.randint(1, max(1, len(self.data) - self.offset)), len(self.data) - self.offset)
+        self.offset += count
+        return self.data[self.offset - count:self.offset]
+
+    def recv(self, n):
+        return self._take(n)
+
+    def recv_into(self, buffer):
+        chunk = self._take(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+def fuzz_framing(name, data, expected, rng, max_size):
+    conn = FuzzConn(data, rng)
+    payloads = []
+    start = 0
+    try:
+        while (payload := recv_frame(conn, max_size)) is not None:
+            if len(payload) > max_size:
+                return f"payload de {len(payload)} bytes acima do limite {max_size}"
+            payloads.append(payload)
+            start = conn.offset
+            try:
+                SensorReading().ParseFromString(payload)
+            except DecodeError:
+                pass
+    except FrameTooLarge as e:
+        if e.size <= max_size:
+            return f"FrameTooLarge com {e.size} bytes dentro do limite"
+        if expected is not None:
+            return f"FrameTooLarge num fluxo válido: {e}"
+        # O cabeçalho é lido, o corpo não
+        if conn.offset - start != HEADER.size:
+            return "leu o corpo de um frame acima do limite"
+        return None
+    if expected is not None and payloads != expected:
+        return f"extraiu {len(payloads)} frames, esperado {len(expected)}"
+    if name == "oversized":
+        return "frame acima do limite aceito"
+    return None
+
+# Captura a saída do gateway e guarda só os erros do store (leitura que quebrou o processamento)
+class StoreErrors(io.TextIOBase):
+    def __init__(self):
+        self.lines = []
+
+    def write(self, text):
+        if "Erro ao gravar leitura" in text:
+            self.lines.append(text.strip())
+        return len(text)
+
+def fuzz_gateway(gateway, name, data, expected, rng, max_size):
+    client, server = socket.socketpair()
+    with client:
+        # Às vezes o cliente não fecha o envio: o handler tem que sair pelo timeout
+        stall = rng.random() < 0.02
+        gateway.tcp_slots.acquire()
+        handler = threading.Thread(target=gateway.handle_tcp_client, args=(server, ("10.0.0.42", 40000)))
+        handler.start()
+        offset = 0
+        try:
+            while offset < len(data):
+                step = rng.randint(1, len(data) - offset)
+                client.sendall(data[offset:offset + step])
+                offset += step
+            if not stall:
+                client.shutdown(socket.SHUT_WR)
+        except OSError:
+            # O gateway pode fechar antes de receber tudo (frame acima do limite)
+            pass
+        handler.join(gateway.tcp_timeout + 5)
+        if handler.is_alive():
+            return "handle_tcp_client não retornou"
+
+        client.settimeout(1)
+        try:
+            length_data = client.recv(HEADER.size)
+            response = None
+            if len(length_data) == HEADER.size:
+                response = Response()
+                response.ParseFromString(client.recv(HEADER.unpack(length_data)[0], socket.MSG_WAITALL))
+        except (OSError, DecodeError):
+            response = None
+
+    if name == "oversized" and (response is None or response.success):
+        return "frame acima do limite sem resposta de erro"
+    if name == "valid" and (response is None or response.success == (response.retry_after_ms > 0)):
+        return "frame válido sem resposta coerente"
+
+    # Mesmo payload pelo caminho UDP: nunca pode levantar exceção
+    for payload in expected or [data[HEADER.size:]]:
+        gateway.handle_sensor_data(payload, ("10.0.0.42", 40000), protocol="UDP")
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz do enquadramento TCP e do parsing de leituras do gateway")
+    parser.add_argument("--seed", type=int, default=None, help="semente (padrão: aleatória, impressa no início)")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--target", choices=["framing", "gateway", "all"], default="all")
+    parser.add_argument("--case", action="append", choices=list(CASES), help="tipo de caso (pode repetir; padrão: todos)")
+    parser.add_argument("--max-frame", type=int, default=MAX_FRAME_SIZE)
+    parser.add_argument("--tcp-timeout", type=float, default=0.2)
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    print(f"🎲 Semente {seed} ({args.iterations} casos, alvo {args.target}, limite {args.max_frame} bytes)")
+    names = args.case or list(CASES)
+
+    gateway = None
+    errors = StoreErrors()
+    if args.target in ("gateway", "all"):
+        from gateway import Gateway
+        # verbose: o display também passa pelo fuzz
+        gateway = Gateway(transports=(), verbose=True, history_capacity=1024, source_rate=0, ingest_queue_size=0,
+                          tcp_timeout=args.tcp_timeout, max_frame_size=args.max_frame)
+        gateway.start_store_workers()
+
+    failures = []
+    counts = dict.fromkeys(names, 0)
+    for i in range(args.iterations):
+        rng = random.Random(f"{seed}-{i}")
+        name = rng.choice(names)
+        data, expected = CASES[name](rng, args.max_frame)
+        counts[name] += 1
+
+        checks = []
+        if args.target in ("framing", "all"):
+            checks.append(("framing", lambda: fuzz_framing(name, data, expected, rng, args.max_frame)))
+        if gateway is not None:
+            checks.append(("gateway", lambda: fuzz_gateway(gateway, name, data, expected, rng, args.max_frame)))
+
+        for target, check in checks:
+            with contextlib.redirect_stdout(errors):
+                try:
+                    problem = check()
+                except Exception as e:
+                    problem = f"exceção {type(e).__name__}: {e}"
+            if problem:
+                failures.append((i, target, name, problem, data))
+
+    if gateway is not None:
+        with contextlib.redirect_stdout(errors):
+            gateway.drain_ingest()
+            gateway.stop()
+        if gateway.tcp_connections:
+            failures.append((None, "gateway", "-", f"{gateway.tcp_connections} conexões TCP não liberadas", b""))
+        for line in errors.lines:
+            failures.append((None, "gateway", "-", line, b""))
+        stats = gateway.ingest_stats()["counters"]
+        print(f"   Contadores do gateway: TCP {stats.get('TCP', {})}  UDP {stats.get('UDP', {})}")
+
+    print("   Casos: " + ", ".join(f"{name} {count}" for name, count in counts.items()))
+    if not failures:
+        print("✅ Nenhuma falha")
+        return
+
+    print(f"❌ {len(failures)} falhas")
+    for i, target, name, problem, data in failures[:20]:
+        where = f"caso {i} " if i is not None else ""
+        print(f"   [{target}] {where}{name}: {problem}")
+        if data:
+            print(f"      {data[:64].hex()}{'...' if len(data) > 64 else ''}")
+    print(f"   Reproduzir: --seed {seed}")
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import socket
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from proto.sensor_data_pb2 import SensorReading, Response, DeviceType
+from framing import HEADER, encode_frame, recv_frame, recv_message, send_message
+
+# Microbenchmarks do caminho quente da ingestão TCP: serialização/parsing da
+# SensorReading, enquadramento (inteiro, fragmentado e sobre socket real),
+# exibição da leitura e o handle_tcp_client completo. Resultado em msgs/s;
+# --save grava uma linha de base e --compare falha se algo ficou mais lento.
+# Cada benchmark recebe n, prepara o que precisa e cronometra só o laço quente.
+
+# Sequências sempre crescentes entre execuções: leituras repetidas cairiam no dedup
+SEQUENCES = itertools.count(1)
+
+def sample_reading(i=0, sequence=1):
+    reading = SensorReading(
+        sensor_id=f"TEMP-{i:06d}",
+        location="Sala de Servidores",
+        sensor_type=DeviceType.TEMPERATURE,
+        value=23.5 + i % 10,
+        unit="°C",
+        timestamp=1700000000 + i,
+        sequence=sequence,
+        boot_id=1700000000000000000,
+    )
+    reading.metadata["device_ip"] = "10.0.0.42"
+    reading.metadata["grpc_port"] = "50051"
+    return reading
+
+# Conexão em memória: devolve o buffer em pedaços de no máximo chunk bytes,
+# como um socket que entrega o frame em vários recv
+class ChunkedConn:
+    def __init__(self, data, chunk=None):
+        self.view = memoryview(data)
+        self.offset = 0
+        self.chunk = chunk or len(data)
+
+    def recv(self, n):
+        count = min(n, self.chunk, len(self.view) - self.offset)
+        self.offset += count
+        return bytes(self.view[self.offset - count:self.offset])
+
+    def recv_into(self, buffer):
+        count = min(len(buffer), self.chunk, len(self.view) - self.offset)
+        buffer[:count] = self.view[self.offset:self.offset + count]
+        self.offset += count
+        return count
+
+def new_gateway(**kwargs):
+    from gateway import Gateway
+    return Gateway(transports=(), history_capacity=0, source_rate=0, ingest_queue_size=0, **kwargs)
+
+def serialized_batch(n):
+    # n leituras distribuídas entre 1000 sensores, todas novas para o dedup
+    return [sample_reading(i % 1000, next(SEQUENCES)).SerializeToString() for i in range(n)]
+
+def bench_serialize(n):
+    reading = sample_reading()
+    start = time.perf_counter()
+    for _ in range(n):
+        reading.SerializeToString()
+    return time.perf_counter() - start
+
+def bench_parse(n):
+    data = sample_reading().SerializeToString()
+    start = time.perf_counter()
+    for _ in range(n):
+        SensorReading().ParseFromString(data)
+    return time.perf_counter() - start
+
+def bench_encode_frame(n):
+    reading = sample_reading()
+    start = time.perf_counter()
+    for _ in range(n):
+        encode_frame(reading)
+    return time.perf_counter() - start
+
+def recv_frames(chunk):
+    def bench(n):
+        conn = ChunkedConn(encode_frame(sample_reading()) * n, chunk)
+        start = time.perf_counter()
+        for _ in range(n):
+            recv_frame(conn)
+        return time.perf_counter() - start
+    return bench
+
+def bench_socketpair(n, batch=64):
+    # Envia em lotes para não encher o buffer do socket com uma thread só
+    reading = sample_reading()
+    a, b = socket.socketpair()
+    with a, b:
+        start = time.perf_counter()
+        done = 0
+        while done < n:
+            count = min(batch, n - done)
+            for _ in range(count):
+                send_message(a, reading)
+            for _ in range(count):
+                recv_message(b, SensorReading)
+            done += count
+        return time.perf_counter() - start
+
+def display(verbose):
+    def bench(n):
+        gateway = new_gateway(verbose=verbose)
+        reading = sample_reading()
+        addr = ("10.0.0.42", 40000)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            for _ in range(n):
+                gateway.display_sensor_reading(reading, addr)
+            return time.perf_counter() - start
+    return bench
+
+def bench_ingest(n):
+    # parsing + admissão + store (dedup, registro, regras) até a fila esvaziar
+    gateway = new_gateway(verbose=False)
+    gateway.start_store_workers()
+    frames = serialized_batch(n)
+    addr = ("10.0.0.42", 40000)
+    start = time.perf_counter()
+    for data in frames:
+        gateway.handle_sensor_data(data, addr, protocol="TCP")
+    gateway.drain_ingest()
+    elapsed = time.perf_counter() - start
+    gateway.stop()
+    return elapsed
+
+def bench_tcp_client(n):
+    # Uma conexão por leitura, como o send_tcp_data do dispositivo
+    gateway = new_gateway(verbose=False)
+    gateway.start_store_workers()
+    frames = [HEADER.pack(len(data)) + data for data in serialized_batch(n)]
+    addr = ("10.0.0.42", 40000)
+    start = time.perf_counter()
+    for frame in frames:
+        client, server = socket.socketpair()
+        with client:
+            client.sendall(frame)
+            gateway.tcp_slots.acquire()
+            gateway.handle_tcp_client(server, addr)
+            recv_message(client, Response)
+    gateway.drain_ingest()
+    elapsed = time.perf_counter() - start
+    gateway.stop()
+    return elapsed
+
+BENCHMARKS = {
+    "serialize": bench_serialize,
+    "parse": bench_parse,
+    "encode_frame": bench_encode_frame,
+    "recv_frame": recv_frames(None),
+    "recv_frame fragmentado": recv_frames(7),
+    "socketpair ida": bench_socketpair,
+    "display verbose": display(True),
+    "display silencioso": display(False),
+    "ingestão": bench_ingest,
+    "handle_tcp_client": bench_tcp_client,
+}
+
+def measure(bench, repeat, min_time):
+    # Dobra n até uma execução levar min_time; fica com a melhor de repeat execuções
+    n = 64
+    while (elapsed := bench(n)) < min_time:
+        n *= 2
+    best = min([elapsed] + [bench(n) for _ in range(repeat - 1)])
+    return {"n": n, "msgs_per_s": round(n / best), "us_per_msg": round(best / n * 1e6, 3)}
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("benchmarks", {}).get(name)
+        if not reference:
+            continue
+        ratio = result["msgs_per_s"] / reference["msgs_per_s"]
+        result["vs_baseline"] = round(ratio, 3)
+        if ratio < 1 - tolerance:
+            regressions.append((name, ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão (msgs/s) do enquadramento TCP, parsing e exibição de leituras")
+    parser.add_argument("--bench", action="append", choices=list(BENCHMARKS),
+                        help="benchmark a rodar (pode repetir; padrão: todos)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="duração mínima de cada execução (s)")
+    parser.add_argument("--json", action="store_true", help="saída em JSON para acompanhar entre versões")
+    parser.add_argument("--save", metavar="ARQUIVO", help="grava os resultados como linha de base")
+    parser.add_argument("--compare", metavar="ARQUIVO", help="compara com uma linha de base gravada por --save")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="queda máxima aceita em relação à linha de base (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    names = args.bench or list(BENCHMARKS)
+    results = {name: measure(BENCHMARKS[name], args.repeat, args.min_time) for name in names}
+    report = {"python": sys.version.split()[0], "benchmarks": results}
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"⏱️ Caminho quente TCP (melhor de {args.repeat}, Python {report['python']})")
+        print(f"{'benchmark':<26}{'msgs/s':>12}{'µs/msg':>10}{'vs base':>10}")
+        for name, result in results.items():
+            ratio = f"{result['vs_baseline']:.2f}x" if "vs_baseline" in result else "-"
+            print(f"{name:<26}{result['msgs_per_s']:>12,}{result['us_per_msg']:>10}{ratio:>10}")
+
+    for name, ratio in regressions:
+        print(f"❌ {name}: {ratio:.2f}x da linha de base (tolerância {args.tolerance:.0%})", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import threading
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from proto.sensor_data_pb2 import SensorReading, DeviceType
+
+UNITS = {DeviceType.TEMPERATURE: "°C", DeviceType.HUMIDITY: "%", DeviceType.ALARM: "", DeviceType.SEMAPHORE: ""}
+
+def rss_bytes():
+    # Linux: segunda coluna de /proc/self/statm = páginas residentes
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def serialized_readings(devices, locations, hosts):
+    # Leituras serializadas, como chegam da rede: cada parsing cria strings novas
+    sensor_types = list(UNITS)
+    for i in range(devices):
+        sensor_type = sensor_types[i % len(sensor_types)]
+        reading = SensorReading(
+            sensor_id=f"SENSOR-{i:06d}",
+            location=f"Localização {i % locations}",
+            sensor_type=sensor_type,
+            value=20.0 + i % 100 / 10,
+            unit=UNITS[sensor_type],
+            timestamp=1700000000 + i,
+            sequence=i % 1000,
+            boot_id=1700000000000000000 + i,
+        )
+        reading.metadata["device_ip"] = f"10.0.{i % hosts // 256}.{i % 256}"
+        reading.metadata["grpc_port"] = str(50051 + i % 1000)
+        yield reading.SerializeToString()
+
+# Como o gateway guardava antes: dict de endereço por dispositivo + o SensorReading inteiro
+def build_dicts(payloads):
+    devices = {}
+    sensor_data = {}
+    lock = threading.Lock()
+    for data in payloads:
+        reading = SensorReading()
+        reading.ParseFromString(data)
+        address = reading.metadata.get("device_ip", "unknown")
+        with lock:
+            devices[reading.sensor_id] = {
+                "address": address,
+                "grpc_port": int(reading.metadata.get("grpc_port", 50051))
+            }
+        with lock:
+            sensor_data[reading.sensor_id] = reading
+    return devices, sensor_data
+
+def build_registry(payloads):
+    from device_registry import DeviceRegistry
+
+    registry = DeviceRegistry()
+    for data in payloads:
+        reading = SensorReading()
+        reading.ParseFromString(data)
+        registry.update(reading, reading.metadata.get("device_ip", "unknown"))
+    return registry
+
+VARIANTS = {"dicts": build_dicts, "registry": build_registry}
+
+def run_variant(name, devices, locations, hosts):
+    payloads = list(serialized_readings(devices, locations, hosts))
+    gc.collect()
+    before = rss_bytes()
+    store = VARIANTS[name](payloads)
+    gc.collect()
+    after = rss_bytes()
+    del store
+    return {"variant": name, "devices": devices, "bytes": after - before, "bytes_per_device": (after - before) / devices}
+
+def main():
+    parser = argparse.ArgumentParser(description="Memória por dispositivo do registro do gateway")
+    parser.add_argument("--devices", type=int, default=100_000)
+    parser.add_argument("--locations", type=int, default=200, help="localizações distintas na frota")
+    parser.add_argument("--hosts", type=int, default=2_000, help="endereços distintos na frota")
+    parser.add_argument("--variant", choices=sorted(VARIANTS), help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.devices, args.locations, args.hosts)))
+        return
+
+    # Cada variante roda num processo novo para o RSS de uma não contaminar a outra
+    results = []
+    for name in VARIANTS:
+        output = subprocess.run(
+            [sys.executable, __file__, "--variant", name, "--devices", str(args.devices),
+             "--locations", str(args.locations), "--hosts", str(args.hosts)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"🧮 {args.devices} dispositivos, {args.locations} localizações, {args.hosts} endereços")
+    for result in results:
+        print(f"  {result['variant']:<10} {result['bytes'] / 2**20:8.1f} MiB  {result['bytes_per_device']:8.0f} bytes/dispositivo")
+    baseline, registry = results
+    print(f"  Redução: {1 - registry['bytes'] / baseline['bytes']:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cada cenário roda num interpretador novo (cold start) a partir de src/.
+# Os cenários de transporte importam o que o processo carregaria ao subir aquele transporte.
+SCENARIOS = {
+    "python": "pass",
+    "run.py --help": None,
+    "sensor": "from devices.temperature_sensor import TemperatureSensorClient; TemperatureSensorClient('BENCH-01', 'bench')",
+    "sensor + rabbitmq/grpc": "import devices.temperature_sensor, pika, grpc, devices.control_server",
+    "sensor + stream": "import devices.temperature_sensor, grpc, proto.sensor_data_pb2_grpc",
+    "gateway tcp": "from gateway import Gateway; Gateway(transports=['tcp'])",
+    "gateway completo": "from gateway import Gateway; Gateway(); import pika, grpc, telemetry",
+    "api": "import api",
+}
+
+def command_for(name, importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    if SCENARIOS[name] is None:
+        return cmd + [os.path.join(SRC_DIR, "run.py"), "--help"]
+    return cmd + ["-c", SCENARIOS[name]]
+
+def measure(name, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command_for(name), cwd=SRC_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": round(min(timings), 1),
+        "median_ms": round(statistics.median(timings), 1),
+        "max_ms": round(max(timings), 1),
+    }
+
+def slowest_imports(name, top):
+    # Saída do -X importtime: "import time: self [us] | cumulative | nome"
+    result = subprocess.run(command_for(name, importtime=True), cwd=SRC_DIR, check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        entries.append((int(parts[1]), parts[2].strip()))
+    return sorted(entries, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de inicialização (cold start) dos processos de gateway e dispositivos")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="cenário a medir (pode repetir; padrão: todos)")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="mostra os N imports mais caros (tempo acumulado) de cada cenário")
+    parser.add_argument("--json", action="store_true", help="saída em JSON para acompanhar entre versões")
+    args = parser.parse_args()
+
+    names = args.scenario or list(SCENARIOS)
+    results = {name: measure(name, args.runs) for name in names}
+
+    if args.json:
+        print(json.dumps({"python": sys.version.split()[0], "runs": args.runs, "scenarios": results}, indent=2))
+        return
+
+    print(f"⏱️ Cold start ({args.runs} execuções por cenário, Python {sys.version.split()[0]})")
+    print(f"{'cenário':<26}{'mín (ms)':>10}{'mediana':>10}{'máx':>10}")
+    for name, result in results.items():
+        print(f"{name:<26}{result['min_ms']:>10}{result['median_ms']:>10}{result['max_ms']:>10}")
+        for cumulative, module in slowest_imports(name, args.importtime) if args.importtime else ():
+            print(f"{'':<4}{cumulative / 1000:>8.1f} ms  {module}")
+
+if __name__ == "__main__":
+    main()
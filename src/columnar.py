@@ -0,0 +1,152 @@
+import ast
+import shutil
+import sys
+import tempfile
+import zipfile
+from array import array
+
+# Arquivos .npz (zip de arquivos .npy, um por coluna) escritos e lidos só com a
+# biblioteca padrão: o gateway não depende do numpy, mas quem analisa os dados
+# abre o arquivo direto com numpy.load().
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+DESCRS = {"q": "<i8", "Q": "<u8", "d": "<f8", "i": "<i4"}
+TYPECODES = {descr: typecode for typecode, descr in DESCRS.items()}
+COPY_BUFFER = 1 << 20
+
+
+def npy_header(descr, rows):
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({rows},), }}"
+    # Cabeçalho completo alinhado em 64 bytes e terminado em '\n', como o numpy espera
+    padding = 64 - (len(NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = (header + " " * padding + "\n").encode("latin1")
+    return NPY_MAGIC + len(header).to_bytes(2, "little") + header
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+# Escreve as colunas numéricas em blocos: cada bloco vai para um arquivo temporário
+# por coluna e só no fechamento (quando o total de linhas é conhecido) os arquivos
+# são copiados para dentro do zip com o cabeçalho .npy. A memória fica limitada a um bloco.
+class NpzWriter:
+    def __init__(self, fileobj, columns, compress=True):
+        self.fileobj = fileobj
+        self.columns = dict(columns)
+        self.compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        self.spools = {name: tempfile.TemporaryFile() for name in self.columns}
+        self.strings = {}
+        self.rows = 0
+
+    def write_chunk(self, chunk):
+        rows = None
+        for name, typecode in self.columns.items():
+            values = chunk[name]
+            if values.typecode != typecode:
+                raise ValueError(f"Coluna '{name}' deveria ter tipo '{typecode}', veio '{values.typecode}'")
+            if rows is not None and len(values) != rows:
+                raise ValueError(f"Coluna '{name}' com {len(values)} linhas, esperado {rows}")
+            rows = len(values)
+            _little_endian(values).tofile(self.spools[name])
+        self.rows += rows or 0
+
+    def write_strings(self, name, values):
+        # Tabelas pequenas (ex.: dicionário de sensor_id) vão inteiras como '<U{n}'
+        self.strings[name] = list(values)
+
+    def close(self):
+        with zipfile.ZipFile(self.fileobj, "w", self.compression, allowZip64=True) as archive:
+            for name, typecode in self.columns.items():
+                spool = self.spools[name]
+                spool.seek(0)
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                    member.write(npy_header(DESCRS[typecode], self.rows))
+                    shutil.copyfileobj(spool, member, COPY_BUFFER)
+                spool.close()
+            for name, values in self.strings.items():
+                width = max((len(value) for value in values), default=1) or 1
+                with archive.open(f"{name}.npy", "w") as member:
+                    member.write(npy_header(f"<U{width}", len(values)))
+                    for value in values:
+                        member.write(value.ljust(width, "\0").encode("utf-32-le"))
+        self.spools = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for spool in self.spools.values():
+                spool.close()
+
+
+def _read_header(member):
+    if member.read(len(NPY_MAGIC)) != NPY_MAGIC:
+        raise ValueError("Arquivo .npy inválido ou de versão não suportada")
+    length = int.from_bytes(member.read(2), "little")
+    header = ast.literal_eval(member.read(length).decode("latin1"))
+    if header["fortran_order"] or len(header["shape"]) != 1:
+        raise ValueError("Só colunas unidimensionais são suportadas")
+    return header["descr"], header["shape"][0]
+
+
+# Leitura em blocos das colunas numéricas de um .npz gerado por NpzWriter (ou pelo numpy)
+class NpzReader:
+    def __init__(self, fileobj):
+        self.archive = zipfile.ZipFile(fileobj)
+        self.headers = {}
+        for info in self.archive.infolist():
+            if info.filename.endswith(".npy"):
+                with self.archive.open(info) as member:
+                    self.headers[info.filename[:-4]] = _read_header(member)
+
+    def __len__(self):
+        return max((rows for descr, rows in self.headers.values() if descr in TYPECODES), default=0)
+
+    def close(self):
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def strings(self, name):
+        descr, rows = self.headers[name]
+        if not descr.startswith("<U"):
+            raise ValueError(f"Coluna '{name}' não é de texto ({descr})")
+        width = int(descr[2:]) * 4
+        with self.archive.open(f"{name}.npy") as member:
+            _read_header(member)
+            return [member.read(width).decode("utf-32-le").rstrip("\0") for _ in range(rows)]
+
+    def chunks(self, names, chunk_rows=65536):
+        members = {}
+        try:
+            for name in names:
+                descr, _ = self.headers[name]
+                if descr not in TYPECODES:
+                    raise ValueError(f"Tipo '{descr}' da coluna '{name}' não suportado")
+                members[name] = self.archive.open(f"{name}.npy")
+                _read_header(members[name])
+
+            while True:
+                chunk = {}
+                for name, member in members.items():
+                    values = array(TYPECODES[self.headers[name][0]])
+                    values.frombytes(member.read(chunk_rows * values.itemsize))
+                    if sys.byteorder == "big":
+                        values.byteswap()
+                    chunk[name] = values
+                if not chunk or not len(next(iter(chunk.values()))):
+                    return
+                yield chunk
+        finally:
+            for member in members.values():
+                member.close()
@@ -0,0 +1,287 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from semaphore_timing import PLAN_COMMAND
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+SEMAPHORE_COLORS = ("vermelho", "amarelo", "verde")
+
+# Comandos com a mesma chave se sobrepõem: só o último enfileirado importa
+def coalesce_key(command_str, params=None):
+    if command_str in SEMAPHORE_COLORS:
+        return "semaphore_light"
+    if command_str.isdigit() or command_str == PLAN_COMMAND:
+        # Intervalo manual e plano coordenado substituem os mesmos tempos
+        return "semaphore_timing"
+    if command_str in ("on", "off"):
+        return "power"
+    if params:
+        # Comando genérico: só se sobrepõe a outro com os mesmos parâmetros
+        # (ex.: "set" para zonas diferentes são comandos distintos)
+        return command_str, tuple(sorted((key, str(value)) for key, value in params.items()))
+    return command_str
+
+
+def resolve(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+class QueuedCommand:
+    def __init__(self, device_id, command, params, priority, seq):
+        self.device_id = device_id
+        self.command = command
+        self.params = params
+        self.priority = priority
+        self.seq = seq
+        self.key = coalesce_key(command, params)
+        self.attempts = 0
+        self.not_before = 0.0
+        self.future = Future()
+
+    def supersede(self, newer):
+        # O comando antigo é respondido com o resultado do comando que o substituiu
+        newer.priority = min(newer.priority, self.priority)
+        newer.future.add_done_callback(lambda f: resolve(self.future, f.result()))
+
+
+class DeviceCommandState:
+    def __init__(self, burst):
+        self.pending = {}
+        self.in_flight = False
+        self.scheduled = False
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+
+
+class CommandQueue:
+    def __init__(self, send_fn, rate_per_second=2.0, burst=2, max_attempts=3,
+                 base_backoff=0.5, max_backoff=10.0, workers=4):
+        self.send_fn = send_fn
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.workers = workers
+
+        self.states = {}
+        self.cond = threading.Condition()
+        self._seq = itertools.count()
+        # Dispositivos prontos para despacho (prioridade, seq, device_id) e
+        # dispositivos aguardando rate limit ou backoff (instante, seq, device_id)
+        self._ready = []
+        self._delayed = []
+        # Dispositivos sem comandos (instante em que o bucket enche, seq, device_id):
+        # com o bucket cheio o estado é igual a um novo e pode ser descartado
+        self._idle = []
+
+        self.running = False
+        self.threads = []
+        # Modo assíncrono: despacho como tasks num event loop, sem threads de worker
+        self.loop = None
+        self.async_send_fn = None
+        self._wakeup = None
+        self.counters = {"submitted": 0, "coalesced": 0, "sent": 0, "retried": 0, "failed": 0}
+
+    def start(self):
+        self.running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"command-worker-{i}")
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def start_async(self, async_send_fn):
+        # Deve ser chamado de dentro do event loop que fará o despacho
+        self.loop = asyncio.get_running_loop()
+        self.async_send_fn = async_send_fn
+        self._wakeup = asyncio.Event()
+        self.running = True
+        self.loop.create_task(self._async_scheduler())
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self._wake()
+
+    def _wake(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+
+    def submit(self, device_id, command, params=None, priority=PRIORITY_NORMAL):
+        with self.cond:
+            cmd = QueuedCommand(device_id, command, params, priority, next(self._seq))
+            state = self.states.get(device_id)
+            if state is None:
+                state = self.states[device_id] = DeviceCommandState(self.burst)
+
+            previous = state.pending.get(cmd.key)
+            if previous:
+                previous.supersede(cmd)
+                self.counters["coalesced"] += 1
+            state.pending[cmd.key] = cmd
+            self.counters["submitted"] += 1
+
+            self._schedule(device_id, state, time.monotonic())
+            self.cond.notify()
+        self._wake()
+        return cmd.future
+
+    def stats(self):
+        with self.cond:
+            depths = {device_id: len(state.pending) for device_id, state in self.states.items() if state.pending}
+            return {
+                "pending": sum(depths.values()),
+                "in_flight": sum(1 for state in self.states.values() if state.in_flight),
+                "devices": depths,
+                "tracked_devices": len(self.states),
+                **self.counters,
+            }
+
+    def _refill(self, state, now):
+        state.tokens = min(self.burst, state.tokens + (now - state.last_refill) * self.rate_per_second)
+        state.last_refill = now
+
+    def _schedule(self, device_id, state, now):
+        if state.scheduled or state.in_flight or not state.pending:
+            return
+
+        self._refill(state, now)
+        when = min(cmd.not_before for cmd in state.pending.values())
+        if state.tokens < 1:
+            when = max(when, now + (1 - state.tokens) / self.rate_per_second)
+
+        state.scheduled = True
+        if when <= now:
+            priority = min(cmd.priority for cmd in state.pending.values())
+            heapq.heappush(self._ready, (priority, next(self._seq), device_id))
+        else:
+            heapq.heappush(self._delayed, (when, next(self._seq), device_id))
+
+    def _evict_idle(self, now):
+        while self._idle and self._idle[0][0] <= now:
+            _, _, device_id = heapq.heappop(self._idle)
+            state = self.states.get(device_id)
+            if state is None or state.pending or state.in_flight or state.scheduled:
+                continue
+            self._refill(state, now)
+            # Voltou a ser usado e ficou ocioso de novo: a entrada mais nova decide
+            if state.tokens >= self.burst:
+                del self.states[device_id]
+
+    def _poll_command(self):
+        # Chamado com self.cond adquirido. Retorna (comando, None) ou (None, tempo de espera)
+        while True:
+            now = time.monotonic()
+            self._evict_idle(now)
+            while self._delayed and self._delayed[0][0] <= now:
+                _, _, device_id = heapq.heappop(self._delayed)
+                state = self.states[device_id]
+                state.scheduled = False
+                self._schedule(device_id, state, now)
+
+            if not self._ready:
+                return None, (self._delayed[0][0] - now if self._delayed else None)
+
+            _, _, device_id = heapq.heappop(self._ready)
+            state = self.states[device_id]
+            state.scheduled = False
+
+            self._refill(state, now)
+            ready = [cmd for cmd in state.pending.values() if cmd.not_before <= now]
+            if not ready or state.tokens < 1:
+                self._schedule(device_id, state, now)
+                continue
+
+            cmd = min(ready, key=lambda c: (c.priority, c.seq))
+            del state.pending[cmd.key]
+            state.tokens -= 1
+            state.in_flight = True
+            return cmd, None
+
+    def _next_command(self):
+        # Chamado com self.cond adquirido
+        while self.running:
+            cmd, timeout = self._poll_command()
+            if cmd:
+                return cmd
+            self.cond.wait(timeout)
+        return None
+
+    async def _async_scheduler(self):
+        while self.running:
+            self._wakeup.clear()
+            with self.cond:
+                cmd, timeout = self._poll_command()
+            if cmd:
+                self.loop.create_task(self._async_dispatch(cmd))
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _async_dispatch(self, cmd):
+        try:
+            response = await self.async_send_fn(cmd.device_id, cmd.command, cmd.params)
+        except Exception as e:
+            print(f"⚠️ Erro ao despachar comando '{cmd.command}' para '{cmd.device_id}': {e}")
+            response = None
+
+        with self.cond:
+            self._complete(cmd, response)
+        self._wakeup.set()
+
+    def _worker_loop(self):
+        while True:
+            with self.cond:
+                cmd = self._next_command()
+            if cmd is None:
+                return
+
+            try:
+                response = self.send_fn(cmd.device_id, cmd.command, cmd.params)
+            except Exception as e:
+                print(f"⚠️ Erro ao despachar comando '{cmd.command}' para '{cmd.device_id}': {e}")
+                response = None
+
+            with self.cond:
+                self._complete(cmd, response)
+                self.cond.notify()
+
+    def _complete(self, cmd, response):
+        now = time.monotonic()
+        state = self.states[cmd.device_id]
+        state.in_flight = False
+        cmd.attempts += 1
+
+        # Sem resposta = falha de transporte; uma resposta com success=False vem do próprio dispositivo
+        if response is None and cmd.attempts < self.max_attempts:
+            newer = state.pending.get(cmd.key)
+            if newer:
+                cmd.supersede(newer)
+                self.counters["coalesced"] += 1
+            else:
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (cmd.attempts - 1))
+                cmd.not_before = now + backoff * random.uniform(0.5, 1.0)
+                state.pending[cmd.key] = cmd
+                self.counters["retried"] += 1
+                print(f"🔁 Reenviando '{cmd.command}' para '{cmd.device_id}' em {backoff:.1f}s (tentativa {cmd.attempts + 1})")
+        else:
+            self.counters["sent" if response is not None else "failed"] += 1
+            resolve(cmd.future, response)
+
+        self._schedule(cmd.device_id, state, now)
+        if not state.pending:
+            full_at = now + (self.burst - state.tokens) / self.rate_per_second
+            heapq.heappush(self._idle, (full_at, next(self._seq), cmd.device_id))
@@ -0,0 +1,90 @@
+import threading
+
+NEW = "new"
+LATE = "late"
+DUPLICATE = "duplicate"
+
+WINDOW_BITS = 64
+WINDOW_MASK = (1 << WINDOW_BITS) - 1
+MAX_HASHES_PER_TIMESTAMP = 8
+
+# Janela deslizante por sensor: o bit i de mask indica que a sequência (highest - i) já chegou
+class SequenceWindow:
+    __slots__ = ("boot_id", "highest", "mask")
+
+    def __init__(self, boot_id):
+        self.boot_id = boot_id
+        self.highest = 0
+        self.mask = 0
+
+    def accept(self, sequence):
+        if sequence > self.highest:
+            shift = sequence - self.highest
+            self.mask = ((self.mask << shift) | 1) & WINDOW_MASK if shift < WINDOW_BITS else 1
+            self.highest = sequence
+            return NEW
+
+        offset = self.highest - sequence
+        if offset >= WINDOW_BITS:
+            return LATE
+        bit = 1 << offset
+        if self.mask & bit:
+            return DUPLICATE
+        self.mask |= bit
+        return LATE
+
+
+# Para dispositivos que não enviam sequência (ex.: cliente Rust): timestamp + hash
+class TimestampWindow:
+    __slots__ = ("timestamp", "hashes")
+
+    def __init__(self):
+        self.timestamp = 0
+        self.hashes = []
+
+    def accept(self, reading):
+        if reading.timestamp < self.timestamp:
+            return LATE
+
+        digest = hash((reading.value, reading.sensor_type, reading.unit))
+        if reading.timestamp > self.timestamp:
+            self.timestamp = reading.timestamp
+            self.hashes = [digest]
+            return NEW
+
+        if digest in self.hashes:
+            return DUPLICATE
+        if len(self.hashes) < MAX_HASHES_PER_TIMESTAMP:
+            self.hashes.append(digest)
+        return NEW
+
+
+# A mesma leitura pode chegar por TCP, UDP, RabbitMQ (fanout) e stream; só a
+# primeira cópia da leitura mais recente de cada sensor substitui o valor atual
+class ReadingDeduplicator:
+    def __init__(self):
+        self.windows = {}
+        self.lock = threading.Lock()
+        self.counters = {NEW: 0, LATE: 0, DUPLICATE: 0}
+
+    def check(self, reading):
+        with self.lock:
+            verdict = self._check(reading)
+            self.counters[verdict] += 1
+            return verdict
+
+    def _check(self, reading):
+        window = self.windows.get(reading.sensor_id)
+
+        if not reading.sequence:
+            if not isinstance(window, TimestampWindow):
+                window = self.windows[reading.sensor_id] = TimestampWindow()
+            return window.accept(reading)
+
+        if not isinstance(window, SequenceWindow) or reading.boot_id > window.boot_id:
+            # Dispositivo reiniciou (boot_id maior): a numeração recomeça
+            window = self.windows[reading.sensor_id] = SequenceWindow(reading.boot_id)
+        elif reading.boot_id < window.boot_id:
+            return LATE
+
+        return window.accept(reading.sequence)
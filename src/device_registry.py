@@ -0,0 +1,133 @@
+import itertools
+import sys
+import threading
+
+from proto.sensor_data_pb2 import SensorReading
+
+# Valores de metadata que se repetem entre dispositivos (mesmo host, mesma porta)
+# e por isso são internados; os demais (ex.: estatísticas de borda) são guardados como vieram
+INTERNED_METADATA = frozenset(("address", "device_ip", "grpc_port"))
+
+def reading_from_fields(fields):
+    sensor_id, location, sensor_type, value, unit, timestamp, sequence, boot_id, metadata = fields
+    return SensorReading(
+        sensor_id=sensor_id,
+        location=location,
+        sensor_type=sensor_type,
+        value=value,
+        unit=unit,
+        timestamp=timestamp,
+        sequence=sequence,
+        boot_id=boot_id,
+        metadata=dict(zip(metadata[::2], metadata[1::2])),
+    )
+
+# Registro de um dispositivo com a última leitura já desmontada em campos.
+# sensor_id, localização, unidade e endereço são strings internadas: milhares de
+# dispositivos no mesmo local ou com a mesma unidade apontam para o mesmo objeto.
+class DeviceRecord:
+    __slots__ = ("handle", "sensor_id", "address", "grpc_port", "sensor_type", "location",
+                 "unit", "value", "timestamp", "sequence", "boot_id", "metadata")
+
+    def __init__(self, handle, sensor_id):
+        self.handle = handle
+        self.sensor_id = sensor_id
+
+    def update(self, reading, address):
+        metadata = reading.metadata
+        self.address = sys.intern(address)
+        self.grpc_port = int(metadata.get("grpc_port", 50051))
+        self.sensor_type = reading.sensor_type
+        self.location = sys.intern(reading.location)
+        self.unit = sys.intern(reading.unit)
+        self.value = reading.value
+        self.timestamp = reading.timestamp
+        self.sequence = reading.sequence
+        self.boot_id = reading.boot_id
+        # Tupla plana (chave, valor, chave, valor, ...): bem menor que um dict ou tupla de pares
+        self.metadata = tuple(itertools.chain.from_iterable(
+            (sys.intern(key), sys.intern(value) if key in INTERNED_METADATA else value)
+            for key, value in metadata.items()
+        ))
+
+    def fields(self):
+        # Cópia barata dos campos da leitura, feita sob o lock do registro
+        return (self.sensor_id, self.location, self.sensor_type, self.value, self.unit,
+                self.timestamp, self.sequence, self.boot_id, self.metadata)
+
+    def to_reading(self):
+        return reading_from_fields(self.fields())
+
+    def device_info(self):
+        return {"address": self.address, "grpc_port": self.grpc_port}
+
+
+# Dispositivos conhecidos pelo gateway. Cada dispositivo recebe um handle inteiro
+# estável (índice em records) na primeira leitura; as seguintes atualizam o mesmo
+# registro no lugar, sem alocar dict nem guardar o SensorReading inteiro.
+class DeviceRegistry:
+    def __init__(self):
+        self.handles = {}
+        self.records = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def update(self, reading, address):
+        with self.lock:
+            handle = self.handles.get(reading.sensor_id)
+            if handle is None:
+                sensor_id = sys.intern(reading.sensor_id)
+                handle = self.handles[sensor_id] = len(self.records)
+                self.records.append(DeviceRecord(handle, sensor_id))
+            record = self.records[handle]
+            record.update(reading, address)
+            return record
+
+    def handle(self, sensor_id):
+        return self.handles.get(sensor_id)
+
+    def _get(self, sensor_id):
+        handle = self.handles.get(sensor_id)
+        return self.records[handle] if handle is not None else None
+
+    # Registros são atualizados no lugar: a leitura deles acontece sob o mesmo lock
+    def device_info(self, sensor_id):
+        with self.lock:
+            record = self._get(sensor_id)
+            return record.device_info() if record else None
+
+    def reading(self, sensor_id):
+        with self.lock:
+            record = self._get(sensor_id)
+            fields = record.fields() if record else None
+        return reading_from_fields(fields) if fields else None
+
+    def select(self, sensor_id=None, location=None):
+        with self.lock:
+            return {
+                record.handle for record in self.records
+                if (sensor_id is None or record.sensor_id == sensor_id)
+                and (location is None or record.location == location)
+            }
+
+    def describe(self, handles):
+        described = {}
+        with self.lock:
+            for handle in handles:
+                if 0 <= handle < len(self.records):
+                    record = self.records[handle]
+                    described[handle] = (record.sensor_id, record.location, record.unit, record.address)
+        return described
+
+    def readings(self, sensor_ids=None, location=None):
+        # Sob o lock só copia os campos; os SensorReading são remontados fora dele
+        # para não travar os workers de ingestão numa consulta da frota inteira
+        with self.lock:
+            if sensor_ids is None:
+                records = self.records
+            else:
+                records = [self.records[self.handles[s]] for s in sensor_ids if s in self.handles]
+            snapshot = [record.fields() for record in records if location is None or record.location == location]
+        return {fields[0]: reading_from_fields(fields) for fields in snapshot}
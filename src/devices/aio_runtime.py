@@ -0,0 +1,17 @@
+import asyncio
+import threading
+
+_loop = None
+_lock = threading.Lock()
+
+# Um único event loop por processo, compartilhado pelos servidores grpc.aio de
+# todos os dispositivos (em vez de um servidor com pool de threads por dispositivo)
+def shared_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="aio-runtime")
+            thread.daemon = True
+            thread.start()
+        return _loop
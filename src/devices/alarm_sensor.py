@@ -4,8 +4,8 @@ from proto.sensor_data_pb2 import SensorReading, DeviceType
 from devices.default_device import DeviceClient
 
 class AlarmSensor(DeviceClient):
-    def __init__(self, sensor_id: str, location: str, interval=30, discovery_group='228.0.0.8', discovery_port=6791):
-        super().__init__(sensor_id, location, interval, discovery_group, discovery_port)
+    def __init__(self, sensor_id: str, location: str, interval=30, discovery_group='228.0.0.8', discovery_port=6791, **kwargs):
+        super().__init__(sensor_id, location, interval, discovery_group, discovery_port, **kwargs)
         self.state = 0.0
         self.turn_off_alarm_interval = 10
 
@@ -24,14 +24,12 @@ class AlarmSensor(DeviceClient):
     def ring_alarm(self):
         self.state = 1.0 # Movimento detectado
         reading = self._generate_reading()
-        reading.metadata["grpc_port"] = str(self.grpc_port)
-        self.publish_rabbitmq(reading.SerializeToString())
+        self.publish_reading(reading)
 
     def turn_off(self):
         self.state = 0.0 # Sem movimento
         reading = self._generate_reading()
-        reading.metadata["grpc_port"] = str(self.grpc_port)
-        self.publish_rabbitmq(reading.SerializeToString())
+        self.publish_reading(reading)
 
     def _monitor_loop(self):
         super()._monitor_loop()
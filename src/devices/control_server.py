@@ -0,0 +1,37 @@
+import asyncio
+
+from proto import sensor_data_pb2
+from proto import sensor_data_pb2_grpc
+
+# Servicers do servidor gRPC de controle do dispositivo. Ficam fora de
+# default_device para que só dispositivos que sobem o servidor importem o grpc.
+
+# handle_command devolve a resposta do dispositivo (ex.: plano inválido) ou None
+# quando o comando não tem resultado próprio
+def command_response(response):
+    if response is None:
+        return sensor_data_pb2.CommandResponse(success=True, message="Comando recebido")
+    return response
+
+class DeviceControlServicer(sensor_data_pb2_grpc.DeviceControlServicer):
+    def __init__(self, device_client):
+        self.device_client = device_client
+
+    def SendCommand(self, request, context):
+        return command_response(self.device_client.handle_command(request))
+
+    def SendTcpData(self, request, context):
+        self.device_client.send_tcp_data()
+        return sensor_data_pb2.CommandResponse(success=True, message="Dados TCP enviados")
+
+class AioDeviceControlServicer(sensor_data_pb2_grpc.DeviceControlServicer):
+    def __init__(self, device_client):
+        self.device_client = device_client
+
+    async def SendCommand(self, request, context):
+        return command_response(self.device_client.handle_command(request))
+
+    async def SendTcpData(self, request, context):
+        # O envio TCP usa socket bloqueante: roda fora do event loop compartilhado
+        await asyncio.to_thread(self.device_client.send_tcp_data)
+        return sensor_data_pb2.CommandResponse(success=True, message="Dados TCP enviados")
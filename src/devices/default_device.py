@@ -1,45 +1,74 @@
+import asyncio
+import queue
+import random
+import select
 import socket
 import struct
 import threading
 import time
-import pika
+import zlib
+from collections import deque
 
-#from jwt import DecodeError
-from jwt.exceptions import JWSDecodeError
-from proto.sensor_data_pb2 import Response, GatewayAnnouncement, CommandRequest
+from google.protobuf.message import DecodeError
+from proto.sensor_data_pb2 import Response, GatewayAnnouncement, CommandRequest, DiscoveryRequest
 from proto.sensor_data_pb2 import SensorReading
 from devices.device import Device
-
-import grpc
-from concurrent import futures
+from devices.gateway_set import GatewaySet, gateway_key
 from proto import sensor_data_pb2
-from proto import sensor_data_pb2_grpc
-
-class DeviceControlServicer(sensor_data_pb2_grpc.DeviceControlServicer):
-    def __init__(self, device_client):
-        self.device_client = device_client
-
-    def SendCommand(self, request, context):
-        self.device_client.handle_command(request)
-        return sensor_data_pb2.CommandResponse(success=True, message="Comando recebido")
-
-    def SendTcpData(self, request, context):
-        self.device_client.send_tcp_data()
-        return sensor_data_pb2.CommandResponse(success=True, message="Dados TCP enviados")
+from framing import send_message, recv_message
 
+# pika e grpc são importados só quando o transporte é usado: um sensor em modo
+# stream não carrega o pika, e o grpc.aio só sobe com aio_grpc
 class DeviceClient(Device):
-    def __init__(self, sensor_id: str, location: str, interval=30, discovery_group='228.0.0.8', discovery_port=6791, grpc_port=0):
+    def __init__(self, sensor_id: str, location: str, interval=30, discovery_group='228.0.0.8', discovery_port=6791, grpc_port=0,
+                 telemetry_stream=False, edge_filter=None, discovery_solicit_port=6793, discovery_jitter=0.5,
+                 discovery_backoff_base=0.5, discovery_backoff_max=30.0, discovery_collect=0.2,
+                 health_interval=None, failover_threshold=2, gateway_ttl=180.0, replay_buffer_size=1000,
+                 aio_grpc=False):
         super().__init__(sensor_id, location)
         self.interval = interval
         self.discovery_group = discovery_group
         self.discovery_port = discovery_port
+        self.discovery_solicit_port = discovery_solicit_port
+        self.discovery_jitter = discovery_jitter
+        self.discovery_backoff_base = discovery_backoff_base
+        self.discovery_backoff_max = discovery_backoff_max
+        self.discovery_collect = discovery_collect
         self.grpc_port = grpc_port
+        # aio_grpc: servidor grpc.aio no event loop compartilhado do processo
+        self.aio_grpc = aio_grpc
+        self.grpc_server = None
+
+        # Com telemetry_stream o dispositivo não sobe servidor gRPC próprio: leituras e
+        # comandos trafegam por um único stream bidirecional aberto com o gateway
+        self.telemetry_stream = telemetry_stream
+        self.telemetry_gateway_address = None
+        self.telemetry_outbound = queue.Queue()
+        self.telemetry_connected = threading.Event()
+
+        # Filtro de borda opcional (EdgeFilter) aplicado às leituras periódicas
+        self.edge_filter = edge_filter
 
         self.tcp_gateway_address = None
         self.udp_gateway_address = None
         self.rabbitmq_host = None
         self.rabbitmq_port = None
 
+        # Gateways conhecidos e failover: o gateway atual é sondado quando passa
+        # health_interval sem nenhuma entrega confirmada (padrão: 2x o intervalo de
+        # leitura, então um dispositivo ativo quase nunca sonda) e, após failover_threshold falhas seguidas (sondas ou envios), o dispositivo
+        # troca para o melhor gateway restante. Leituras sem destino ficam no buffer
+        # e são reenviadas quando algum gateway volta a responder.
+        self.gateways = GatewaySet(self._rank_gateway, ttl=gateway_ttl)
+        self.current_gateway_id = None
+        self.health_interval = health_interval if health_interval is not None else max(30.0, 2.0 * interval)
+        self.failover_threshold = failover_threshold
+        self.consecutive_failures = 0
+        self.last_delivery = 0.0
+        self.gateway_lock = threading.Lock()
+        self.replay_buffer = deque(maxlen=replay_buffer_size)
+        self.delivery_lock = threading.RLock()
+
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
         self.connection = None
@@ -49,6 +78,12 @@ class DeviceClient(Device):
         self.running = False
         self.grpc_server_started = threading.Event()
 
+        # Sequência por dispositivo para o gateway descartar duplicatas; boot_id
+        # cresce a cada reinício para que a numeração possa recomeçar
+        self.boot_id = time.time_ns()
+        self.sequence = 0
+        self.sequence_lock = threading.Lock()
+
     def _get_local_ip(self):
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         try:
@@ -64,10 +99,16 @@ class DeviceClient(Device):
         if self.rabbitmq_host is None or self.rabbitmq_port is None:
             print(f"⚠️ [{self.sensor_id}] RabbitMQ host/port não descobertos ainda. Pulando conexão.")
             return
+
+        import pika
+
         try:
             self.connection = pika.BlockingConnection(pika.ConnectionParameters(host=self.rabbitmq_host, port=self.rabbitmq_port))
             self.channel = self.connection.channel()
             self.channel.exchange_declare(exchange=self.exchange_name, exchange_type='fanout')
+            # Com confirmações o basic_publish só volta quando o broker roteou a leitura
+            # para alguma fila; sem gateway consumindo ele levanta UnroutableError
+            self.channel.confirm_delivery()
             print(f"✅ [{self.sensor_id}] Conectado ao RabbitMQ em {self.rabbitmq_host}:{self.rabbitmq_port}")
         except pika.exceptions.AMQPConnectionError as e:
             print(f"❌ [{self.sensor_id}] Erro ao conectar ao RabbitMQ: {e}")
@@ -80,18 +121,39 @@ class DeviceClient(Device):
             self.connect_rabbitmq()
             if not self.channel:
                 print(f"❌ [{self.sensor_id}] Falha ao reconectar ao RabbitMQ. Não foi possível publicar dados.")
-                return
+                return False
+
+        import pika
+
         try:
-            self.channel.basic_publish(exchange=self.exchange_name, routing_key='', body=data)
+            self.channel.basic_publish(exchange=self.exchange_name, routing_key='', body=data, mandatory=True)
             print(f"📤 [{self.sensor_id}] Publicou dados no RabbitMQ.")
+            return True
+        except (pika.exceptions.UnroutableError, pika.exceptions.NackError) as e:
+            # Broker aceitou a mensagem mas nenhuma fila de gateway a recebeu (gateway
+            # caiu ou está reiniciando): conta como falha de envio, o canal segue válido
+            print(f"❌ [{self.sensor_id}] Leitura não entregue a nenhum gateway pelo RabbitMQ: {type(e).__name__}")
+            return False
         except Exception as e:
             print(f"❌ [{self.sensor_id}] Erro ao publicar dados no RabbitMQ: {e}")
+            self._close_rabbitmq()
+            return False
+
+    def _close_rabbitmq(self):
+        try:
             if self.connection:
                 self.connection.close()
-            self.connection = None
-            self.channel = None
+        except Exception:
+            pass
+        self.connection = None
+        self.channel = None
 
     def start_grpc_server(self):
+        import grpc
+        from concurrent import futures
+        from proto import sensor_data_pb2_grpc
+        from devices.control_server import DeviceControlServicer
+
         server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
         sensor_data_pb2_grpc.add_DeviceControlServicer_to_server(DeviceControlServicer(self), server)
         port = server.add_insecure_port(f'[::]:{self.grpc_port}')
@@ -101,52 +163,363 @@ class DeviceClient(Device):
         self.grpc_server_started.set() # Sinaliza que o servidor iniciou
         server.wait_for_termination()
 
-    def discover_gateway(self):
-        self.grpc_server_started.wait()
-        
-        # Procura um gateway para se conectar
+    async def start_grpc_server_aio(self):
+        import grpc
+        from proto import sensor_data_pb2_grpc
+        from devices.control_server import AioDeviceControlServicer
+
+        server = grpc.aio.server()
+        sensor_data_pb2_grpc.add_DeviceControlServicer_to_server(AioDeviceControlServicer(self), server)
+        self.grpc_port = server.add_insecure_port(f'[::]:{self.grpc_port}')
+        await server.start()
+        self.grpc_server = server
+        print(f"🔑 [{self.sensor_id}] Servidor gRPC (aio) iniciado na porta {self.grpc_port}")
+        self.grpc_server_started.set()
+        await server.wait_for_termination()
+
+    def _aio_server_done(self, future):
+        # Roda no loop compartilhado quando o servidor aio termina. Uma falha (ex.:
+        # porta ocupada) não pode deixar quem espera grpc_server_started travado
+        if not future.cancelled() and future.exception() is not None:
+            print(f"❌ [{self.sensor_id}] Servidor gRPC (aio) falhou: {future.exception()}")
+        self.grpc_server_started.set()
+
+    def _use_gateway(self, announcement):
+        self.current_gateway_id = gateway_key(announcement)
+        self.tcp_gateway_address = (announcement.gateway_ip, announcement.tcp_port)
+        self.udp_gateway_address = (announcement.gateway_ip, announcement.udp_port)
+        self.command_gateway_address = (announcement.gateway_ip, announcement.command_port)
+        self.rabbitmq_host = announcement.rabbitmq_host
+        self.rabbitmq_port = announcement.rabbitmq_port
+        # Porta 0: gateway sem telemetria ou com o teto de streams atingido; o
+        # dispositivo volta ao RabbitMQ (sem servidor gRPC próprio, não recebe comandos)
+        if announcement.telemetry_port:
+            self.telemetry_gateway_address = (announcement.gateway_ip, announcement.telemetry_port)
+        else:
+            self.telemetry_gateway_address = None
+
+    def _rank_gateway(self, announcement):
+        # Prefere o gateway cujo shard atende este dispositivo e, depois, o menos carregado
+        preferred = announcement.shard_count > 1 and \
+            zlib.crc32(self.sensor_id.encode()) % announcement.shard_count == announcement.shard
+        return (0 if preferred else 1, announcement.load)
+
+    def _discovery_sockets(self):
         listen_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
         listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         listen_sock.bind(('', self.discovery_port))
         
         mreq = struct.pack("4sl", socket.inet_aton(self.discovery_group), socket.INADDR_ANY)
         listen_sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-        listen_sock.settimeout(1.0)
+
+        solicit_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        solicit_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        solicit_sock.bind(('', 0))
+        return listen_sock, solicit_sock
+
+    def _read_announcement(self, sock):
+        # None se o pacote não é um GatewayAnnouncement
+        data, _ = sock.recvfrom(1024)
+        announcement = GatewayAnnouncement()
+        try:
+            announcement.ParseFromString(data)
+        except DecodeError:
+            return None
+        return announcement
+
+    def discover_gateway(self):
+        self.grpc_server_started.wait()
+        
+        # Procura um gateway para se conectar: escuta os anúncios periódicos e também
+        # pede descoberta ativamente, recebendo a resposta unicast no solicit_sock
+        listen_sock, solicit_sock = self._discovery_sockets()
+
+        nonce = random.getrandbits(63)
+        request = DiscoveryRequest(device_id=self.sensor_id, nonce=nonce).SerializeToString()
+        candidates = {}
+        attempt = 0
 
         print(f"🔎 [{self.sensor_id}] Procurando gateway em {self.discovery_group}:{self.discovery_port}...")
 
+        # Espalha a partida quando muitos dispositivos iniciam juntos
+        time.sleep(random.uniform(0, self.discovery_jitter))
+
         while self.running and self.tcp_gateway_address is None:
             try:
-                data, _ = listen_sock.recvfrom(1024)
-                announcement = GatewayAnnouncement()
-                announcement.ParseFromString(data)
-                
-                self.tcp_gateway_address = (announcement.gateway_ip, announcement.tcp_port)
-                self.udp_gateway_address = (announcement.gateway_ip, announcement.udp_port)
-                self.command_gateway_address = (announcement.gateway_ip, announcement.command_port)
-                self.rabbitmq_host = announcement.rabbitmq_host
-                self.rabbitmq_port = announcement.rabbitmq_port
-
-                print(f"✅ [{self.sensor_id}] Gateway encontrado em {self.tcp_gateway_address}")
-            except socket.timeout:
-                continue
-            except JWSDecodeError:
-                print(f"⚠️  [{self.sensor_id}] Recebido pacote de descoberta malformado. Ignorando.")
-                continue
+                solicit_sock.sendto(request, (self.discovery_group, self.discovery_solicit_port))
+
+                # Backoff exponencial com jitter entre pedidos sem resposta
+                backoff = min(self.discovery_backoff_max, self.discovery_backoff_base * 2 ** attempt)
+                deadline = time.monotonic() + backoff * random.uniform(0.5, 1.5)
+                attempt += 1
+
+                first_answer = None
+                while self.running:
+                    now = time.monotonic()
+                    # Depois da primeira resposta, espera um pouco por outros gateways para comparar
+                    if first_answer is not None:
+                        deadline = min(deadline, first_answer + self.discovery_collect)
+                    if now >= deadline:
+                        break
+
+                    readable, _, _ = select.select([listen_sock, solicit_sock], [], [], deadline - now)
+                    for sock in readable:
+                        announcement = self._read_announcement(sock)
+                        if announcement is None:
+                            print(f"⚠️  [{self.sensor_id}] Recebido pacote de descoberta malformado. Ignorando.")
+                            continue
+                        # Resposta unicast precisa ecoar o nonce deste pedido; anúncio periódico tem nonce 0
+                        if announcement.nonce != (nonce if sock is solicit_sock else 0):
+                            continue
+                        candidates[self.gateways.remember(announcement)] = announcement
+                        if first_answer is None:
+                            first_answer = time.monotonic()
+
+                if candidates:
+                    best = self.gateways.best()
+                    self._use_gateway(best)
+                    print(f"✅ [{self.sensor_id}] Gateway encontrado em {self.tcp_gateway_address} "
+                          f"(carga {best.load}, {len(candidates)} candidato(s))")
             except Exception as e:
                 if self.running:
                     print(f"⚠️  [{self.sensor_id}] Erro durante a descoberta: {e}")
                     time.sleep(5)
         
+        solicit_sock.close()
         listen_sock.close()
 
+    def watch_gateways(self):
+        # Continua ouvindo anúncios após a descoberta e, se nada foi entregue no
+        # último health_interval, sonda o gateway atual com um DiscoveryRequest
+        # unicast; a resposta prova que ele está vivo
+        listen_sock, probe_sock = self._discovery_sockets()
+        pending_probe = None
+        next_probe = time.monotonic() + self.health_interval
+
+        while self.running:
+            try:
+                readable, _, _ = select.select([listen_sock, probe_sock], [], [], max(0, next_probe - time.monotonic()))
+                for sock in readable:
+                    announcement = self._read_announcement(sock)
+                    if announcement is None:
+                        continue
+                    if sock is probe_sock:
+                        # Resposta atrasada de uma sonda anterior (ou forjada) não prova nada
+                        if pending_probe is None or announcement.nonce != pending_probe:
+                            continue
+                    elif announcement.nonce:
+                        continue
+                    key = self.gateways.remember(announcement)
+                    if sock is probe_sock and key == self.current_gateway_id:
+                        pending_probe = None
+                        self._gateway_answered()
+
+                now = time.monotonic()
+                if now < next_probe:
+                    continue
+                next_probe = now + self.health_interval
+
+                if pending_probe is not None:
+                    self._report_gateway_failure("sonda de saúde sem resposta")
+                elif not self.consecutive_failures and now - self.last_delivery < self.health_interval:
+                    # Entrega recente já provou o gateway: adia a sonda
+                    next_probe = self.last_delivery + self.health_interval
+                    continue
+
+                pending_probe = random.getrandbits(63)
+                probe = DiscoveryRequest(device_id=self.sensor_id, nonce=pending_probe).SerializeToString()
+                if self.tcp_gateway_address:
+                    probe_sock.sendto(probe, (self.tcp_gateway_address[0], self.discovery_solicit_port))
+                if self.consecutive_failures:
+                    # Gateway atual instável: pergunta também ao grupo por alternativas
+                    probe_sock.sendto(probe, (self.discovery_group, self.discovery_solicit_port))
+            except Exception as e:
+                if self.running:
+                    print(f"⚠️  [{self.sensor_id}] Erro ao monitorar gateways: {e}")
+                    time.sleep(1)
+
+        probe_sock.close()
+        listen_sock.close()
+
+    def _gateway_answered(self):
+        # Sonda respondida: o gateway está vivo. Sem leituras pendentes isso basta
+        # para zerar as falhas; com leituras no buffer elas só zeram se o reenvio
+        # for entregue (_delivery_ok), senão um gateway que responde sondas mas não
+        # recebe leituras nunca sofreria failover
+        with self.delivery_lock:
+            if self.replay_buffer:
+                self._replay_buffered()
+            else:
+                self._delivery_ok()
+
+    def _delivery_ok(self):
+        # Só chamado com prova de que o gateway recebeu: publicação confirmada e
+        # roteada, resposta TCP, envio pelo stream aberto ou resposta à sonda
+        with self.gateway_lock:
+            self.consecutive_failures = 0
+            self.last_delivery = time.monotonic()
+            self.gateways.mark_success(self.current_gateway_id)
+
+    def _report_gateway_failure(self, reason):
+        with self.gateway_lock:
+            self.consecutive_failures += 1
+            print(f"⚠️  [{self.sensor_id}] Falha com o gateway {self.current_gateway_id}: {reason} "
+                  f"({self.consecutive_failures}/{self.failover_threshold})")
+            if self.consecutive_failures < self.failover_threshold:
+                return
+            self.consecutive_failures = 0
+            self.gateways.mark_failure(self.current_gateway_id)
+            best = self.gateways.best()
+            previous = self.current_gateway_id
+            if best is not None:
+                self._use_gateway(best)
+
+        if best is None:
+            print(f"⚠️  [{self.sensor_id}] Nenhum gateway alternativo conhecido. Aguardando anúncios...")
+        elif self.current_gateway_id != previous:
+            print(f"🔀 [{self.sensor_id}] Failover: {previous} -> {self.current_gateway_id}")
+        self._reset_transports()
+
+    def _reset_transports(self):
+        # Força reconexão (RabbitMQ e stream) com o gateway escolhido
+        with self.delivery_lock:
+            self._close_rabbitmq()
+        self.telemetry_connected.clear()
+
+    def _telemetry_requests(self):
+        while self.running and self.telemetry_connected.is_set():
+            try:
+                envelope = self.telemetry_outbound.get(timeout=1)
+            except queue.Empty:
+                continue
+            yield envelope
+
+    def run_telemetry_stream(self):
+        import grpc
+        from proto import sensor_data_pb2_grpc
+
+        while self.running:
+            if self.telemetry_gateway_address is None:
+                print(f"⚠️  [{self.sensor_id}] Gateway não anunciou porta de telemetria. Usando RabbitMQ.")
+                return
+
+            host, port = self.telemetry_gateway_address
+            channel = grpc.insecure_channel(f"{host}:{port}")
+            stub = sensor_data_pb2_grpc.GatewayTelemetryStub(channel)
+            try:
+                # A primeira leitura identifica o dispositivo para o gateway
+                reading = self._prepare_reading(self._generate_reading())
+                self.telemetry_outbound.put(sensor_data_pb2.DeviceEnvelope(reading=reading))
+                self.telemetry_connected.set()
+                print(f"🔌 [{self.sensor_id}] Stream de telemetria aberto com {host}:{port}")
+                for envelope in stub.Connect(self._telemetry_requests()):
+                    self._handle_gateway_envelope(envelope)
+            except grpc.RpcError as e:
+                if self.running:
+                    print(f"⚠️  [{self.sensor_id}] Stream de telemetria caiu: {e.code()}")
+            finally:
+                self.telemetry_connected.clear()
+                channel.close()
+
+            if self.running:
+                time.sleep(5)
+
+    def _handle_gateway_envelope(self, envelope):
+        kind = envelope.WhichOneof("payload")
+        if kind == "send_tcp_data":
+            self.publish_reading(self._generate_reading(), force=True)
+            response = sensor_data_pb2.CommandResponse(success=True, message="Dados enviados pelo stream")
+        elif kind == "command":
+            response = self.handle_command(envelope.command)
+            if response is None:
+                response = sensor_data_pb2.CommandResponse(success=True, message="Comando recebido")
+        else:
+            response = sensor_data_pb2.CommandResponse(success=False, message="Mensagem desconhecida")
+
+        result = sensor_data_pb2.CommandResult(command_id=envelope.command_id, response=response)
+        self.telemetry_outbound.put(sensor_data_pb2.DeviceEnvelope(command_result=result))
+
+    def _prepare_reading(self, reading: SensorReading) -> SensorReading:
+        reading.metadata["grpc_port"] = str(self.grpc_port)
+        with self.sequence_lock:
+            self.sequence += 1
+            reading.sequence = self.sequence
+        reading.boot_id = self.boot_id
+        return reading
+
+    def publish_reading(self, reading: SensorReading, force=False):
+        if self.edge_filter:
+            if force:
+                self.edge_filter.mark_sent(reading.value)
+            else:
+                reading = self.edge_filter.process(reading)
+                if reading is None:
+                    return
+        self._prepare_reading(reading)
+        self.deliver_reading(reading)
+
+    def _send_reading(self, reading: SensorReading):
+        if self.telemetry_stream and self.telemetry_connected.is_set():
+            self.telemetry_outbound.put(sensor_data_pb2.DeviceEnvelope(reading=reading))
+            print(f"📤 [{self.sensor_id}] enviou pelo stream de telemetria: {reading.value} {reading.unit}")
+            return True
+        return self.publish_rabbitmq(reading.SerializeToString())
+
+    def deliver_reading(self, reading: SensorReading):
+        with self.delivery_lock:
+            # Leituras acumuladas saem antes, preservando a ordem
+            if self.replay_buffer and not self._replay_buffered():
+                self._buffer_reading(reading)
+                self._report_gateway_failure("falha ao reenviar leituras acumuladas")
+                return
+            if not self._send_reading(reading):
+                self._buffer_reading(reading)
+                self._report_gateway_failure("falha ao publicar leitura")
+                return
+            self._delivery_ok()
+
+    def _buffer_reading(self, reading):
+        # Toda escrita no buffer passa pelo delivery_lock: um replay em curso em outra
+        # thread (popleft) não pode intercalar com o append e quebrar a ordem
+        with self.delivery_lock:
+            self.replay_buffer.append(reading)
+
+    def _replay_buffered(self):
+        replayed = 0
+        while self.replay_buffer:
+            if not self._send_reading(self.replay_buffer[0]):
+                return False
+            self.replay_buffer.popleft()
+            replayed += 1
+            if replayed == 1:
+                self._delivery_ok()
+        if replayed:
+            print(f"🔁 [{self.sensor_id}] Reenviou {replayed} leituras acumuladas durante a falha do gateway")
+        return True
+
     def _monitor_loop(self):
-        grpc_thread = threading.Thread(target=self.start_grpc_server)
-        grpc_thread.daemon = True
-        grpc_thread.start()
+        if self.telemetry_stream:
+            self.grpc_server_started.set()
+        elif self.aio_grpc:
+            from devices.aio_runtime import shared_loop
+            server = asyncio.run_coroutine_threadsafe(self.start_grpc_server_aio(), shared_loop())
+            server.add_done_callback(self._aio_server_done)
+        else:
+            grpc_thread = threading.Thread(target=self.start_grpc_server)
+            grpc_thread.daemon = True
+            grpc_thread.start()
 
         self.discover_gateway()
 
+        watch_thread = threading.Thread(target=self.watch_gateways)
+        watch_thread.daemon = True
+        watch_thread.start()
+
+        if self.telemetry_stream:
+            telemetry_thread = threading.Thread(target=self.run_telemetry_stream)
+            telemetry_thread.daemon = True
+            telemetry_thread.start()
+
     def _generate_reading(self) -> SensorReading:
         pass
 
@@ -156,43 +529,44 @@ class DeviceClient(Device):
     def send_tcp_data(self):
         self.grpc_server_started.wait() 
 
-        reading = self._generate_reading()
-        reading.metadata["grpc_port"] = str(self.grpc_port)
+        reading = self._prepare_reading(self._generate_reading())
+        if self.edge_filter:
+            # Envio sob demanda ignora o filtro, mas conta como último valor enviado
+            self.edge_filter.mark_sent(reading.value)
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.connect(self.tcp_gateway_address)
-                
-                # Serializa mensagem
-                data = reading.SerializeToString()
-                msg_length = struct.pack('!I', len(data))
-                s.sendall(msg_length + data)
-                
-                response_len_data = s.recv(4)
-                if not response_len_data:
+
+                # recv_message completa leituras parciais da resposta e limita o tamanho do frame
+                send_message(s, reading)
+                response = recv_message(s, Response)
+                if response is None:
                     print(f"⚠️  [{self.sensor_id}] Nenhuma resposta recebida do gateway.")
                     return
-
-                response_length = struct.unpack('!I', response_len_data)[0]
-
-                response_data = s.recv(response_length)
-                response = Response()
-                response.ParseFromString(response_data)
+                self._delivery_ok()
 
                 if response.success:
                     print(f"📤 [{self.sensor_id}] enviou: {reading.value} {reading.unit}. Gateway respondeu: '{response.message}'")
+                elif response.retry_after_ms:
+                    # Gateway vivo mas sobrecarregado: a leitura fica no buffer e vai no próximo envio bem-sucedido
+                    self._buffer_reading(reading)
+                    print(f"⏳ [{self.sensor_id}] Gateway sobrecarregado, reenvio em {response.retry_after_ms} ms ou mais")
                 else:
                     print(f"⚠️  [{self.sensor_id}] Gateway retornou um erro: '{response.message}'")
 
         except ConnectionRefusedError:
             print(f"⚠️  [{self.sensor_id}] Conexão TCP recusada. O gateway está offline?")
+            self._buffer_reading(reading)
+            self._report_gateway_failure("conexão TCP recusada")
         except Exception as e:
             print(f"⚠️  [{self.sensor_id}] Erro no envio TCP: {e}")
+            self._buffer_reading(reading)
+            self._report_gateway_failure("erro no envio TCP")
 
     def send_udp_data(self):
         self.grpc_server_started.wait() 
 
-        reading = self._generate_reading()
-        reading.metadata["grpc_port"] = str(self.grpc_port)
+        reading = self._prepare_reading(self._generate_reading())
         if not self.udp_gateway_address:
             print(f"⚠️  [{self.sensor_id}] Endereço UDP do gateway não encontrado. Não é possível enviar dados.")
             return
@@ -202,5 +576,5 @@ class DeviceClient(Device):
             print(f"📤 [{self.sensor_id}] enviou via UDP para {self.udp_gateway_address}: {reading.value} {reading.unit}")
         except Exception as e:
             print(f"⚠️  [{self.sensor_id}] Erro no envio UDP: {e}")
-            self.udp_gateway_address = None
+            self._report_gateway_failure("erro no envio UDP")
 
@@ -0,0 +1,78 @@
+import time
+from proto.sensor_data_pb2 import SensorReading
+
+class WindowStats:
+    __slots__ = ("count", "minimum", "maximum", "total")
+
+    def __init__(self):
+        self.count = 0
+        self.minimum = float("inf")
+        self.maximum = float("-inf")
+        self.total = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        self.total += value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+# Processamento na borda antes de publicar uma leitura:
+#  - deadband: só envia se o valor variou mais que o limiar desde o último envio
+#  - window: agrega as amostras por N segundos e envia uma única leitura (média)
+#  - heartbeat: envia ao menos uma leitura a cada N segundos, mesmo sem variação
+# As leituras enviadas levam min/max/média/contagem das amostras desde o último envio.
+class EdgeFilter:
+    def __init__(self, deadband=0.0, window=0.0, heartbeat=300.0):
+        self.deadband = deadband
+        self.window = window
+        self.heartbeat = heartbeat
+
+        self.stats = WindowStats()
+        self.window_stats = WindowStats()
+        self.window_start = None
+        self.last_sent_value = None
+        self.last_sent_time = None
+        self.suppressed = 0
+
+    def process(self, reading: SensorReading, now=None):
+        now = time.monotonic() if now is None else now
+        self.stats.add(reading.value)
+
+        if self.window:
+            if self.window_start is None:
+                self.window_start = now
+            self.window_stats.add(reading.value)
+            if now - self.window_start < self.window:
+                self.suppressed += 1
+                return None
+            reading.value = self.window_stats.mean
+            self.window_stats = WindowStats()
+            self.window_start = now
+
+        if not self._should_send(reading.value, now):
+            self.suppressed += 1
+            return None
+
+        reading.metadata["edge_min"] = str(self.stats.minimum)
+        reading.metadata["edge_max"] = str(self.stats.maximum)
+        reading.metadata["edge_mean"] = str(round(self.stats.mean, 4))
+        reading.metadata["edge_count"] = str(self.stats.count)
+        self.mark_sent(reading.value, now)
+        return reading
+
+    def mark_sent(self, value, now=None):
+        self.last_sent_value = value
+        self.last_sent_time = time.monotonic() if now is None else now
+        self.stats = WindowStats()
+
+    def _should_send(self, value, now):
+        if self.last_sent_value is None:
+            return True
+        if self.heartbeat and now - self.last_sent_time >= self.heartbeat:
+            return True
+        return abs(value - self.last_sent_value) > self.deadband
@@ -0,0 +1,63 @@
+import threading
+import time
+
+class KnownGateway:
+    __slots__ = ("announcement", "last_seen", "failures")
+
+    def __init__(self, announcement, now):
+        self.announcement = announcement
+        self.last_seen = now
+        self.failures = 0
+
+
+def gateway_key(announcement):
+    return announcement.gateway_id or f"{announcement.gateway_ip}:{announcement.tcp_port}"
+
+
+# Conjunto de gateways conhecidos pelo dispositivo, alimentado pelos anúncios e
+# respostas de descoberta. Gateways que não anunciam há mais de ttl segundos
+# saem da disputa; entre os demais vence quem falhou menos e, depois, rank_fn.
+class GatewaySet:
+    def __init__(self, rank_fn, ttl=180.0):
+        self.rank_fn = rank_fn
+        self.ttl = ttl
+        self.gateways = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.gateways)
+
+    def remember(self, announcement, now=None):
+        now = time.monotonic() if now is None else now
+        key = gateway_key(announcement)
+        with self.lock:
+            known = self.gateways.get(key)
+            if known is None:
+                self.gateways[key] = KnownGateway(announcement, now)
+            else:
+                # Anunciar só prova que o gateway está vivo, não que recebe leituras:
+                # as falhas só zeram com uma entrega bem-sucedida (mark_success)
+                known.announcement = announcement
+                known.last_seen = now
+        return key
+
+    def mark_success(self, key):
+        with self.lock:
+            known = self.gateways.get(key)
+            if known:
+                known.failures = 0
+
+    def mark_failure(self, key):
+        with self.lock:
+            known = self.gateways.get(key)
+            if known:
+                known.failures += 1
+
+    def best(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            fresh = [g for g in self.gateways.values() if now - g.last_seen < self.ttl]
+            if not fresh:
+                return None
+            best = min(fresh, key=lambda g: (g.failures, self.rank_fn(g.announcement)))
+            return best.announcement
@@ -3,18 +3,31 @@ import time
 from proto.sensor_data_pb2 import DeviceType, DeviceCommand, CommandResponse, CommandRequest
 from proto.sensor_data_pb2 import SensorReading
 from devices.default_device import DeviceClient
+from semaphore_timing import SignalTiming, PLAN_COMMAND
 
 class Semaphore(DeviceClient):
-    def __init__(self, sensor_id: str, location: str, interval=30, discovery_group='228.0.0.8', discovery_port=6791):
-        super().__init__(sensor_id, location, interval, discovery_group, discovery_port)
+    def __init__(self, sensor_id: str, location: str, interval=30, discovery_group='228.0.0.8', discovery_port=6791, **kwargs):
+        super().__init__(sensor_id, location, interval, discovery_group, discovery_port, **kwargs)
 
-        self.state = "verde"
         self.state_lock = threading.Lock()
         self.semaphore_color_map = {"vermelho":0, "amarelo":1, "verde":2}
         self.intervals = {"vermelho": self.interval, "verde":self.interval, "amarelo":3}
 
-        self._thread_semaphore = threading.Thread(target=self._semaphore_loop, daemon=True)
-    
+        # O estado é calculado a partir do relógio, sem thread por semáforo. Até o
+        # gateway enviar um plano coordenado, vale um plano local a partir da criação.
+        self.timing = SignalTiming(**self.intervals, epoch=time.time())
+        # Troca manual de luz: (estado, até quando) — vale até o fim da fase atual do plano
+        self.override = None
+
+    @property
+    def state(self):
+        now = time.time()
+        with self.state_lock:
+            if self.override and now < self.override[1]:
+                return self.override[0]
+            self.override = None
+            return self.timing.phase(now)[0]
+
     def _generate_reading(self) -> SensorReading:
         reading = SensorReading()
         reading.sensor_id = self.sensor_id
@@ -23,53 +36,61 @@ class Semaphore(DeviceClient):
         reading.value = self.semaphore_color_map[self.state]
         reading.timestamp = int(time.time())
         reading.metadata["device_ip"] = self._get_local_ip()
+        if self.timing.plan_id:
+            reading.metadata["plan_id"] = self.timing.plan_id
         return reading
-    
-    def _next_state(self):
-        match self.state:
-            case "vermelho":
-                self.state = "amarelo"
-            case "amarelo":
-                self.state = "verde"
-            case "verde": 
-                self.state = "vermelho"
-    
+
     def handle_command(self, command: CommandRequest):
         super().handle_command(command)
         command_str = command.command
         if command_str in ["vermelho", "amarelo", "verde"]:
-            self.SetSemaphoreLight(command_str)
+            return self.SetSemaphoreLight(command_str)
         if command_str.isdigit():
-            self.setSemaphoreInterval(command_str)
+            return self.setSemaphoreInterval(command_str)
+        if command_str == PLAN_COMMAND:
+            return self.applySemaphorePlan(command.params)
+        return None
 
     def SetSemaphoreLight(self, request):
+        now = time.time()
         with self.state_lock:
-            self.state = request
-        print(f"🚦 [{self.sensor_id}] Semáforo atualizado:", self.state)
+            _, remaining = self.timing.phase(now)
+            self.override = (request, now + remaining)
+        print(f"🚦 [{self.sensor_id}] Semáforo atualizado:", request)
         return CommandResponse(success=True, message=f"Luz do semáforo alterada para {request}")
-    
+
     def setSemaphoreInterval(self, request):
-        self.intervals['vermelho'] = int(request)
-        self.intervals['verde'] = int(request)
+        # Intervalo manual troca o plano coordenado por um plano local
+        intervals = dict(self.intervals, vermelho=int(request), verde=int(request))
+        try:
+            timing = SignalTiming(**intervals, epoch=time.time())
+        except ValueError as e:
+            print(f"⚠️  [{self.sensor_id}] Intervalo de semáforo inválido: {e}")
+            return CommandResponse(success=False, message=f"Intervalo inválido: {e}")
+        self.intervals = intervals
+        with self.state_lock:
+            self.timing = timing
         print(f"🚦 [{self.sensor_id}] Intervalo do semáforo atualizado:", request, 'segundos')
         return CommandResponse(success=True, message=f"Intervalo do semáforo atualizado para {request}s")
-    
-    def _semaphore_loop(self):
-        while self.running:
-            with self.state_lock:
-                self._next_state()
-                sleep_time = self.intervals[self.state]
-            time.sleep(sleep_time)
+
+    def applySemaphorePlan(self, params):
+        try:
+            timing = SignalTiming.from_params(params)
+        except ValueError as e:
+            print(f"⚠️  [{self.sensor_id}] Plano de semáforo inválido: {e}")
+            return CommandResponse(success=False, message=f"Plano inválido: {e}")
+        with self.state_lock:
+            self.timing = timing
+            self.override = None
+        print(f"🚦 [{self.sensor_id}] Plano '{timing.plan_id}' aplicado: ciclo {timing.cycle:.0f}s, offset {timing.offset:.0f}s")
+        return CommandResponse(success=True, message=f"Plano {timing.plan_id} aplicado")
 
     def _monitor_loop(self):
         super()._monitor_loop()
-        # inicializa thread de atualizar o semáforo
-        self._thread_semaphore.start()
 
         self.connect_rabbitmq()
         self.grpc_server_started.wait()
         while self.running:
             reading = self._generate_reading()
-            reading.metadata["grpc_port"] = str(self.grpc_port)
-            self.publish_rabbitmq(reading.SerializeToString())
-            time.sleep(self.interval)  
\ No newline at end of file
+            self.publish_reading(reading)
+            time.sleep(self.interval)
@@ -5,8 +5,8 @@ from devices.default_device import DeviceClient
 
 # Sensor de temperatura TCP
 class TemperatureSensorClient(DeviceClient):
-    def __init__(self, sensor_id: str, location: str, interval=30, discovery_group='228.0.0.8', discovery_port=6791):
-        super().__init__(sensor_id, location, interval, discovery_group, discovery_port)
+    def __init__(self, sensor_id: str, location: str, interval=30, discovery_group='228.0.0.8', discovery_port=6791, **kwargs):
+        super().__init__(sensor_id, location, interval, discovery_group, discovery_port, **kwargs)
 
     def _generate_reading(self) -> SensorReading:
         reading = SensorReading()
@@ -25,8 +25,7 @@ class TemperatureSensorClient(DeviceClient):
         self.grpc_server_started.wait() 
         while self.running:
             reading = self._generate_reading()
-            reading.metadata["grpc_port"] = str(self.grpc_port) 
-            self.publish_rabbitmq(reading.SerializeToString())
+            self.publish_reading(reading)
             time.sleep(self.interval)
 
     
@@ -0,0 +1,61 @@
+import struct
+
+# Protocolo de enquadramento: 4 bytes (big-endian) com o tamanho + mensagem protobuf
+HEADER = struct.Struct('!I')
+
+# Limite padrão de um frame. Uma SensorReading tem poucas centenas de bytes; sem
+# limite, um cabeçalho corrompido ou malicioso faz o receptor tentar ler até 4 GiB.
+MAX_FRAME_SIZE = 64 * 1024
+
+class FrameTooLarge(ValueError):
+    def __init__(self, size, max_size):
+        super().__init__(f"Frame de {size} bytes excede o limite de {max_size} bytes")
+        self.size = size
+        self.max_size = max_size
+
+def recv_exact(conn, n):
+    # Caso comum: um recv traz tudo e volta sem cópia
+    data = conn.recv(n)
+    if len(data) == n:
+        return data
+    if not data:
+        return None
+
+    # recv devolveu menos que o pedido: completa direto num buffer do tamanho final
+    buffer = bytearray(n)
+    buffer[:len(data)] = data
+    view = memoryview(buffer)
+    received = len(data)
+    while received < n:
+        count = conn.recv_into(view[received:])
+        if not count:
+            return None
+        received += count
+    return bytes(buffer)
+
+def recv_frame(conn, max_size=MAX_FRAME_SIZE):
+    # Retorna o payload do próximo frame ou None se a conexão fechou no meio dele
+    length_data = recv_exact(conn, HEADER.size)
+    if length_data is None:
+        return None
+
+    msg_length = HEADER.unpack(length_data)[0]
+    if msg_length > max_size:
+        raise FrameTooLarge(msg_length, max_size)
+    return recv_exact(conn, msg_length)
+
+def encode_frame(message):
+    data = message.SerializeToString()
+    return HEADER.pack(len(data)) + data
+
+def send_message(conn, message):
+    conn.sendall(encode_frame(message))
+
+def recv_message(conn, message_cls, max_size=MAX_FRAME_SIZE):
+    data = recv_frame(conn, max_size)
+    if data is None:
+        return None
+
+    message = message_cls()
+    message.ParseFromString(data)
+    return message
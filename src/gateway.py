@@ -1,40 +1,125 @@
 from collections import defaultdict
+import asyncio
+import queue
 import socket
 import threading
 import time
-import datetime
 import struct
-import pika
-from proto.sensor_data_pb2 import SensorReading, Response, DeviceType, GatewayAnnouncement, AppRequest, GatewayResponse
+from proto.sensor_data_pb2 import SensorReading, Response, DeviceType, GatewayAnnouncement, AppRequest, GatewayResponse, DiscoveryRequest
 
-import grpc
+from concurrent import futures
 from proto import sensor_data_pb2
-from proto import sensor_data_pb2_grpc
+from framing import MAX_FRAME_SIZE, FrameTooLarge, send_message, recv_message, recv_frame
+from command_queue import CommandQueue, PRIORITY_HIGH, PRIORITY_NORMAL
+from liveness import LivenessTracker, ONLINE
+from dedup import ReadingDeduplicator, NEW
+from rules import RuleEngine
+from device_registry import DeviceRegistry
+from history import ReadingHistory, export_npz
+from admission import AdmissionController, ADMITTED, RATE_LIMITED, QUEUE_FULL, MALFORMED, FRAME_TOO_LARGE
+from semaphore_scheduler import SemaphoreScheduler
+
+# pika, grpc e os stubs de serviço só são importados quando o transporte
+# correspondente é iniciado: um gateway só TCP não paga o import do gRPC
+TRANSPORTS = ("tcp", "rabbitmq", "telemetry", "app", "discovery")
+
+# Nome de cada DeviceType para exibição; enum do proto3 é aberto e um dispositivo
+# mais novo (ou um frame corrompido) pode mandar um valor que DeviceType.Name não conhece
+DEVICE_TYPE_NAMES = {value: name for name, value in DeviceType.items()}
+
+def aio_target(device_info):
+    return f"{device_info['address']}:{device_info['grpc_port']}"
 
 class Gateway:
     def __init__(self, host='0.0.0.0', tcp_port=6789, udp_port=6790, discovery_group='228.0.0.8', 
-                 discovery_port=6791, status_query_port=8082, rabbitmq_host='localhost', rabbitmq_port=5672):
+                 discovery_port=6791, status_query_port=8082, rabbitmq_host='localhost', rabbitmq_port=5672,
+                 telemetry_port=6792, telemetry_max_streams=10000, rabbitmq_queue='', verbose=True,
+                 discovery_solicit_port=6793, announce_interval=60, shard=0, shard_count=1,
+                 aio_grpc=False, command_timeout=10, transports=TRANSPORTS, history_capacity=262144,
+                 ingest_queue_size=10000, ingest_workers=2, source_rate=5.0, source_burst=20,
+                 tcp_max_connections=256, tcp_timeout=10.0, rabbitmq_prefetch=100, rabbitmq_requeue_delay=1.0,
+                 max_frame_size=MAX_FRAME_SIZE):
         self.host = host
         self.tcp_port = tcp_port
         self.udp_port = udp_port
         self.discovery_group = discovery_group
         self.discovery_port = discovery_port
         self.status_query_port = status_query_port
-
-        self.devices = {}
+        self.discovery_solicit_port = discovery_solicit_port
+        self.announce_interval = announce_interval
+        self.shard = shard
+        self.shard_count = shard_count
+        self.telemetry_port = telemetry_port
+        # Teto de streams simultâneos; ao atingi-lo o gateway para de anunciar a porta
+        # de telemetria e dispositivos novos ficam no RabbitMQ
+        self.telemetry_max_streams = telemetry_max_streams
+        self.verbose = verbose
+        self.transports = set(transports)
+        unknown = self.transports - set(TRANSPORTS)
+        if unknown:
+            raise ValueError(f"Transportes desconhecidos: {', '.join(sorted(unknown))}")
+        # Com aio_grpc os comandos são despachados por grpc.aio no event loop da API
+        self.aio_grpc = aio_grpc
+        self.command_timeout = command_timeout
+        self._aio_channels = {}
+
+        # Última leitura e endereço de cada dispositivo, em registros compactos
+        self.registry = DeviceRegistry()
+        # Admissão: token bucket por origem + fila limitada até os workers que gravam no store
+        self.admission = AdmissionController(ingest_queue_size, source_rate, source_burst, shards=ingest_workers)
+        self.ingest_workers = ingest_workers
+        self.store_threads = []
+
+        # Conexões TCP simultâneas limitadas: sem vaga, o accept espera e o backlog do kernel segura o resto
+        self.tcp_max_connections = tcp_max_connections
+        self.tcp_timeout = tcp_timeout
+        self.tcp_slots = threading.BoundedSemaphore(tcp_max_connections)
+        # Maior frame aceito de um dispositivo; acima disso a conexão é recusada sem ler o corpo
+        self.max_frame_size = max_frame_size
+        self.tcp_connections = 0
+        self.tcp_lock = threading.Lock()
+
+        # Histórico das últimas history_capacity leituras aceitas, para exportação (0 desliga)
+        self.history = ReadingHistory(history_capacity) if history_capacity else None
         self.devices_lock = threading.Lock()
 
         self.running = False
-        self.sensor_data = {}
-        self.sensor_data_lock = threading.Lock()
+
+        # Dispositivos conectados por stream de telemetria (sensor_id -> TelemetrySession)
+        self.telemetry_sessions = {}
+        self.telemetry_server = None
+        self.telemetry_loop = None
+
+        # Fila de comandos por dispositivo com prioridade, coalescência e rate limit
+        self.command_queue = CommandQueue(self.send_command_to_device)
+
+        # Detecção de dispositivos que pararam de reportar
+        self.liveness = LivenessTracker(on_transition=self._on_liveness_transition)
+
+        # Descarta leituras duplicadas ou atrasadas vindas por caminhos diferentes
+        self.dedup = ReadingDeduplicator()
+
+        # Regras avaliadas a cada leitura nova, que podem disparar comandos
+        self.rules = RuleEngine(on_trigger=self._on_rule_triggered)
+
+        # Planos coordenados de grupos de semáforos (ondas verdes)
+        self.semaphores = SemaphoreScheduler(self.enqueue_command)
 
         self.rabbitmq_host = rabbitmq_host
         self.rabbitmq_port = rabbitmq_port
         self.connection = None
         self.channel = None
         self.exchange_name = 'sensor_data_exchange'
+        # Fila vazia = fila exclusiva e anônima; com nome, vários consumidores dividem a fila
+        self.rabbitmq_queue = rabbitmq_queue
+        # Ack manual: no máximo rabbitmq_prefetch mensagens sem ack ficam com este consumidor.
+        # Mensagem recusada pela admissão segura uma dessas vagas e volta para a fila
+        # depois de rabbitmq_requeue_delay; com as vagas ocupadas o broker para de entregar.
+        self.rabbitmq_prefetch = rabbitmq_prefetch
+        self.rabbitmq_requeue_delay = rabbitmq_requeue_delay
 
         self.gateway_ip = self._get_local_ip()
+        self.gateway_id = f"{self.gateway_ip}:{self.tcp_port}"
 
     def _get_local_ip(self):
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -48,13 +133,19 @@ class Gateway:
         return ip
 
     def connect_rabbitmq(self):
+        import pika
+
         try:
             self.connection = pika.BlockingConnection(pika.ConnectionParameters(host=self.rabbitmq_host, port=self.rabbitmq_port))
             self.channel = self.connection.channel()
             self.channel.exchange_declare(exchange=self.exchange_name, exchange_type='fanout')
-            result = self.channel.queue_declare(queue='', exclusive=True)
+            if self.rabbitmq_queue:
+                result = self.channel.queue_declare(queue=self.rabbitmq_queue, auto_delete=True)
+            else:
+                result = self.channel.queue_declare(queue='', exclusive=True)
             self.queue_name = result.method.queue
             self.channel.queue_bind(exchange=self.exchange_name, queue=self.queue_name)
+            self.channel.basic_qos(prefetch_count=self.rabbitmq_prefetch)
             print(f"✅ Conectado ao RabbitMQ em {self.rabbitmq_host}:{self.rabbitmq_port}")
         except pika.exceptions.AMQPConnectionError as e:
             print(f"❌ Erro ao conectar ao RabbitMQ: {e}")
@@ -70,7 +161,7 @@ class Gateway:
 
         print(f"🌐 Gateway (RabbitMQ) ouvindo na fila '{self.queue_name}' para dados de sensores")
         try:
-            self.channel.basic_consume(queue=self.queue_name, on_message_callback=self._rabbitmq_callback, auto_ack=True)
+            self.channel.basic_consume(queue=self.queue_name, on_message_callback=self._rabbitmq_callback, auto_ack=False)
             self.channel.start_consuming()
         except Exception as e:
             print(f"❌ Erro ao consumir mensagens do RabbitMQ: {e}")
@@ -81,15 +172,48 @@ class Gateway:
 
     def _rabbitmq_callback(self, ch, method, properties, body):
         # The body contains the serialized SensorReading protobuf message
-        self.handle_sensor_data(body, addr=("RabbitMQ", self.rabbitmq_port), protocol="RabbitMQ")
+        # Roda na thread de I/O do pika: nunca bloqueia esperando espaço na fila de ingestão,
+        # senão heartbeats e as demais entregas da conexão ficam parados
+        verdict = self.handle_sensor_data(body, addr=("RabbitMQ", self.rabbitmq_port), protocol="RabbitMQ")
+        if verdict in (QUEUE_FULL, RATE_LIMITED):
+            # Fica sem ack (ocupando uma vaga do prefetch) e volta para a fila mais tarde
+            delivery_tag = method.delivery_tag
+            ch.connection.call_later(self.rabbitmq_requeue_delay, lambda: self._rabbitmq_requeue(ch, delivery_tag))
+        else:
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+
+    def _rabbitmq_requeue(self, ch, delivery_tag):
+        # Canal fechado no meio tempo: o broker já devolveu a mensagem sozinho
+        if ch.is_open:
+            ch.basic_nack(delivery_tag=delivery_tag, requeue=True)
     
+    def get_device_info(self, device_id):
+        return self.registry.device_info(device_id)
+
+    def _unknown_device(self, device_id):
+        # Resposta definitiva (não é falha de transporte): a fila não reenvia
+        print(f"⚠️ Dispositivo '{device_id}' não encontrado.")
+        return sensor_data_pb2.CommandResponse(success=False, message=f"Dispositivo '{device_id}' não encontrado")
+
     def send_command_to_device(self, device_id, command_str, params=None):
         with self.devices_lock:
-            device_info = self.devices.get(device_id)
+            session = self.telemetry_sessions.get(device_id)
+        device_info = self.get_device_info(device_id)
+
+        if session:
+            # Dispositivo conectado via stream: o comando segue pelo mesmo canal
+            response = session.send_command(command_str, params)
+            if response is None:
+                print(f"⚠️ Erro ao enviar comando para '{device_id}' via stream de telemetria")
+                return None
+            print(f"✅ Comando '{command_str}' enviado para '{device_id}' via stream. Resposta: {response.message}")
+            return response
 
         if not device_info:
-            print(f"⚠️ Dispositivo '{device_id}' não encontrado.")
-            return None
+            return self._unknown_device(device_id)
+
+        import grpc
+        from proto import sensor_data_pb2_grpc
 
         try:
             channel = grpc.insecure_channel(f"{device_info['address']}:{device_info['grpc_port']}")
@@ -109,162 +233,481 @@ class Gateway:
             print(f"⚠️ Erro ao enviar comando para '{device_id}': {e}")
             return None
 
+    def _aio_stub(self, device_info):
+        import grpc
+        from proto import sensor_data_pb2_grpc
+
+        # Canais grpc.aio são reaproveitados entre comandos (um por endereço de dispositivo)
+        target = aio_target(device_info)
+        channel = self._aio_channels.get(target)
+        if channel is None:
+            channel = self._aio_channels[target] = grpc.aio.insecure_channel(target)
+        return sensor_data_pb2_grpc.DeviceControlStub(channel)
+
+    def _close_aio_channel(self, device_id):
+        # Dispositivo OFFLINE: o canal reaproveitado sai do cache e é fechado no loop
+        # que o criou; se o dispositivo voltar, outro canal é aberto no próximo comando
+        device_info = self.get_device_info(device_id)
+        if not device_info:
+            return
+        channel = self._aio_channels.pop(aio_target(device_info), None)
+        if channel is not None and self.command_queue.loop is not None:
+            asyncio.run_coroutine_threadsafe(channel.close(), self.command_queue.loop)
+
+    async def send_command_to_device_async(self, device_id, command_str, params=None):
+        with self.devices_lock:
+            session = self.telemetry_sessions.get(device_id)
+        device_info = self.get_device_info(device_id)
+
+        if session:
+            response = await session.send_command_async(command_str, params, timeout=self.command_timeout)
+            if response is None:
+                print(f"⚠️ Erro ao enviar comando para '{device_id}' via stream de telemetria")
+                return None
+            print(f"✅ Comando '{command_str}' enviado para '{device_id}' via stream. Resposta: {response.message}")
+            return response
+
+        if not device_info:
+            return self._unknown_device(device_id)
+
+        import grpc
+
+        try:
+            stub = self._aio_stub(device_info)
+            if command_str == "send_tcp_data":
+                response = await stub.SendTcpData(sensor_data_pb2.Empty(), timeout=self.command_timeout)
+            else:
+                request = sensor_data_pb2.CommandRequest(command=command_str, params=params)
+                response = await stub.SendCommand(request, timeout=self.command_timeout)
+            print(f"✅ Comando '{command_str}' enviado para '{device_id}'. Resposta: {response.message}")
+            return response
+        except grpc.RpcError as e:
+            print(f"⚠️ Erro ao enviar comando para '{device_id}': {e.code()}")
+            return None
+
+    def enqueue_command(self, device_id, command_str, params=None, priority=PRIORITY_NORMAL):
+        return self.command_queue.submit(device_id, command_str, params, priority)
+
+    def request_on_demand_data(self, device_id, timeout=15):
+        last_reading = self.get_sensor_reading(device_id)
+        last_timestamp = last_reading.timestamp if last_reading else 0
+
+        try:
+            command_response = self.enqueue_command(device_id, "send_tcp_data", priority=PRIORITY_HIGH).result(timeout)
+        except futures.TimeoutError:
+            return None
+        if not command_response or not command_response.success:
+            return None
+
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            current_reading = self.get_sensor_reading(device_id)
+            if current_reading and current_reading.timestamp > last_timestamp:
+                return current_reading
+            time.sleep(0.1)
+        return None
+
+    def handle_app_request(self, request):
+        response = GatewayResponse()
+
+        if request.type == AppRequest.LIST_DEVICES:
+            response.type = GatewayResponse.DEVICE_LIST
+            response.device_list.devices.extend(self.get_sensor_status().values())
+
+        elif request.type == AppRequest.STREAM_LOCATION_DATA:
+            location_name = request.stream_request.location_name
+            response.type = GatewayResponse.DEVICE_LIST
+            response.device_list.devices.extend(self.get_sensor_status_by_location(location_name).values())
+
+        elif request.type == AppRequest.GET_ON_DEMAND_DATA:
+            reading = self.request_on_demand_data(request.on_demand_request.device_id)
+            if reading is None:
+                response.type = GatewayResponse.ERROR
+                response.error_message = "Falha ao obter dados do dispositivo. Pode ser que esteja offline"
+            else:
+                response.type = GatewayResponse.SINGLE_READING
+                response.single_reading.CopyFrom(reading)
+
+        elif request.type == AppRequest.QUEUE_COMMAND:
+            command = request.command_request
+            try:
+                command_response = self.enqueue_command(command.target_id, command.command).result(timeout=15)
+            except futures.TimeoutError:
+                command_response = None
+            if command_response and command_response.success:
+                response.type = GatewayResponse.COMMAND_CONFIRMATION
+                response.confirmation_message = command_response.message
+            else:
+                response.type = GatewayResponse.ERROR
+                response.error_message = command_response.message if command_response else "Dispositivo não encontrado ou falhou ao responder"
+
+        else:
+            response.type = GatewayResponse.ERROR
+            response.error_message = f"Tipo de requisição desconhecido: {request.type}"
+
+        return response
+
+    def handle_app_client(self, conn, addr):
+        # Conexão persistente: o cliente pode enviar várias requisições em sequência
+        try:
+            while self.running:
+                request = recv_message(conn, AppRequest)
+                if request is None:
+                    break
+                send_message(conn, self.handle_app_request(request))
+        except Exception as e:
+            print(f"Erro ao lidar com aplicação {addr}: {e}")
+        finally:
+            conn.close()
+
     def handle_tcp_client(self, conn, addr):
-        response = None
+        with self.tcp_lock:
+            self.tcp_connections += 1
         try:
-            # Recebe comprimento da mensagem (4 bytes)
-            length_data = conn.recv(4)
-            if not length_data:
+            # Cliente lento não segura uma das vagas de conexão indefinidamente
+            conn.settimeout(self.tcp_timeout)
+
+            # Recebe comprimento da mensagem (4 bytes) e a mensagem
+            try:
+                data = recv_frame(conn, self.max_frame_size)
+            except FrameTooLarge as e:
+                self.admission.count("TCP", FRAME_TOO_LARGE)
+                print(f"⚠️ {e} (endereço {addr}), conexão encerrada")
+                send_message(conn, Response(success=False, message=str(e), timestamp=int(time.time())))
                 return
-            
-            msg_length = struct.unpack('!I', length_data)[0]
-            
-            # Recebe mensagem
-            data = b''
-            while len(data) < msg_length:
-                chunk = conn.recv(msg_length - len(data))
-                if not chunk:
-                    break
-                data += chunk
-            
-            if data:
-                try:
-                    reading = SensorReading()
-                    reading.ParseFromString(data)
-                    
-                    with self.devices_lock:
-                        self.devices[reading.sensor_id] = {
-                            "address": addr[0],
-                            "grpc_port": int(reading.metadata.get("grpc_port", 50051)) 
-                        }
-
-                    reading.metadata["address"] = addr[0]
-                    self.sensor_data[reading.sensor_id] = reading
-                    
-                    self.display_sensor_reading(reading, addr)
-                    
-                    response = Response()
+            if not data:
+                return
+
+            response = Response()
+            try:
+                reading = SensorReading()
+                reading.ParseFromString(data)
+
+                reading.metadata["address"] = addr[0]
+                verdict, retry_after = self._admit(reading, addr[0], addr, "TCP")
+                if verdict == ADMITTED:
                     response.success = True
                     response.message = f"Dados recebidos do sensor {reading.sensor_id}"
-                    response.timestamp = int(time.time())
-                    
-                except Exception as e:
-                    print(f"Erro ao fazer parsing dos dados do sensor: {e}")
-                    response = Response()
+                else:
+                    # O dispositivo guarda a leitura e reenvia depois de retry_after_ms
                     response.success = False
-                    response.message = f"Erro: {str(e)}"
-                    response.timestamp = int(time.time())
-                    
-                    response_data = response.SerializeToString()
-                    response_length = struct.pack('!I', len(response_data))
-                    conn.sendall(response_length + response_data)
-
-                if response:
-                    try:
-                        response_data = response.SerializeToString()
-                        response_length = struct.pack('!I', len(response_data))
-                        conn.sendall(response_length + response_data)
-                    except Exception as e:
-                        print(f"Erro ao enviar resposta ao endereço {addr}: {e}")
-        
+                    response.message = f"Gateway sobrecarregado ({verdict}), leitura de {reading.sensor_id} não aceita"
+                    response.retry_after_ms = max(1, int(retry_after * 1000))
+
+            except Exception as e:
+                self.admission.count("TCP", MALFORMED)
+                print(f"Erro ao fazer parsing dos dados do sensor: {e}")
+                response.success = False
+                response.message = f"Erro: {str(e)}"
+            response.timestamp = int(time.time())
+
+            try:
+                send_message(conn, response)
+            except Exception as e:
+                print(f"Erro ao enviar resposta ao endereço {addr}: {e}")
+
         except Exception as e:
             print(f"Erro ao lidar com cliente {addr}: {e}")
         finally:
             conn.close()
+            with self.tcp_lock:
+                self.tcp_connections -= 1
+            self.tcp_slots.release()
 
-    def handle_sensor_data(self, data, addr, protocol="UDP"):
+    def handle_sensor_data(self, data, addr, protocol="UDP", block_timeout=0):
         try:
             reading = SensorReading()
             reading.ParseFromString(data)
 
-            with self.devices_lock:
-                device_address = addr[0] if protocol != "RabbitMQ" else reading.metadata.get("device_ip", "unknown")
-                self.devices[reading.sensor_id] = {
-                    "address": device_address,
-                    "grpc_port": int(reading.metadata.get("grpc_port", 50051))
-                }
-
-            with self.sensor_data_lock:
-                self.sensor_data[reading.sensor_id] = reading
-
-            self.display_sensor_reading(reading, addr, protocol)
+            device_address = addr[0] if protocol != "RabbitMQ" else reading.metadata.get("device_ip", "unknown")
+            verdict, _ = self._admit(reading, device_address, addr, protocol, block_timeout)
+            return verdict
 
         except Exception as e:
+            self.admission.count(protocol, MALFORMED)
             print("⚠️ Parsing falhou")
             print(f"📊 Bytes recebidos: ({len(data)} bytes). Exception: {e}")
             print(f"  📋 Dados: {data.hex()}")
             print("-" * 60)
     
+    def handle_stream_reading(self, reading, session):
+        # Stream não tem como pedir reenvio: leitura recusada é descartada
+        verdict, _ = self._admit(reading, session.address, session.peer, "gRPC stream")
+        return verdict
+
+    def _admit(self, reading, device_address, addr, protocol, block_timeout=0):
+        source = reading.sensor_id or device_address
+        return self.admission.admit((reading, device_address, addr, protocol), source, protocol, block_timeout)
+
+    def _store_loop(self, ingest):
+        while True:
+            item = ingest.get()
+            try:
+                if item is None:
+                    return
+                self._store_reading(*item)
+            except Exception as e:
+                print(f"⚠️ Erro ao gravar leitura: {e}")
+            finally:
+                ingest.task_done()
+
+    def start_store_workers(self):
+        # Um worker por shard da fila de admissão (ver AdmissionController)
+        for ingest in self.admission.queues:
+            thread = threading.Thread(target=self._store_loop, args=(ingest,))
+            thread.daemon = True
+            thread.start()
+            self.store_threads.append(thread)
+
+    def drain_ingest(self):
+        # Espera a fila de ingestão esvaziar (ex.: fim de um replay)
+        for ingest in self.admission.queues:
+            ingest.join()
+
+    def _store_reading(self, reading, device_address, addr, protocol):
+        if self.dedup.check(reading) != NEW:
+            return False
+
+        record = self.registry.update(reading, device_address)
+        if self.history is not None:
+            self.history.append(record.handle, reading)
+
+        # sensor_id internado: o rastreador de atividade compartilha a mesma string
+        self.liveness.observe(record.sensor_id)
+        self.semaphores.observe(record.sensor_id, reading.boot_id)
+        self.display_sensor_reading(reading, addr, protocol)
+        self.rules.evaluate(reading)
+        return True
+
+    def _on_rule_triggered(self, rule, reading):
+        print(f"⚡ Regra '{rule.name}' disparada por {reading.sensor_id} ({reading.value} {reading.unit}): "
+              f"'{rule.command}' -> '{rule.target_device}'")
+        self.enqueue_command(rule.target_device, rule.command, rule.params, rule.priority)
+
+    def _on_liveness_transition(self, device_id, status):
+        if status == ONLINE:
+            print(f"📶 Dispositivo '{device_id}' voltou a reportar")
+            self.semaphores.resend(device_id)
+        else:
+            print(f"📴 Dispositivo '{device_id}' parou de reportar (intervalo esperado: {self.liveness.expected_interval(device_id):.0f}s)")
+            self._close_aio_channel(device_id)
+
+    def watch_liveness(self):
+        while self.running:
+            self.liveness.expire()
+            time.sleep(1)
+
+    def register_telemetry_session(self, session):
+        with self.devices_lock:
+            previous = self.telemetry_sessions.get(session.sensor_id)
+            self.telemetry_sessions[session.sensor_id] = session
+        if previous and previous is not session:
+            previous.close()
+        print(f"🔌 Dispositivo '{session.sensor_id}' conectou via stream de telemetria ({session.peer})")
+
+    def unregister_telemetry_session(self, session):
+        with self.devices_lock:
+            if self.telemetry_sessions.get(session.sensor_id) is session:
+                del self.telemetry_sessions[session.sensor_id]
+                disconnected = True
+            else:
+                disconnected = False
+        if disconnected:
+            # Queda do stream é sinal explícito de que o dispositivo saiu
+            self.liveness.mark_offline(session.sensor_id)
+        print(f"🔌 Dispositivo '{session.sensor_id}' desconectou do stream de telemetria")
+
     def display_sensor_reading(self, reading, addr, protocol="TCP"):
-        sensor_type_name = DeviceType.Name(reading.sensor_type)
-        
-        print(f"📊 Recebeu dado de {sensor_type_name} do endereço {addr} via {protocol}")
-        print(f"  🆔 Sensor ID: {reading.sensor_id}")
-        print(f"  📍 Localização: {reading.location}")
-        print(f"  📈 Valor: {reading.value} {reading.unit}")
-        print(f"  🕐 Timestamp: {datetime.datetime.fromtimestamp(reading.timestamp).strftime('%Y-%m-%d %H:%M:%S')}")
-        
+        if not self.verbose:
+            return
+        try:
+            timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(reading.timestamp))
+        except (OverflowError, OSError, ValueError):
+            # Fora do intervalo do relógio local (dispositivo sem hora ou frame corrompido)
+            timestamp = str(reading.timestamp)
+
+        # Bloco montado de uma vez e escrito com um único print: menos chamadas de
+        # escrita no caminho quente e blocos de threads diferentes não se intercalam
+        lines = [
+            f"📊 Recebeu dado de {DEVICE_TYPE_NAMES.get(reading.sensor_type, reading.sensor_type)} do endereço {addr} via {protocol}",
+            f"  🆔 Sensor ID: {reading.sensor_id}",
+            f"  📍 Localização: {reading.location}",
+            f"  📈 Valor: {reading.value} {reading.unit}",
+            f"  🕐 Timestamp: {timestamp}",
+        ]
         if reading.metadata:
-            print(f"  📋 Metadata:")
-            for key, value in reading.metadata.items():
-                print(f"     {key}: {value}")
-        
-        print("-" * 60)
+            lines.append("  📋 Metadata:")
+            lines.extend(f"     {key}: {value}" for key, value in reading.metadata.items())
+        lines.append("-" * 60)
+        print("\n".join(lines))
 
-    def listen_tcp(self):
+    def create_tcp_socket(self):
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         s.bind((self.host, self.tcp_port))
         s.listen(10)
+        return s
+
+    def listen_tcp(self, s=None):
+        if s is None:
+            s = self.create_tcp_socket()
 
         print(f"🌐 Gateway (TCP) ouvindo em {self.host}:{self.tcp_port}")
 
         while self.running:
-            conn, addr = s.accept()
-            print(f"🔗 Nova conexão de endereço {addr}")
+            self.tcp_slots.acquire()
+            try:
+                conn, addr = s.accept()
+            except Exception:
+                self.tcp_slots.release()
+                raise
+            if self.verbose:
+                print(f"🔗 Nova conexão de endereço {addr}")
 
             client_thread = threading.Thread(target=self.handle_tcp_client, args=(conn, addr))
             client_thread.daemon = True
             client_thread.start()
 
- 
+    def listen_app_requests(self):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind((self.host, self.status_query_port))
+        s.listen(10)
+
+        print(f"🌐 Gateway (API binária) ouvindo em {self.host}:{self.status_query_port}")
 
-    def broadcast_discovery(self):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        while self.running:
+            conn, addr = s.accept()
+            print(f"📱 Nova conexão de aplicação {addr}")
+
+            app_thread = threading.Thread(target=self.handle_app_client, args=(conn, addr))
+            app_thread.daemon = True
+            app_thread.start()
+
+    def start_telemetry_server(self):
+        # Servidor grpc.aio num event loop próprio: cada stream é uma task, não uma
+        # thread do pool, então milhares de dispositivos conectados cabem num processo
+        self.telemetry_loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=self.telemetry_loop.run_forever, name="telemetry-aio")
+        loop_thread.daemon = True
+        loop_thread.start()
+        asyncio.run_coroutine_threadsafe(self._serve_telemetry(), self.telemetry_loop).result()
+        print(f"🌐 Gateway (telemetria gRPC) ouvindo em {self.host}:{self.telemetry_port}")
+
+    async def _serve_telemetry(self):
+        import grpc
+        from proto import sensor_data_pb2_grpc
+        from telemetry import GatewayTelemetryServicer
+
+        server = grpc.aio.server(maximum_concurrent_rpcs=self.telemetry_max_streams)
+        sensor_data_pb2_grpc.add_GatewayTelemetryServicer_to_server(GatewayTelemetryServicer(self), server)
+        server.add_insecure_port(f"{self.host}:{self.telemetry_port}")
+        await server.start()
+        self.telemetry_server = server
+
+    def stop_telemetry_server(self):
+        if self.telemetry_server is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.telemetry_server.stop(0), self.telemetry_loop).result(5)
+        self.telemetry_server = None
+
+    def telemetry_available(self):
+        with self.devices_lock:
+            return "telemetry" in self.transports and len(self.telemetry_sessions) < self.telemetry_max_streams
+
+    def current_load(self):
+        # Só dispositivos reportando: quem saiu por failover ou parou expira no
+        # liveness e deixa de pesar na escolha do gateway menos carregado
+        return self.liveness.online_count()
 
-        announcement = GatewayAnnouncement(
+    def build_announcement(self, nonce=0):
+        return GatewayAnnouncement(
             gateway_ip=self.gateway_ip,
             tcp_port=self.tcp_port,
             udp_port=self.udp_port,
             rabbitmq_host=self.rabbitmq_host,
-            rabbitmq_port=self.rabbitmq_port
+            rabbitmq_port=self.rabbitmq_port,
+            telemetry_port=self.telemetry_port if self.telemetry_available() else 0,
+            gateway_id=self.gateway_id,
+            load=self.current_load(),
+            shard=self.shard,
+            shard_count=self.shard_count,
+            nonce=nonce
         )
-        message = announcement.SerializeToString()
 
+    def broadcast_discovery(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+
+        # Dispositivos novos pedem descoberta e recebem resposta imediata, então o
+        # anúncio periódico só serve para atualizar carga e pode ser bem espaçado
         print(f"📢 Iniciando anúncios de descoberta para {self.discovery_group}:{self.discovery_port}")
         while self.running:
+            message = self.build_announcement().SerializeToString()
             sock.sendto(message, (self.discovery_group, self.discovery_port))
-            time.sleep(10) # Anuncia a cada 10s
+            time.sleep(self.announce_interval)
+
+    def answer_discovery_requests(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('', self.discovery_solicit_port))
+        mreq = struct.pack("4sl", socket.inet_aton(self.discovery_group), socket.INADDR_ANY)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+
+        print(f"📢 Respondendo pedidos de descoberta em {self.discovery_group}:{self.discovery_solicit_port}")
+        while self.running:
+            try:
+                data, addr = sock.recvfrom(1024)
+                request = DiscoveryRequest()
+                request.ParseFromString(data)
+                # Resposta unicast direto para o socket do dispositivo que pediu
+                sock.sendto(self.build_announcement(nonce=request.nonce).SerializeToString(), addr)
+            except Exception as e:
+                print(f"⚠️ Erro ao responder pedido de descoberta: {e}")
     
+    def start_ingest(self):
+        self.start_store_workers()
+
+        if "tcp" in self.transports:
+            tcp_thread = threading.Thread(target=self.listen_tcp)
+            tcp_thread.daemon = True
+            tcp_thread.start()
+
+        if "rabbitmq" in self.transports:
+            rabbitmq_thread = threading.Thread(target=self.listen_rabbitmq)
+            rabbitmq_thread.daemon = True
+            rabbitmq_thread.start()
+
     def start(self):
         self.running = True
         print("🚀 Iniciando Gateway...")
+        if not self.aio_grpc:
+            self.command_queue.start()
         print(f"   IP do Gateway para anúncios: {self.gateway_ip}")
+        print(f"   Transportes: {', '.join(t for t in TRANSPORTS if t in self.transports)}")
+
+        self.start_ingest()
 
-        tcp_thread = threading.Thread(target=self.listen_tcp)
-        tcp_thread.daemon = True
-        tcp_thread.start()
+        if "app" in self.transports:
+            app_thread = threading.Thread(target=self.listen_app_requests)
+            app_thread.daemon = True
+            app_thread.start()
 
+        if "telemetry" in self.transports:
+            self.start_telemetry_server()
 
+        if "discovery" in self.transports:
+            discovery_thread = threading.Thread(target=self.broadcast_discovery)
+            discovery_thread.daemon = True
+            discovery_thread.start()
 
-        rabbitmq_thread = threading.Thread(target=self.listen_rabbitmq)
-        rabbitmq_thread.daemon = True
-        rabbitmq_thread.start()
+            solicit_thread = threading.Thread(target=self.answer_discovery_requests)
+            solicit_thread.daemon = True
+            solicit_thread.start()
 
-        discovery_thread = threading.Thread(target=self.broadcast_discovery)
-        discovery_thread.daemon = True
-        discovery_thread.start()
+        liveness_thread = threading.Thread(target=self.watch_liveness)
+        liveness_thread.daemon = True
+        liveness_thread.start()
 
         print("=" * 60)
 
@@ -277,6 +720,56 @@ class Gateway:
             self.running = False
             '''
     
+    def start_aio(self):
+        # Chamado de dentro do event loop da API (ex.: startup do FastAPI)
+        self.command_queue.start_async(self.send_command_to_device_async)
+
+    def stop(self):
+        self.running = False
+        self.command_queue.stop()
+        if self.store_threads:
+            for ingest in self.admission.queues:
+                try:
+                    ingest.put_nowait(None)
+                except queue.Full:
+                    pass
+        self.store_threads = []
+        self.stop_telemetry_server()
+        if self.telemetry_loop is not None:
+            self.telemetry_loop.call_soon_threadsafe(self.telemetry_loop.stop)
+            self.telemetry_loop = None
+
     def get_sensor_status(self):
-        with self.sensor_data_lock:
-            return dict(self.sensor_data)
+        return self.registry.readings()
+
+    def get_sensor_reading(self, device_id):
+        return self.registry.reading(device_id)
+
+    def get_sensor_status_by_location(self, location):
+        return self.registry.readings(location=location)
+
+    def get_sensor_status_by_liveness(self, status):
+        return self.registry.readings(self.liveness.devices(status))
+
+    def device_handles(self, sensor_id=None, location=None):
+        return self.registry.select(sensor_id, location)
+
+    def ingest_stats(self):
+        stats = self.admission.stats()
+        with self.tcp_lock:
+            stats["tcp_connections"] = self.tcp_connections
+        stats["tcp_max_connections"] = self.tcp_max_connections
+        stats["store_workers"] = len(self.store_threads)
+        stats["dedup"] = dict(self.dedup.counters)
+        return stats
+
+    def describe_devices(self, handles):
+        return self.registry.describe(handles)
+
+    def export_history(self, fileobj, start=None, end=None, sensor_id=None, location=None):
+        if self.history is None:
+            raise RuntimeError("Histórico de leituras desativado (history_capacity=0)")
+        handles = None
+        if sensor_id is not None or location is not None:
+            handles = self.device_handles(sensor_id, location)
+        return export_npz(self.history, fileobj, self.describe_devices, start, end, handles)
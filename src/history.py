@@ -0,0 +1,100 @@
+import threading
+from array import array
+
+from columnar import NpzWriter
+
+# Colunas do histórico; "device" é o handle inteiro do dispositivo no gateway
+HISTORY_COLUMNS = (
+    ("timestamp", "q"),
+    ("value", "d"),
+    ("sensor_type", "i"),
+    ("sequence", "Q"),
+    ("boot_id", "Q"),
+    ("device", "i"),
+)
+# Colunas de texto exportadas como dicionário: device_<campo>[device] de cada linha
+DEVICE_FIELDS = ("sensor_id", "location", "unit", "address")
+
+
+# Histórico das leituras aceitas em um buffer circular colunar de tamanho fixo
+# (40 bytes por leitura): quando enche, as leituras mais antigas são sobrescritas.
+# Strings não entram no histórico, só o handle do dispositivo.
+class ReadingHistory:
+    def __init__(self, capacity=262144):
+        self.capacity = capacity
+        self.columns = {
+            name: array(typecode, bytes(array(typecode).itemsize * capacity))
+            for name, typecode in HISTORY_COLUMNS
+        }
+        self.written = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def append(self, handle, reading):
+        columns = self.columns
+        with self.lock:
+            i = self.written % self.capacity
+            columns["timestamp"][i] = reading.timestamp
+            columns["value"][i] = reading.value
+            columns["sensor_type"][i] = reading.sensor_type
+            columns["sequence"][i] = reading.sequence
+            columns["boot_id"][i] = reading.boot_id
+            columns["device"][i] = handle
+            self.written += 1
+
+    def chunks(self, start=None, end=None, handles=None, chunk_rows=65536):
+        # Percorre o histórico na ordem de chegada. Cada bloco é copiado sob o lock
+        # (fatias contíguas, sem laço em Python) e filtrado fora dele; linhas
+        # sobrescritas durante a exportação são puladas.
+        with self.lock:
+            position = max(0, self.written - self.capacity)
+            stop = self.written
+
+        while position < stop:
+            with self.lock:
+                position = max(position, self.written - self.capacity)
+                if position >= stop:
+                    return
+                offset = position % self.capacity
+                rows = min(chunk_rows, stop - position, self.capacity - offset)
+                chunk = {name: column[offset:offset + rows] for name, column in self.columns.items()}
+            position += rows
+
+            if start is not None or end is not None or handles is not None:
+                chunk = _filter(chunk, start, end, handles)
+            if len(chunk["timestamp"]):
+                yield chunk
+
+
+def _filter(chunk, start, end, handles):
+    keep = [
+        i for i, (timestamp, device) in enumerate(zip(chunk["timestamp"], chunk["device"]))
+        if (start is None or timestamp >= start)
+        and (end is None or timestamp < end)
+        and (handles is None or device in handles)
+    ]
+    return {name: array(values.typecode, (values[i] for i in keep)) for name, values in chunk.items()}
+
+
+# Escreve o histórico em [start, end) como .npz colunar. describe_devices recebe a
+# lista de handles exportados e devolve {handle: (sensor_id, location, unit, address)}.
+def export_npz(history, fileobj, describe_devices, start=None, end=None, handles=None, chunk_rows=65536):
+    codes = {}
+    with NpzWriter(fileobj, HISTORY_COLUMNS) as writer:
+        for chunk in history.chunks(start, end, handles, chunk_rows):
+            # Handles viram códigos densos 0..n-1 no arquivo
+            devices = chunk["device"]
+            for i, handle in enumerate(devices):
+                code = codes.get(handle)
+                if code is None:
+                    code = codes[handle] = len(codes)
+                devices[i] = code
+            writer.write_chunk(chunk)
+
+        described = describe_devices(list(codes))
+        missing = ("",) * len(DEVICE_FIELDS)
+        for field_index, field in enumerate(DEVICE_FIELDS):
+            writer.write_strings(f"device_{field}", [described.get(handle, missing)[field_index] for handle in codes])
+    return writer.rows
@@ -0,0 +1,111 @@
+import argparse
+import shutil
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+from columnar import NpzReader
+from history import HISTORY_COLUMNS
+
+# Exporta o histórico de um gateway em execução (via API REST) para .npz e
+# reinjeta um arquivo exportado em um gateway local, pelo mesmo caminho de
+# ingestão (handle_sensor_data), a N vezes a velocidade original.
+
+def export(args):
+    params = {k: v for k, v in (("start", args.start), ("end", args.end),
+                                ("sensor_id", args.sensor_id), ("location", args.location)) if v is not None}
+    url = f"{args.url.rstrip('/')}/history/export?{urllib.parse.urlencode(params)}"
+    with urllib.request.urlopen(url) as response, open(args.output, "wb") as output:
+        shutil.copyfileobj(response, output, 1 << 16)
+        rows = response.headers.get("X-Row-Count", "?")
+    print(f"💾 {rows} leituras exportadas para {args.output}")
+
+def replay(args):
+    from gateway import Gateway
+    from proto.sensor_data_pb2 import SensorReading
+
+    gateway = Gateway(transports=(), verbose=args.verbose, history_capacity=0, source_rate=args.source_rate)
+    gateway.start_store_workers()
+    # --block: espera espaço na fila de ingestão (como o RabbitMQ) em vez de descartar
+    block_timeout = 3600 if args.block else 0
+    names = [name for name, _ in HISTORY_COLUMNS]
+
+    with NpzReader(args.file) as reader:
+        sensor_ids = reader.strings("device_sensor_id")
+        locations = reader.strings("device_location")
+        units = reader.strings("device_unit")
+        addresses = reader.strings("device_address")
+        print(f"▶️ Reenviando {len(reader)} leituras de {len(sensor_ids)} dispositivos "
+              f"({'máxima velocidade' if not args.speed else f'{args.speed}x'})")
+
+        rows = 0
+        max_lag = 0.0
+        first_timestamp = None
+        started = time.perf_counter()
+        for chunk in reader.chunks(names, args.chunk_rows):
+            for timestamp, value, sensor_type, sequence, boot_id, device in zip(*(chunk[name] for name in names)):
+                if args.speed:
+                    # timestamp em segundos: leituras do mesmo segundo saem em rajada, como chegaram
+                    if first_timestamp is None:
+                        first_timestamp = timestamp
+                    due = started + (timestamp - first_timestamp) / args.speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        max_lag = max(max_lag, -delay)
+
+                reading = SensorReading(
+                    sensor_id=sensor_ids[device],
+                    location=locations[device],
+                    sensor_type=sensor_type,
+                    value=value,
+                    unit=units[device],
+                    timestamp=timestamp,
+                    sequence=sequence,
+                    boot_id=boot_id,
+                )
+                gateway.handle_sensor_data(reading.SerializeToString(), (addresses[device], 0), protocol="Replay",
+                                           block_timeout=block_timeout)
+                rows += 1
+
+        gateway.drain_ingest()
+        elapsed = time.perf_counter() - started
+
+    print(f"🏁 {rows} leituras em {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} msgs/s)")
+    stats = gateway.ingest_stats()
+    print(f"   Dispositivos: {len(gateway.registry)}  Admissão: {stats['counters'].get('Replay', {})}  Dedup: {stats['dedup']}")
+    if args.speed:
+        print(f"   Maior atraso em relação ao ritmo original: {max_lag * 1000:.1f} ms")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Exportação e replay do histórico de leituras do gateway")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="baixa o histórico da API como .npz")
+    export_parser.add_argument("-o", "--output", required=True)
+    export_parser.add_argument("--url", default="http://localhost:8000")
+    export_parser.add_argument("--start", type=int, help="timestamp inicial (inclusivo, segundos)")
+    export_parser.add_argument("--end", type=int, help="timestamp final (exclusivo, segundos)")
+    export_parser.add_argument("--sensor-id")
+    export_parser.add_argument("--location")
+    export_parser.set_defaults(func=export)
+
+    replay_parser = subparsers.add_parser("replay", help="reinjeta um .npz em um gateway local")
+    replay_parser.add_argument("file")
+    replay_parser.add_argument("--speed", type=float, default=1.0,
+                               help="multiplicador da velocidade original (0 = o mais rápido possível)")
+    replay_parser.add_argument("--chunk-rows", type=int, default=65536)
+    replay_parser.add_argument("--source-rate", type=float, default=5.0,
+                               help="leituras/s por dispositivo aceitas pelo gateway (0 = sem limite)")
+    replay_parser.add_argument("--block", action="store_true",
+                               help="com a fila de ingestão cheia, espera em vez de descartar")
+    replay_parser.add_argument("--verbose", action="store_true", help="imprime cada leitura recebida")
+    replay_parser.set_defaults(func=replay)
+
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args(sys.argv[1:])
+    args.func(args)
@@ -0,0 +1,126 @@
+import heapq
+import threading
+import time
+
+ONLINE = "online"
+OFFLINE = "offline"
+
+class DeviceLiveness:
+    __slots__ = ("last_seen", "interval", "deadline", "online", "heap_deadline")
+
+    def __init__(self, now):
+        self.last_seen = now
+        self.interval = None
+        self.deadline = now
+        self.online = True
+        self.heap_deadline = None
+
+
+# Acompanha a cadência de cada dispositivo e detecta quando ele para de reportar.
+# observe() apenas estende o prazo em O(1): a entrada do heap só é reagendada quando
+# sai do heap e o prazo real já foi adiado. Uma entrada nova só é inserida quando o
+# prazo encurta (cadência ficou mais rápida), e a antiga é descartada ao sair.
+class LivenessTracker:
+    def __init__(self, on_transition=None, default_interval=30.0, min_interval=1.0, tolerance=3.0, grace=2.0, alpha=0.2):
+        self.on_transition = on_transition
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.tolerance = tolerance
+        self.grace = grace
+        self.alpha = alpha
+
+        self.entries = {}
+        self.offline = set()
+        self._heap = []
+        self.lock = threading.Lock()
+
+    def observe(self, device_id, now=None):
+        now = time.monotonic() if now is None else now
+        came_online = False
+
+        with self.lock:
+            entry = self.entries.get(device_id)
+            if entry is None:
+                entry = self.entries[device_id] = DeviceLiveness(now)
+            else:
+                gap = now - entry.last_seen
+                if gap > 0:
+                    # Média móvel exponencial do intervalo observado entre leituras
+                    gap = max(gap, self.min_interval)
+                    entry.interval = gap if entry.interval is None else (1 - self.alpha) * entry.interval + self.alpha * gap
+                entry.last_seen = now
+                if not entry.online:
+                    entry.online = True
+                    self.offline.discard(device_id)
+                    came_online = True
+
+            entry.deadline = now + self.tolerance * (entry.interval or self.default_interval) + self.grace
+            if entry.heap_deadline is None or entry.deadline < entry.heap_deadline:
+                entry.heap_deadline = entry.deadline
+                heapq.heappush(self._heap, (entry.deadline, device_id))
+
+        if came_online:
+            self._notify(device_id, ONLINE)
+
+    def mark_offline(self, device_id):
+        with self.lock:
+            entry = self.entries.get(device_id)
+            if entry is None or not entry.online:
+                return
+            entry.online = False
+            self.offline.add(device_id)
+        self._notify(device_id, OFFLINE)
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        expired = []
+
+        with self.lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, device_id = heapq.heappop(self._heap)
+                entry = self.entries[device_id]
+                if deadline != entry.heap_deadline:
+                    continue
+                if entry.deadline > now:
+                    # Prazo foi estendido por leituras novas: reagenda
+                    entry.heap_deadline = entry.deadline
+                    heapq.heappush(self._heap, (entry.deadline, device_id))
+                    continue
+
+                entry.heap_deadline = None
+                if entry.online:
+                    entry.online = False
+                    self.offline.add(device_id)
+                    expired.append(device_id)
+
+        for device_id in expired:
+            self._notify(device_id, OFFLINE)
+        return expired
+
+    def status(self, device_id):
+        with self.lock:
+            entry = self.entries.get(device_id)
+            if entry is None:
+                return None
+            return ONLINE if entry.online else OFFLINE
+
+    def devices(self, status):
+        with self.lock:
+            if status == OFFLINE:
+                return set(self.offline)
+            return set(self.entries) - self.offline
+
+    def online_count(self):
+        with self.lock:
+            return len(self.entries) - len(self.offline)
+
+    def expected_interval(self, device_id):
+        with self.lock:
+            entry = self.entries.get(device_id)
+            if entry is None:
+                return None
+            return entry.interval or self.default_interval
+
+    def _notify(self, device_id, status):
+        if self.on_transition:
+            self.on_transition(device_id, status)
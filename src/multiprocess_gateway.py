@@ -0,0 +1,197 @@
+import multiprocessing
+import os
+import threading
+import time
+
+from gateway import Gateway
+from proto.sensor_data_pb2 import SensorReading
+from shm_store import SharedReadingStore, row_to_reading
+
+# Intervalo entre leituras do anel de mudanças do store
+CHANGES_POLL_INTERVAL = 0.05
+
+# Processo de ingestão: aceita conexões TCP e consome do RabbitMQ, faz o parsing
+# e grava a leitura direto no store compartilhado
+class IngestWorker(Gateway):
+    def __init__(self, worker_id, store, **kwargs):
+        # O histórico fica no processo principal
+        super().__init__(verbose=False, history_capacity=0, **kwargs)
+        self.worker_id = worker_id
+        self.store = store
+
+    def _store_reading(self, reading, device_address, addr, protocol):
+        return self.store.write(reading, device_address)
+
+    def run(self, tcp_socket):
+        self.running = True
+        print(f"⚙️ Worker de ingestão {self.worker_id} iniciado (pid {os.getpid()})")
+        # Cada worker tem sua própria fila e seus buckets por origem
+        self.start_store_workers()
+
+        if "rabbitmq" in self.transports:
+            rabbitmq_thread = threading.Thread(target=self.listen_rabbitmq)
+            rabbitmq_thread.daemon = True
+            rabbitmq_thread.start()
+
+        if tcp_socket is not None:
+            self.listen_tcp(tcp_socket)
+        elif "rabbitmq" in self.transports:
+            rabbitmq_thread.join()
+
+
+def run_ingest_worker(worker_id, store_name, lock, tcp_socket, gateway_kwargs):
+    store = SharedReadingStore(name=store_name, lock=lock)
+    IngestWorker(worker_id, store, **gateway_kwargs).run(tcp_socket)
+
+
+# Gateway com ingestão em vários processos. Este processo (o da API) mantém
+# descoberta, API binária, telemetria e comandos, e lê as leituras direto da
+# memória compartilhada, sem IPC com os workers.
+class MultiProcessGateway(Gateway):
+    def __init__(self, workers=None, store_capacity=65536, store_changes_capacity=65536, **kwargs):
+        super().__init__(**kwargs)
+        self.workers = workers or os.cpu_count() or 1
+        self.store_capacity = store_capacity
+        self.store_changes_capacity = store_changes_capacity
+        # Os workers dividem uma única fila nomeada: cada mensagem vai para um só worker
+        self.rabbitmq_queue = f"gateway_ingest_{self.gateway_ip}_{self.tcp_port}"
+        self.worker_kwargs = {
+            "host": self.host,
+            "tcp_port": self.tcp_port,
+            "rabbitmq_host": self.rabbitmq_host,
+            "rabbitmq_port": self.rabbitmq_port,
+            "rabbitmq_queue": self.rabbitmq_queue,
+            # Workers só cuidam da ingestão; o restante fica neste processo
+            "transports": self.transports & {"tcp", "rabbitmq"},
+        }
+
+        self.store = None
+        self.processes = []
+        self.changes_cursor = 0
+        self.changes_dropped = 0
+
+    def start_ingest(self):
+        # Leituras do stream de telemetria chegam a este processo e passam pela fila dele
+        self.start_store_workers()
+
+        ctx = multiprocessing.get_context("spawn")
+        self.store = SharedReadingStore(capacity=self.store_capacity, create=True, lock=ctx.Lock(),
+                                        changes_capacity=self.store_changes_capacity)
+        self.changes_cursor = 0
+        tcp_socket = self.create_tcp_socket() if "tcp" in self.transports else None
+
+        for worker_id in range(self.workers):
+            process = ctx.Process(
+                target=run_ingest_worker,
+                args=(worker_id, self.store.name, self.store.lock, tcp_socket, self.worker_kwargs),
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+        # Os workers já herdaram o socket de escuta
+        if tcp_socket is not None:
+            tcp_socket.close()
+        print(f"🧩 {self.workers} workers de ingestão gravando em '{self.store.name}' ({self.store_capacity} slots)")
+
+    def stop(self):
+        super().stop()
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        self.processes = []
+        if self.store:
+            self.store.close()
+            self.store = None
+
+    def _store_reading(self, reading, device_address, addr, protocol):
+        # Leituras que chegam a este processo (stream de telemetria) vão para o mesmo store
+        if not self.store.write(reading, device_address):
+            return False
+        self.display_sensor_reading(reading, addr, protocol)
+        return True
+
+    def consume_changes(self):
+        # Cada leitura aceita por qualquer processo passa por aqui uma vez, na ordem
+        # de escrita: alimenta atividade, planos de semáforo, regras e histórico
+        self.changes_cursor, changes, dropped = self.store.read_changes(self.changes_cursor)
+        if dropped:
+            self.changes_dropped += dropped
+            print(f"⚠️ {dropped} leituras saíram do anel de mudanças antes de serem processadas")
+
+        for slot, value, timestamp, sequence, boot_id, sensor_type in changes:
+            sensor_id, location, unit = self.store.labels(slot)
+            reading = SensorReading(sensor_id=sensor_id, location=location, sensor_type=sensor_type, value=value,
+                                    unit=unit, timestamp=timestamp, sequence=sequence, boot_id=boot_id)
+            self.liveness.observe(sensor_id)
+            self.semaphores.observe(sensor_id, boot_id)
+            self.rules.evaluate(reading)
+            # O slot é o handle do dispositivo no histórico
+            if self.history is not None:
+                self.history.append(slot, reading)
+        return len(changes)
+
+    def watch_liveness(self):
+        last_expire = time.monotonic()
+        while self.running:
+            self.consume_changes()
+            now = time.monotonic()
+            if now - last_expire >= 1:
+                self.liveness.expire()
+                last_expire = now
+            time.sleep(CHANGES_POLL_INTERVAL)
+
+    def ingest_stats(self):
+        stats = super().ingest_stats()
+        stats["shared_store"] = {
+            "slots": len(self.store) if self.store else 0,
+            "changes_dropped": self.changes_dropped,
+            "torn_reads": self.store.torn_reads if self.store else 0,
+        }
+        return stats
+
+    def get_device_info(self, device_id):
+        row = self.store.get(device_id)
+        if row is None:
+            return None
+        return {"address": row["address"], "grpc_port": row["grpc_port"]}
+
+    def get_sensor_status(self):
+        return {sensor_id: row_to_reading(row) for sensor_id, row in self.store.snapshot().items()}
+
+    def device_handles(self, sensor_id=None, location=None):
+        handles = set()
+        for slot in range(len(self.store)):
+            row = self.store.read_slot(slot)
+            if row and (sensor_id is None or row["sensor_id"] == sensor_id) \
+                    and (location is None or row["location"] == location):
+                handles.add(slot)
+        return handles
+
+    def describe_devices(self, handles):
+        described = {}
+        for slot in handles:
+            row = self.store.read_slot(slot)
+            if row:
+                described[slot] = (row["sensor_id"], row["location"], row["unit"], row["address"])
+        return described
+
+    def get_sensor_reading(self, device_id):
+        row = self.store.get(device_id)
+        return row_to_reading(row) if row else None
+
+    def get_sensor_status_by_location(self, location):
+        return {
+            sensor_id: row_to_reading(row)
+            for sensor_id, row in self.store.snapshot().items()
+            if row["location"] == location
+        }
+
+    def get_sensor_status_by_liveness(self, status):
+        readings = {}
+        for device_id in self.liveness.devices(status):
+            row = self.store.get(device_id)
+            if row:
+                readings[device_id] = row_to_reading(row)
+        return readings
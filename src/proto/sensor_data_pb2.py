@@ -14,7 +14,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x17proto/sensor_data.proto\"\xe7\x01\n\rSensorReading\x12\x11\n\tsensor_id\x18\x01 \x01(\t\x12\x10\n\x08location\x18\x02 \x01(\t\x12 \n\x0bsensor_type\x18\x03 \x01(\x0e\x32\x0b.DeviceType\x12\r\n\x05value\x18\x04 \x01(\x01\x12\x0c\n\x04unit\x18\x05 \x01(\t\x12\x11\n\ttimestamp\x18\x06 \x01(\x03\x12.\n\x08metadata\x18\x07 \x03(\x0b\x32\x1c.SensorReading.MetadataEntry\x1a/\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"?\n\x08Response\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x11\n\ttimestamp\x18\x03 \x01(\x03\"\x91\x01\n\x13GatewayAnnouncement\x12\x12\n\ngateway_ip\x18\x01 \x01(\t\x12\x10\n\x08tcp_port\x18\x02 \x01(\r\x12\x10\n\x08udp_port\x18\x03 \x01(\r\x12\x14\n\x0c\x63ommand_port\x18\x04 \x01(\r\x12\x15\n\rrabbitmq_host\x18\x05 \x01(\t\x12\x15\n\rrabbitmq_port\x18\x06 \x01(\r\"F\n\rDeviceCommand\x12\x11\n\ttarget_id\x18\x01 \x01(\t\x12\x0f\n\x07\x63ommand\x18\x02 \x01(\t\x12\x11\n\ttimestamp\x18\x03 \x01(\x03\"\x9c\x03\n\nAppRequest\x12%\n\x04type\x18\x01 \x01(\x0e\x32\x17.AppRequest.RequestType\x12;\n\x0estream_request\x18\x02 \x01(\x0b\x32!.AppRequest.StreamLocationRequestH\x00\x12\x38\n\x11on_demand_request\x18\x03 \x01(\x0b\x32\x1b.AppRequest.OnDemandRequestH\x00\x12)\n\x0f\x63ommand_request\x18\x04 \x01(\x0b\x32\x0e.DeviceCommandH\x00\x1a$\n\x0fOnDemandRequest\x12\x11\n\tdevice_id\x18\x01 \x01(\t\x1a.\n\x15StreamLocationRequest\x12\x15\n\rlocation_name\x18\x01 \x01(\t\"d\n\x0bRequestType\x12\x10\n\x0cLIST_DEVICES\x10\x00\x12\x18\n\x14STREAM_LOCATION_DATA\x10\x01\x12\x16\n\x12GET_ON_DEMAND_DATA\x10\x02\x12\x11\n\rQUEUE_COMMAND\x10\x03\x42\t\n\x07payload\"\xc5\x02\n\x0fGatewayResponse\x12+\n\x04type\x18\x01 \x01(\x0e\x32\x1d.GatewayResponse.ResponseType\x12\x32\n\x0b\x64\x65vice_list\x18\x02 \x01(\x0b\x32\x1b.GatewayResponse.DeviceListH\x00\x12(\n\x0esingle_reading\x18\x03 \x01(\x0b\x32\x0e.SensorReadingH\x00\x12\x1e\n\x14\x63onfirmation_message\x18\x04 \x01(\tH\x00\x1a-\n\nDeviceList\x12\x1f\n\x07\x64\x65vices\x18\x01 \x03(\x0b\x32\x0e.SensorReading\"M\n\x0cResponseType\x12\x0f\n\x0b\x44\x45VICE_LIST\x10\x00\x12\x12\n\x0eSINGLE_READING\x10\x01\x12\x18\n\x14\x43OMMAND_CONFIRMATION\x10\x02\x42\t\n\x07payload\"3\n\x0f\x43ommandResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x07\n\x05\x45mpty\"+\n\x1aSemaphoreLightStateRequest\x12\r\n\x05state\x18\x01 \x01(\t\"}\n\x0e\x43ommandRequest\x12\x0f\n\x07\x63ommand\x18\x01 \x01(\t\x12+\n\x06params\x18\x02 \x03(\x0b\x32\x1b.CommandRequest.ParamsEntry\x1a-\n\x0bParamsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01*a\n\nDeviceType\x12\x0b\n\x07UNKNOWN\x10\x00\x12\x0f\n\x0bTEMPERATURE\x10\x01\x12\x0c\n\x08HUMIDITY\x10\x02\x12\t\n\x05\x41LARM\x10\x03\x12\r\n\tLAMP_POST\x10\x04\x12\r\n\tSEMAPHORE\x10\x05\x32\xae\x01\n\rDeviceControl\x12\x30\n\x0bSendCommand\x12\x0f.CommandRequest\x1a\x10.CommandResponse\x12\'\n\x0bSendTcpData\x12\x06.Empty\x1a\x10.CommandResponse\x12\x42\n\x11SetSemaphoreLight\x12\x1b.SemaphoreLightStateRequest\x1a\x10.CommandResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x17proto/sensor_data.proto\"\x8a\x02\n\rSensorReading\x12\x11\n\tsensor_id\x18\x01 \x01(\t\x12\x10\n\x08location\x18\x02 \x01(\t\x12 \n\x0bsensor_type\x18\x03 \x01(\x0e\x32\x0b.DeviceType\x12\r\n\x05value\x18\x04 \x01(\x01\x12\x0c\n\x04unit\x18\x05 \x01(\t\x12\x11\n\ttimestamp\x18\x06 \x01(\x03\x12.\n\x08metadata\x18\x07 \x03(\x0b\x32\x1c.SensorReading.MetadataEntry\x12\x10\n\x08sequence\x18\x08 \x01(\x04\x12\x0f\n\x07\x62oot_id\x18\t \x01(\x04\x1a/\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"W\n\x08Response\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x11\n\ttimestamp\x18\x03 \x01(\x03\x12\x16\n\x0eretry_after_ms\x18\x04 \x01(\r\"\xfe\x01\n\x13GatewayAnnouncement\x12\x12\n\ngateway_ip\x18\x01 \x01(\t\x12\x10\n\x08tcp_port\x18\x02 \x01(\r\x12\x10\n\x08udp_port\x18\x03 \x01(\r\x12\x14\n\x0c\x63ommand_port\x18\x04 \x01(\r\x12\x15\n\rrabbitmq_host\x18\x05 \x01(\t\x12\x15\n\rrabbitmq_port\x18\x06 \x01(\r\x12\x16\n\x0etelemetry_port\x18\x07 \x01(\r\x12\x12\n\ngateway_id\x18\x08 \x01(\t\x12\x0c\n\x04load\x18\t \x01(\r\x12\r\n\x05shard\x18\n \x01(\r\x12\x13\n\x0bshard_count\x18\x0b \x01(\r\x12\r\n\x05nonce\x18\x0c \x01(\x04\"4\n\x10\x44iscoveryRequest\x12\x11\n\tdevice_id\x18\x01 \x01(\t\x12\r\n\x05nonce\x18\x02 \x01(\x04\"F\n\rDeviceCommand\x12\x11\n\ttarget_id\x18\x01 \x01(\t\x12\x0f\n\x07\x63ommand\x18\x02 \x01(\t\x12\x11\n\ttimestamp\x18\x03 \x01(\x03\"\x9c\x03\n\nAppRequest\x12%\n\x04type\x18\x01 \x01(\x0e\x32\x17.AppRequest.RequestType\x12;\n\x0estream_request\x18\x02 \x01(\x0b\x32!.AppRequest.StreamLocationRequestH\x00\x12\x38\n\x11on_demand_request\x18\x03 \x01(\x0b\x32\x1b.AppRequest.OnDemandRequestH\x00\x12)\n\x0f\x63ommand_request\x18\x04 \x01(\x0b\x32\x0e.DeviceCommandH\x00\x1a$\n\x0fOnDemandRequest\x12\x11\n\tdevice_id\x18\x01 \x01(\t\x1a.\n\x15StreamLocationRequest\x12\x15\n\rlocation_name\x18\x01 \x01(\t\"d\n\x0bRequestType\x12\x10\n\x0cLIST_DEVICES\x10\x00\x12\x18\n\x14STREAM_LOCATION_DATA\x10\x01\x12\x16\n\x12GET_ON_DEMAND_DATA\x10\x02\x12\x11\n\rQUEUE_COMMAND\x10\x03\x42\t\n\x07payload\"\xe9\x02\n\x0fGatewayResponse\x12+\n\x04type\x18\x01 \x01(\x0e\x32\x1d.GatewayResponse.ResponseType\x12\x32\n\x0b\x64\x65vice_list\x18\x02 \x01(\x0b\x32\x1b.GatewayResponse.DeviceListH\x00\x12(\n\x0esingle_reading\x18\x03 \x01(\x0b\x32\x0e.SensorReadingH\x00\x12\x1e\n\x14\x63onfirmation_message\x18\x04 \x01(\tH\x00\x12\x17\n\rerror_message\x18\x05 \x01(\tH\x00\x1a-\n\nDeviceList\x12\x1f\n\x07\x64\x65vices\x18\x01 \x03(\x0b\x32\x0e.SensorReading\"X\n\x0cResponseType\x12\x0f\n\x0b\x44\x45VICE_LIST\x10\x00\x12\x12\n\x0eSINGLE_READING\x10\x01\x12\x18\n\x14\x43OMMAND_CONFIRMATION\x10\x02\x12\t\n\x05\x45RROR\x10\x03\x42\t\n\x07payload\"3\n\x0f\x43ommandResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x07\n\x05\x45mpty\"+\n\x1aSemaphoreLightStateRequest\x12\r\n\x05state\x18\x01 \x01(\t\"}\n\x0e\x43ommandRequest\x12\x0f\n\x07\x63ommand\x18\x01 \x01(\t\x12+\n\x06params\x18\x02 \x03(\x0b\x32\x1b.CommandRequest.ParamsEntry\x1a-\n\x0bParamsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"G\n\rCommandResult\x12\x12\n\ncommand_id\x18\x01 \x01(\t\x12\"\n\x08response\x18\x02 \x01(\x0b\x32\x10.CommandResponse\"h\n\x0e\x44\x65viceEnvelope\x12!\n\x07reading\x18\x01 \x01(\x0b\x32\x0e.SensorReadingH\x00\x12(\n\x0e\x63ommand_result\x18\x02 \x01(\x0b\x32\x0e.CommandResultH\x00\x42\t\n\x07payload\"u\n\x0fGatewayEnvelope\x12\x12\n\ncommand_id\x18\x01 \x01(\t\x12\"\n\x07\x63ommand\x18\x02 \x01(\x0b\x32\x0f.CommandRequestH\x00\x12\x1f\n\rsend_tcp_data\x18\x03 \x01(\x0b\x32\x06.EmptyH\x00\x42\t\n\x07payload*a\n\nDeviceType\x12\x0b\n\x07UNKNOWN\x10\x00\x12\x0f\n\x0bTEMPERATURE\x10\x01\x12\x0c\n\x08HUMIDITY\x10\x02\x12\t\n\x05\x41LARM\x10\x03\x12\r\n\tLAMP_POST\x10\x04\x12\r\n\tSEMAPHORE\x10\x05\x32\xae\x01\n\rDeviceControl\x12\x30\n\x0bSendCommand\x12\x0f.CommandRequest\x1a\x10.CommandResponse\x12\'\n\x0bSendTcpData\x12\x06.Empty\x1a\x10.CommandResponse\x12\x42\n\x11SetSemaphoreLight\x12\x1b.SemaphoreLightStateRequest\x1a\x10.CommandResponse2D\n\x10GatewayTelemetry\x12\x30\n\x07\x43onnect\x12\x0f.DeviceEnvelope\x1a\x10.GatewayEnvelope(\x01\x30\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -25,42 +25,52 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['_SENSORREADING_METADATAENTRY']._serialized_options = b'8\001'
   _globals['_COMMANDREQUEST_PARAMSENTRY']._options = None
   _globals['_COMMANDREQUEST_PARAMSENTRY']._serialized_options = b'8\001'
-  _globals['_DEVICETYPE']._serialized_start=1523
-  _globals['_DEVICETYPE']._serialized_end=1620
+  _globals['_DEVICETYPE']._serialized_start=2079
+  _globals['_DEVICETYPE']._serialized_end=2176
   _globals['_SENSORREADING']._serialized_start=28
-  _globals['_SENSORREADING']._serialized_end=259
-  _globals['_SENSORREADING_METADATAENTRY']._serialized_start=212
-  _globals['_SENSORREADING_METADATAENTRY']._serialized_end=259
-  _globals['_RESPONSE']._serialized_start=261
-  _globals['_RESPONSE']._serialized_end=324
-  _globals['_GATEWAYANNOUNCEMENT']._serialized_start=327
-  _globals['_GATEWAYANNOUNCEMENT']._serialized_end=472
-  _globals['_DEVICECOMMAND']._serialized_start=474
-  _globals['_DEVICECOMMAND']._serialized_end=544
-  _globals['_APPREQUEST']._serialized_start=547
-  _globals['_APPREQUEST']._serialized_end=959
-  _globals['_APPREQUEST_ONDEMANDREQUEST']._serialized_start=762
-  _globals['_APPREQUEST_ONDEMANDREQUEST']._serialized_end=798
-  _globals['_APPREQUEST_STREAMLOCATIONREQUEST']._serialized_start=800
-  _globals['_APPREQUEST_STREAMLOCATIONREQUEST']._serialized_end=846
-  _globals['_APPREQUEST_REQUESTTYPE']._serialized_start=848
-  _globals['_APPREQUEST_REQUESTTYPE']._serialized_end=948
-  _globals['_GATEWAYRESPONSE']._serialized_start=962
-  _globals['_GATEWAYRESPONSE']._serialized_end=1287
-  _globals['_GATEWAYRESPONSE_DEVICELIST']._serialized_start=1152
-  _globals['_GATEWAYRESPONSE_DEVICELIST']._serialized_end=1197
-  _globals['_GATEWAYRESPONSE_RESPONSETYPE']._serialized_start=1199
-  _globals['_GATEWAYRESPONSE_RESPONSETYPE']._serialized_end=1276
-  _globals['_COMMANDRESPONSE']._serialized_start=1289
-  _globals['_COMMANDRESPONSE']._serialized_end=1340
-  _globals['_EMPTY']._serialized_start=1342
-  _globals['_EMPTY']._serialized_end=1349
-  _globals['_SEMAPHORELIGHTSTATEREQUEST']._serialized_start=1351
-  _globals['_SEMAPHORELIGHTSTATEREQUEST']._serialized_end=1394
-  _globals['_COMMANDREQUEST']._serialized_start=1396
-  _globals['_COMMANDREQUEST']._serialized_end=1521
-  _globals['_COMMANDREQUEST_PARAMSENTRY']._serialized_start=1476
-  _globals['_COMMANDREQUEST_PARAMSENTRY']._serialized_end=1521
-  _globals['_DEVICECONTROL']._serialized_start=1623
-  _globals['_DEVICECONTROL']._serialized_end=1797
+  _globals['_SENSORREADING']._serialized_end=294
+  _globals['_SENSORREADING_METADATAENTRY']._serialized_start=247
+  _globals['_SENSORREADING_METADATAENTRY']._serialized_end=294
+  _globals['_RESPONSE']._serialized_start=296
+  _globals['_RESPONSE']._serialized_end=383
+  _globals['_GATEWAYANNOUNCEMENT']._serialized_start=386
+  _globals['_GATEWAYANNOUNCEMENT']._serialized_end=640
+  _globals['_DISCOVERYREQUEST']._serialized_start=642
+  _globals['_DISCOVERYREQUEST']._serialized_end=694
+  _globals['_DEVICECOMMAND']._serialized_start=696
+  _globals['_DEVICECOMMAND']._serialized_end=766
+  _globals['_APPREQUEST']._serialized_start=769
+  _globals['_APPREQUEST']._serialized_end=1181
+  _globals['_APPREQUEST_ONDEMANDREQUEST']._serialized_start=984
+  _globals['_APPREQUEST_ONDEMANDREQUEST']._serialized_end=1020
+  _globals['_APPREQUEST_STREAMLOCATIONREQUEST']._serialized_start=1022
+  _globals['_APPREQUEST_STREAMLOCATIONREQUEST']._serialized_end=1068
+  _globals['_APPREQUEST_REQUESTTYPE']._serialized_start=1070
+  _globals['_APPREQUEST_REQUESTTYPE']._serialized_end=1170
+  _globals['_GATEWAYRESPONSE']._serialized_start=1184
+  _globals['_GATEWAYRESPONSE']._serialized_end=1545
+  _globals['_GATEWAYRESPONSE_DEVICELIST']._serialized_start=1399
+  _globals['_GATEWAYRESPONSE_DEVICELIST']._serialized_end=1444
+  _globals['_GATEWAYRESPONSE_RESPONSETYPE']._serialized_start=1446
+  _globals['_GATEWAYRESPONSE_RESPONSETYPE']._serialized_end=1534
+  _globals['_COMMANDRESPONSE']._serialized_start=1547
+  _globals['_COMMANDRESPONSE']._serialized_end=1598
+  _globals['_EMPTY']._serialized_start=1600
+  _globals['_EMPTY']._serialized_end=1607
+  _globals['_SEMAPHORELIGHTSTATEREQUEST']._serialized_start=1609
+  _globals['_SEMAPHORELIGHTSTATEREQUEST']._serialized_end=1652
+  _globals['_COMMANDREQUEST']._serialized_start=1654
+  _globals['_COMMANDREQUEST']._serialized_end=1779
+  _globals['_COMMANDREQUEST_PARAMSENTRY']._serialized_start=1734
+  _globals['_COMMANDREQUEST_PARAMSENTRY']._serialized_end=1779
+  _globals['_COMMANDRESULT']._serialized_start=1781
+  _globals['_COMMANDRESULT']._serialized_end=1852
+  _globals['_DEVICEENVELOPE']._serialized_start=1854
+  _globals['_DEVICEENVELOPE']._serialized_end=1958
+  _globals['_GATEWAYENVELOPE']._serialized_start=1960
+  _globals['_GATEWAYENVELOPE']._serialized_end=2077
+  _globals['_DEVICECONTROL']._serialized_start=2179
+  _globals['_DEVICECONTROL']._serialized_end=2353
+  _globals['_GATEWAYTELEMETRY']._serialized_start=2355
+  _globals['_GATEWAYTELEMETRY']._serialized_end=2423
 # @@protoc_insertion_point(module_scope)
@@ -130,3 +130,64 @@ class DeviceControl(object):
             proto_dot_sensor__data__pb2.CommandResponse.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+
+class GatewayTelemetryStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Connect = channel.stream_stream(
+                '/GatewayTelemetry/Connect',
+                request_serializer=proto_dot_sensor__data__pb2.DeviceEnvelope.SerializeToString,
+                response_deserializer=proto_dot_sensor__data__pb2.GatewayEnvelope.FromString,
+                )
+
+
+class GatewayTelemetryServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def Connect(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_GatewayTelemetryServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'Connect': grpc.stream_stream_rpc_method_handler(
+                    servicer.Connect,
+                    request_deserializer=proto_dot_sensor__data__pb2.DeviceEnvelope.FromString,
+                    response_serializer=proto_dot_sensor__data__pb2.GatewayEnvelope.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'GatewayTelemetry', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class GatewayTelemetry(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def Connect(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/GatewayTelemetry/Connect',
+            proto_dot_sensor__data__pb2.DeviceEnvelope.SerializeToString,
+            proto_dot_sensor__data__pb2.GatewayEnvelope.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -0,0 +1,144 @@
+import itertools
+import operator
+import threading
+from collections import defaultdict
+
+from proto.sensor_data_pb2 import DeviceType
+from command_queue import PRIORITY_HIGH
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Ex.: "ALARM value == 1 na localização X" -> Rule(sensor_type="ALARM", location="X", op="==", threshold=1, ...)
+#      "TEMPERATURE > 30 por 5 min"        -> Rule(sensor_type="TEMPERATURE", op=">", threshold=30, duration=300, ...)
+class Rule:
+    _ids = itertools.count(1)
+
+    def __init__(self, op, threshold, target_device, command, sensor_type=None, location=None, sensor_id=None,
+                 duration=0, params=None, priority=PRIORITY_HIGH, name=None):
+        if op not in OPERATORS:
+            raise ValueError(f"Operador inválido: {op}")
+
+        self.id = next(self._ids)
+        self.name = name or f"regra-{self.id}"
+        self.op = op
+        self.threshold = float(threshold)
+        self.sensor_type = DeviceType.Value(sensor_type) if isinstance(sensor_type, str) else sensor_type
+        self.location = location
+        self.sensor_id = sensor_id
+        self.duration = duration
+        self.target_device = target_device
+        self.command = command
+        self.params = params
+        self.priority = priority
+
+        self._compare = OPERATORS[op]
+
+    def matches(self, reading):
+        if self.sensor_id is not None and reading.sensor_id != self.sensor_id:
+            return False
+        if self.location is not None and reading.location != self.location:
+            return False
+        if self.sensor_type is not None and reading.sensor_type != self.sensor_type:
+            return False
+        return True
+
+    def condition(self, reading):
+        return self._compare(reading.value, self.threshold)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "sensor_type": DeviceType.Name(self.sensor_type) if self.sensor_type is not None else None,
+            "location": self.location,
+            "sensor_id": self.sensor_id,
+            "op": self.op,
+            "threshold": self.threshold,
+            "duration": self.duration,
+            "target_device": self.target_device,
+            "command": self.command,
+            "params": self.params,
+        }
+
+
+# Regras indexadas pelo filtro mais seletivo (sensor_id > localização > tipo):
+# cada leitura só avalia as regras dos índices que ela pode casar
+class RuleEngine:
+    def __init__(self, on_trigger=None):
+        self.on_trigger = on_trigger
+        self.rules = {}
+        self.by_sensor_id = defaultdict(list)
+        self.by_location = defaultdict(list)
+        self.by_type = defaultdict(list)
+        self.wildcard = []
+        # (rule_id, sensor_id) -> timestamp em que a condição passou a valer; None = já disparou
+        self.active = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, rule):
+        if rule.sensor_id is not None:
+            return self.by_sensor_id[rule.sensor_id]
+        if rule.location is not None:
+            return self.by_location[rule.location]
+        if rule.sensor_type is not None:
+            return self.by_type[rule.sensor_type]
+        return self.wildcard
+
+    def add(self, rule):
+        with self.lock:
+            self.rules[rule.id] = rule
+            self._bucket(rule).append(rule)
+        return rule
+
+    def remove(self, rule_id):
+        with self.lock:
+            rule = self.rules.pop(rule_id, None)
+            if rule is None:
+                return False
+            self._bucket(rule).remove(rule)
+            self.active = {key: since for key, since in self.active.items() if key[0] != rule_id}
+            return True
+
+    def list(self):
+        with self.lock:
+            return list(self.rules.values())
+
+    def candidates(self, reading):
+        return itertools.chain(
+            self.by_sensor_id.get(reading.sensor_id, ()),
+            self.by_location.get(reading.location, ()),
+            self.by_type.get(reading.sensor_type, ()),
+            self.wildcard,
+        )
+
+    def evaluate(self, reading):
+        triggered = []
+        with self.lock:
+            for rule in self.candidates(reading):
+                if not rule.matches(reading):
+                    continue
+
+                key = (rule.id, reading.sensor_id)
+                if not rule.condition(reading):
+                    # Condição deixou de valer: rearma a regra
+                    self.active.pop(key, None)
+                    continue
+
+                if key not in self.active:
+                    self.active[key] = reading.timestamp
+                since = self.active[key]
+                if since is not None and reading.timestamp - since >= rule.duration:
+                    self.active[key] = None
+                    triggered.append(rule)
+
+        if self.on_trigger:
+            for rule in triggered:
+                self.on_trigger(rule, reading)
+        return triggered
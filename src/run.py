@@ -1,52 +1,129 @@
+import argparse
+import importlib
 import time
-from gateway import Gateway
-from sensor_manager import DeviceManager
-from devices.humidity_sensor import HumiditySensorClient
-from devices.temperature_sensor import TemperatureSensorClient
-from devices.alarm_sensor import AlarmSensor
-from devices.semaphore import Semaphore
+
+# O módulo gateway é leve (pika e grpc só entram quando um transporte sobe), então a
+# lista de transportes vem dele. Dispositivos são importados só dentro do modo
+# escolhido: cada tipo de sensor só carrega o próprio módulo
+from gateway import Gateway, TRANSPORTS
+
+SENSOR_TYPES = {
+    "temperature": ("devices.temperature_sensor", "TemperatureSensorClient"),
+    "humidity": ("devices.humidity_sensor", "HumiditySensorClient"),
+    "alarm": ("devices.alarm_sensor", "AlarmSensor"),
+    "semaphore": ("devices.semaphore", "Semaphore"),
+}
+
+def load_sensor_class(kind):
+    module_name, class_name = SENSOR_TYPES[kind]
+    return getattr(importlib.import_module(module_name), class_name)
+
+def device_kwargs(args):
+    return {"telemetry_stream": args.stream, "aio_grpc": args.aio_grpc}
+
+def wait_forever():
+    while True:
+        time.sleep(1)
+
+def run_gateway(args):
+    if args.workers > 0:
+        from multiprocess_gateway import MultiProcessGateway
+        gateway = MultiProcessGateway(workers=args.workers, transports=args.transports,
+                                      shard=args.shard, shard_count=args.shard_count)
+    else:
+        gateway = Gateway(transports=args.transports, shard=args.shard, shard_count=args.shard_count)
+
+    try:
+        gateway.start()
+        wait_forever()
+    except KeyboardInterrupt:
+        gateway.stop()
+        print("\n🛑 Gateway desligado.")
+
+def run_multi(args):
+    from sensor_manager import DeviceManager
+    TemperatureSensorClient = load_sensor_class("temperature")
+    HumiditySensorClient = load_sensor_class("humidity")
+    AlarmSensor = load_sensor_class("alarm")
+    Semaphore = load_sensor_class("semaphore")
+    kwargs = device_kwargs(args)
+
+    manager = DeviceManager()
+
+    manager.add_sensor(TemperatureSensorClient("TEMP-01", "Cocó", interval=25, **kwargs))
+    manager.add_sensor(HumiditySensorClient("HUM-01", "Cocó", interval=25, **kwargs))
+    manager.add_sensor(TemperatureSensorClient("TEMP-02", "Iracema", interval=30, **kwargs))
+    manager.add_sensor(HumiditySensorClient("HUM-002", "Iracema", interval=30, **kwargs))
+    manager.add_sensor(TemperatureSensorClient("TEMP-03", "Aldeota", interval=35, **kwargs))
+    manager.add_sensor(HumiditySensorClient("HUM-003", "Aldeota", interval=35, **kwargs))
+
+    manager.add_sensor(AlarmSensor("ALARM-01", "Banco de Brasil", interval=10, **kwargs))
+    manager.add_sensor(AlarmSensor("ALARM-02", "Múseu de Arte", interval=15, **kwargs))
+
+    manager.add_sensor(Semaphore("SEM-01", "Rua Maria com rua João", interval=45, **kwargs))
+    manager.add_sensor(Semaphore("SEM-02", "Rua Leonardo com rua Pedro", interval=40, **kwargs))
+
+    try:
+        manager.start_all_sensors()
+        wait_forever()
+    except KeyboardInterrupt:
+        manager.stop_all_sensors()
+        print("\n🏁 Todos os sensores parados.")
+
+def run_sensor(args):
+    sensor_class = load_sensor_class(args.type)
+    sensor = sensor_class(args.id, args.location, interval=args.interval, **device_kwargs(args))
+
+    try:
+        sensor.start()
+        wait_forever()
+    except KeyboardInterrupt:
+        sensor.stop()
+        print(f"\n🏁 Sensor {args.id} parou.")
+
+def parse_transports(value):
+    transports = [t.strip() for t in value.split(",") if t.strip()]
+    unknown = set(transports) - set(TRANSPORTS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"transportes desconhecidos: {', '.join(sorted(unknown))}")
+    return transports
+
+def add_device_options(parser):
+    parser.add_argument("--stream", action="store_true",
+                        help="leituras e comandos por um único stream gRPC com o gateway (sem RabbitMQ nem servidor gRPC local)")
+    parser.add_argument("--aio-grpc", action="store_true",
+                        help="servidor gRPC de comandos no event loop compartilhado (grpc.aio)")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Gateway e dispositivos simulados")
+    subparsers = parser.add_subparsers(dest="mode")
+
+    gateway_parser = subparsers.add_parser("gateway", help="roda o gateway")
+    gateway_parser.add_argument("--transports", type=parse_transports, default=list(TRANSPORTS),
+                                help=f"transportes separados por vírgula (padrão: {','.join(TRANSPORTS)})")
+    gateway_parser.add_argument("--workers", type=int, default=0,
+                                help="processos de ingestão com store em memória compartilhada (0 = processo único)")
+    gateway_parser.add_argument("--shard", type=int, default=0)
+    gateway_parser.add_argument("--shard-count", type=int, default=1)
+    gateway_parser.set_defaults(func=run_gateway)
+
+    multi_parser = subparsers.add_parser("multi", help="roda o conjunto de sensores de demonstração")
+    add_device_options(multi_parser)
+    multi_parser.set_defaults(func=run_multi)
+
+    sensor_parser = subparsers.add_parser("sensor", help="roda um único sensor (modo padrão)")
+    sensor_parser.add_argument("--type", choices=sorted(SENSOR_TYPES), default="temperature")
+    sensor_parser.add_argument("--id", default="TEMP-SENSOR-01")
+    sensor_parser.add_argument("--location", default="Aldeota")
+    sensor_parser.add_argument("--interval", type=float, default=30)
+    add_device_options(sensor_parser)
+    sensor_parser.set_defaults(func=run_sensor)
+
+    return parser
 
 if __name__ == "__main__":
     import sys
-    
-    if len(sys.argv) > 1 and sys.argv[1] == "gateway":
-        # Roda gateway
-        gateway = Gateway()
-        gateway.start()
-    
-    elif len(sys.argv) > 1 and sys.argv[1] == "multi":
-        # Roda múltiplos sensores
-        manager = DeviceManager()
-        
-        manager.add_sensor(TemperatureSensorClient("TEMP-01", "Cocó", interval=25))
-        manager.add_sensor(HumiditySensorClient("HUM-01", "Cocó", interval=25))
-        manager.add_sensor(TemperatureSensorClient("TEMP-02", "Iracema", interval=30))
-        manager.add_sensor(HumiditySensorClient("HUM-002", "Iracema", interval=30))
-        manager.add_sensor(TemperatureSensorClient("TEMP-03", "Aldeota", interval=35))
-        manager.add_sensor(HumiditySensorClient("HUM-003", "Aldeota", interval=35))
-
-        manager.add_sensor(AlarmSensor("ALARM-01", "Banco de Brasil", interval=10))
-        manager.add_sensor(AlarmSensor("ALARM-02", "Múseu de Arte", interval=15))
-
-        manager.add_sensor(Semaphore("SEM-01", "Rua Maria com rua João", interval=45))
-        manager.add_sensor(Semaphore("SEM-02", "Rua Leonardo com rua Pedro", interval=40))
-        
-        try:
-            manager.start_all_sensors()
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            manager.stop_all_sensors()
-            print("\n🏁 Todos os sensores parados.")
-    
-    else:
-        # Roda um único sensor
-        sensor = TemperatureSensorClient("TEMP-SENSOR-01", "Aldeota", interval=30)
-        
-        try:
-            sensor.start()
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            sensor.stop()
-            print("\n🏁 Sensor de temperatura parou.")
+
+    # Sem argumentos roda um único sensor de temperatura, como antes
+    args = build_parser().parse_args(sys.argv[1:] or ["sensor"])
+    args.func(args)
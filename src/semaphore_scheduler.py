@@ -0,0 +1,128 @@
+import itertools
+import threading
+import time
+
+from command_queue import PRIORITY_HIGH, PRIORITY_NORMAL
+from semaphore_timing import SignalTiming, PLAN_COMMAND
+
+# Plano de um grupo de semáforos: mesmos tempos de fase e epoch para todos, e um
+# offset por semáforo (início do verde). Offsets crescendo com o tempo de percurso
+# entre cruzamentos formam uma onda verde.
+class SemaphoreGroupPlan:
+    _ids = itertools.count(1)
+
+    def __init__(self, group, devices, verde, vermelho, amarelo, offsets=None, travel_time=0.0, epoch=None):
+        if not devices:
+            raise ValueError("O plano precisa de ao menos um semáforo")
+        if offsets is not None and len(offsets) != len(devices):
+            raise ValueError(f"{len(offsets)} offsets para {len(devices)} semáforos")
+
+        self.group = group
+        self.plan_id = f"{group}-{next(self._ids)}"
+        self.epoch = float(epoch if epoch is not None else int(time.time()))
+        cycle = float(verde) + float(vermelho) + float(amarelo)
+        if offsets is None:
+            offsets = [i * travel_time for i in range(len(devices))]
+        self.timings = {
+            device_id: SignalTiming(verde, vermelho, amarelo, offset % cycle if cycle > 0 else 0, self.epoch, self.plan_id)
+            for device_id, offset in zip(devices, offsets)
+        }
+
+    def to_dict(self, now=None):
+        now = time.time() if now is None else now
+        any_timing = next(iter(self.timings.values()))
+        devices = []
+        for device_id, timing in self.timings.items():
+            state, remaining = timing.phase(now)
+            devices.append({
+                "device_id": device_id,
+                "offset": timing.offset,
+                "expected_state": state,
+                "next_change_in": round(remaining, 2),
+            })
+        return {
+            "group": self.group,
+            "plan_id": self.plan_id,
+            "epoch": self.epoch,
+            "cycle": any_timing.cycle,
+            "splits": dict(any_timing.durations),
+            "devices": devices,
+        }
+
+
+# Planos ativos por grupo. Aplicar um plano enfileira de uma vez um único comando
+# por semáforo; depois disso cada dispositivo roda o plano sozinho contra o relógio.
+# Um semáforo pertence a um grupo por vez.
+class SemaphoreScheduler:
+    def __init__(self, enqueue_fn):
+        self.enqueue_fn = enqueue_fn
+        self.plans = {}
+        self.device_groups = {}
+        # Último boot_id visto de cada semáforo com plano: um boot novo significa que
+        # o dispositivo reiniciou com o plano local, mesmo sem ter ficado OFFLINE
+        self.boot_ids = {}
+        self.lock = threading.Lock()
+
+    def apply(self, plan):
+        with self.lock:
+            previous = self.plans.get(plan.group)
+            if previous:
+                for device_id in previous.timings:
+                    self.device_groups.pop(device_id, None)
+                    if device_id not in plan.timings:
+                        self.boot_ids.pop(device_id, None)
+            for device_id in plan.timings:
+                other = self.device_groups.get(device_id)
+                if other is not None and other != plan.group:
+                    self.plans[other].timings.pop(device_id, None)
+                    if not self.plans[other].timings:
+                        del self.plans[other]
+                self.device_groups[device_id] = plan.group
+            self.plans[plan.group] = plan
+
+        return {
+            device_id: self.enqueue_fn(device_id, PLAN_COMMAND, timing.to_params(), PRIORITY_HIGH)
+            for device_id, timing in plan.timings.items()
+        }
+
+    def remove(self, group):
+        # Os semáforos continuam no último plano recebido até outro comando de tempo
+        with self.lock:
+            plan = self.plans.pop(group, None)
+            if plan is None:
+                return False
+            for device_id in plan.timings:
+                self.device_groups.pop(device_id, None)
+                self.boot_ids.pop(device_id, None)
+            return True
+
+    def resend(self, device_id):
+        # Dispositivo que voltou (ex.: reiniciou) perdeu o plano: reenviado com o mesmo epoch
+        with self.lock:
+            group = self.device_groups.get(device_id)
+            timing = self.plans[group].timings.get(device_id) if group is not None else None
+        if timing is None:
+            return None
+        return self.enqueue_fn(device_id, PLAN_COMMAND, timing.to_params(), PRIORITY_NORMAL)
+
+    def observe(self, device_id, boot_id):
+        # Chamado a cada leitura armazenada; sensores sem plano saem sem travar
+        if device_id not in self.device_groups or not boot_id:
+            return None
+        with self.lock:
+            if device_id not in self.device_groups:
+                return None
+            previous = self.boot_ids.get(device_id)
+            self.boot_ids[device_id] = boot_id
+        if previous is None or previous == boot_id:
+            return None
+        # Se a transição para ONLINE também reenviar, a fila junta os dois comandos
+        return self.resend(device_id)
+
+    def get(self, group):
+        with self.lock:
+            return self.plans.get(group)
+
+    def list(self):
+        with self.lock:
+            return list(self.plans.values())
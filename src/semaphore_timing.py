@@ -0,0 +1,61 @@
+import math
+import time
+
+# Modelo de tempos compartilhado pelo gateway (planos, fila de comandos) e pelo
+# dispositivo semáforo; não depende de nenhum dos dois lados
+PLAN_COMMAND = "semaphore_plan"
+
+# Mesma sequência do ciclo original do semáforo: verde -> vermelho -> amarelo -> verde
+PHASE_ORDER = ("verde", "vermelho", "amarelo")
+
+
+# Plano de tempos de um semáforo calculado sobre um relógio compartilhado: o estado
+# num instante é função de (agora - epoch - offset) módulo o ciclo, então semáforos
+# com o mesmo epoch e offsets escalonados formam uma onda verde sem trocar mensagens.
+# O offset marca o início do verde.
+class SignalTiming:
+    __slots__ = ("durations", "cycle", "offset", "epoch", "plan_id")
+
+    def __init__(self, verde, vermelho, amarelo, offset=0.0, epoch=0.0, plan_id=""):
+        self.durations = {"verde": float(verde), "vermelho": float(vermelho), "amarelo": float(amarelo)}
+        # Parâmetros chegam como texto do gateway: "nan", "inf" ou fases negativas
+        # passariam pelo float() e quebrariam o cálculo da fase
+        for state, duration in self.durations.items():
+            if not math.isfinite(duration) or duration <= 0:
+                raise ValueError(f"Duração do {state} precisa ser um número maior que zero: {duration}")
+        self.cycle = sum(self.durations.values())
+        self.offset = float(offset)
+        self.epoch = float(epoch)
+        if not math.isfinite(self.offset) or not math.isfinite(self.epoch):
+            raise ValueError("Offset e epoch do semáforo precisam ser números finitos")
+        self.plan_id = plan_id
+
+    def phase(self, now=None):
+        # Retorna (estado, segundos até a próxima troca)
+        now = time.time() if now is None else now
+        position = (now - self.epoch - self.offset) % self.cycle
+        for state in PHASE_ORDER:
+            duration = self.durations[state]
+            if position < duration:
+                return state, duration - position
+            position -= duration
+        return PHASE_ORDER[-1], 0.0
+
+    def to_params(self):
+        # Parâmetros do CommandRequest são strings
+        return {
+            "verde": repr(self.durations["verde"]),
+            "vermelho": repr(self.durations["vermelho"]),
+            "amarelo": repr(self.durations["amarelo"]),
+            "offset": repr(self.offset),
+            "epoch": repr(self.epoch),
+            "plan_id": self.plan_id,
+        }
+
+    @classmethod
+    def from_params(cls, params):
+        missing = [state for state in PHASE_ORDER if state not in params]
+        if missing:
+            raise ValueError(f"Plano sem duração para: {', '.join(missing)}")
+        return cls(params["verde"], params["vermelho"], params["amarelo"],
+                   params.get("offset", 0), params.get("epoch", 0), params.get("plan_id", ""))
@@ -0,0 +1,320 @@
+import struct
+import time
+import zlib
+from multiprocessing import shared_memory
+
+from proto.sensor_data_pb2 import SensorReading
+
+# Colunas numéricas (nome, formato struct) e colunas de texto com largura fixa
+NUMERIC_COLUMNS = (
+    ("version", "Q"),
+    ("value", "d"),
+    ("timestamp", "q"),
+    ("sequence", "Q"),
+    ("boot_id", "Q"),
+    ("sensor_type", "i"),
+    ("grpc_port", "i"),
+)
+STRING_COLUMNS = (
+    ("sensor_id", 64),
+    ("location", 64),
+    ("unit", 16),
+    ("address", 48),
+)
+# Anel de mudanças: cada escrita aceita acrescenta (slot, valores) para o processo
+# principal consumir em ordem, sem varrer os slots nem perder leituras intermediárias
+CHANGE_COLUMNS = (
+    ("slot", "q"),
+    ("value", "d"),
+    ("timestamp", "q"),
+    ("sequence", "Q"),
+    ("boot_id", "Q"),
+    ("sensor_type", "i"),
+)
+HEADER = struct.Struct("QQQQ")  # (count, capacity, mudanças escritas, capacidade do anel)
+SENSOR_ID_WIDTH = STRING_COLUMNS[0][1]
+# Quanto um leitor espera por uma escrita em curso antes de desistir do slot. Um
+# worker que morre no meio de uma escrita deixa a versão ímpar para sempre.
+READ_RETRY_TIMEOUT = 0.05
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def index_size(capacity):
+    # Tabela de hash com endereçamento aberto: potência de dois com ao menos o dobro
+    # de entradas que slots, para as sondagens lineares continuarem curtas
+    return 1 << max(1, (2 * capacity - 1).bit_length())
+
+
+def fit_sensor_id(sensor_id):
+    # Mesmo corte da coluna sensor_id, sem deixar um caractere UTF-8 pela metade
+    return sensor_id.encode("utf-8")[:SENSOR_ID_WIDTH].decode("utf-8", "ignore")
+
+
+def layout_size(capacity, changes_capacity):
+    size = HEADER.size + 4 * index_size(capacity)
+    for _, fmt in NUMERIC_COLUMNS:
+        size = _align(size) + struct.calcsize(fmt) * capacity
+    for _, width in STRING_COLUMNS:
+        size = _align(size) + width * capacity
+    for _, fmt in CHANGE_COLUMNS:
+        size = _align(size) + struct.calcsize(fmt) * changes_capacity
+    return size
+
+
+# Armazena a última leitura de cada sensor em colunas dentro de um bloco de
+# memória compartilhada. Escritores (processos de ingestão) serializam as escritas
+# com um multiprocessing.Lock; leitores (processo da API) não travam nada e usam
+# o contador de versão de cada slot como seqlock: versão ímpar = escrita em curso.
+class SharedReadingStore:
+    def __init__(self, name=None, capacity=65536, create=False, lock=None, changes_capacity=65536):
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=layout_size(capacity, changes_capacity))
+            HEADER.pack_into(self.shm.buf, 0, 0, capacity, 0, changes_capacity)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            _, capacity, _, changes_capacity = HEADER.unpack_from(self.shm.buf, 0)
+
+        self.name = self.shm.name
+        self.capacity = capacity
+        self.changes_capacity = changes_capacity
+        self.lock = lock
+        self.owner = create
+
+        buf = self.shm.buf
+        self._count = buf[0:8].cast("Q")
+        self._changes_written = buf[16:24].cast("Q")
+        # Índice sensor_id -> slot compartilhado: cada entrada guarda slot + 1 (0 = vazia)
+        self.index_mask = index_size(capacity) - 1
+        offset = HEADER.size
+        self._index = buf[offset:offset + 4 * (self.index_mask + 1)].cast("i")
+        offset += 4 * (self.index_mask + 1)
+        self.columns = {}
+        for column, fmt in NUMERIC_COLUMNS:
+            offset = _align(offset)
+            end = offset + struct.calcsize(fmt) * capacity
+            self.columns[column] = buf[offset:end].cast(fmt)
+            offset = end
+        self.strings = {}
+        for column, width in STRING_COLUMNS:
+            offset = _align(offset)
+            end = offset + width * capacity
+            self.strings[column] = (buf[offset:end], width)
+            offset = end
+        self.changes = {}
+        for column, fmt in CHANGE_COLUMNS:
+            offset = _align(offset)
+            end = offset + struct.calcsize(fmt) * changes_capacity
+            self.changes[column] = buf[offset:end].cast(fmt)
+            offset = end
+
+        # Cache local (por processo) de sensor_id -> slot
+        self.index = {}
+        # Leituras abandonadas porque o slot não estabilizou dentro de READ_RETRY_TIMEOUT
+        self.torn_reads = 0
+
+    def __len__(self):
+        return self._count[0]
+
+    def close(self):
+        # As memoryviews precisam ser liberadas antes de fechar o bloco
+        for column in self.columns.values():
+            column.release()
+        for view, _ in self.strings.values():
+            view.release()
+        for column in self.changes.values():
+            column.release()
+        self._count.release()
+        self._changes_written.release()
+        self._index.release()
+        self.columns = {}
+        self.strings = {}
+        self.changes = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def _read_string(self, column, slot):
+        view, width = self.strings[column]
+        return bytes(view[slot * width:(slot + 1) * width]).rstrip(b"\0").decode("utf-8", "ignore")
+
+    def _write_string(self, column, slot, text):
+        view, width = self.strings[column]
+        data = text.encode("utf-8")[:width]
+        view[slot * width:(slot + 1) * width] = data.ljust(width, b"\0")
+
+    def _probe(self, sensor_id):
+        # Retorna (posição no índice, slot); slot None = posição vazia onde o sensor entraria
+        index = self._index
+        position = zlib.crc32(sensor_id.encode("utf-8")) & self.index_mask
+        while True:
+            entry = index[position]
+            if entry == 0:
+                return position, None
+            if self._read_string("sensor_id", entry - 1) == sensor_id:
+                return position, entry - 1
+            position = (position + 1) & self.index_mask
+
+    def _find_slot(self, sensor_id):
+        slot = self.index.get(sensor_id)
+        if slot is not None:
+            return slot
+        # Sensor inserido por outro processo: consulta o índice compartilhado e guarda no cache
+        slot = self._probe(sensor_id)[1]
+        if slot is not None:
+            self.index[sensor_id] = slot
+        return slot
+
+    def _allocate_slot(self, sensor_id):
+        # Só com o lock de escrita: o nome vai para a coluna antes de a entrada do
+        # índice apontar para ele, então um leitor nunca compara com um slot vazio
+        count = len(self)
+        if count >= self.capacity:
+            return None
+        position = self._probe(sensor_id)[0]
+        self._write_string("sensor_id", count, sensor_id)
+        self._index[position] = count + 1
+        self._count[0] = count + 1
+        self.index[sensor_id] = count
+        return count
+
+    def _is_newer(self, slot, reading):
+        columns = self.columns
+        if columns["version"][slot] == 0:
+            return True
+        if reading.sequence:
+            stored = (columns["boot_id"][slot], columns["sequence"][slot])
+            return (reading.boot_id, reading.sequence) > stored
+        return reading.timestamp >= columns["timestamp"][slot]
+
+    def write(self, reading, address):
+        sensor_id = fit_sensor_id(reading.sensor_id)
+        with self.lock:
+            slot = self._find_slot(sensor_id)
+            if slot is None:
+                slot = self._allocate_slot(sensor_id)
+                if slot is None:
+                    return False
+            if not self._is_newer(slot, reading):
+                return False
+
+            columns = self.columns
+            version = columns["version"][slot]
+            columns["version"][slot] = version + 1
+            columns["value"][slot] = reading.value
+            columns["timestamp"][slot] = reading.timestamp
+            columns["sequence"][slot] = reading.sequence
+            columns["boot_id"][slot] = reading.boot_id
+            columns["sensor_type"][slot] = reading.sensor_type
+            columns["grpc_port"][slot] = int(reading.metadata.get("grpc_port", 50051))
+            self._write_string("location", slot, reading.location)
+            self._write_string("unit", slot, reading.unit)
+            self._write_string("address", slot, address)
+            columns["version"][slot] = version + 2
+            self._append_change(slot, reading)
+        return True
+
+    def _append_change(self, slot, reading):
+        # Só com o lock de escrita. A entrada é preenchida antes de o contador andar:
+        # quem lê o contador só enxerga entradas completas
+        changes = self.changes
+        written = self._changes_written[0]
+        i = written % self.changes_capacity
+        changes["slot"][i] = slot
+        changes["value"][i] = reading.value
+        changes["timestamp"][i] = reading.timestamp
+        changes["sequence"][i] = reading.sequence
+        changes["boot_id"][i] = reading.boot_id
+        changes["sensor_type"][i] = reading.sensor_type
+        self._changes_written[0] = written + 1
+
+    def read_changes(self, cursor):
+        # Consumidor único, sem lock. Retorna (novo cursor, mudanças, perdidas): se o
+        # consumidor ficou mais de um anel para trás, as mais antigas foram sobrescritas
+        capacity = self.changes_capacity
+        written = self._changes_written[0]
+        # A posição da próxima escrita (written % capacity) pode estar sendo
+        # preenchida agora: só as capacity - 1 entradas mais recentes são seguras
+        start = max(cursor, written - capacity + 1)
+        columns = []
+        for column, _ in CHANGE_COLUMNS:
+            view = self.changes[column]
+            # Fatias contíguas em vez de um laço por entrada; o anel pode dar a volta
+            values = []
+            position = start
+            while position < written:
+                offset = position % capacity
+                end = min(offset + written - position, capacity)
+                values.extend(view[offset:end].tolist())
+                position += end - offset
+            columns.append(values)
+
+        # Escritores podem ter sobrescrito o começo do trecho durante a cópia
+        valid = min(written, max(start, self._changes_written[0] - capacity + 1))
+        rows = list(zip(*columns))[valid - start:]
+        return written, rows, valid - cursor
+
+    def read_slot(self, slot):
+        columns = self.columns
+        deadline = None
+        while True:
+            before = columns["version"][slot]
+            if before == 0:
+                return None
+            if before % 2:
+                # Escrita em curso: cede a CPU ao escritor em vez de girar
+                if deadline is None:
+                    deadline = time.monotonic() + READ_RETRY_TIMEOUT
+                elif time.monotonic() > deadline:
+                    self.torn_reads += 1
+                    return None
+                time.sleep(0)
+                continue
+            row = {
+                "sensor_id": self._read_string("sensor_id", slot),
+                "location": self._read_string("location", slot),
+                "unit": self._read_string("unit", slot),
+                "address": self._read_string("address", slot),
+                "value": columns["value"][slot],
+                "timestamp": columns["timestamp"][slot],
+                "sequence": columns["sequence"][slot],
+                "boot_id": columns["boot_id"][slot],
+                "sensor_type": columns["sensor_type"][slot],
+                "grpc_port": columns["grpc_port"][slot],
+            }
+            if columns["version"][slot] == before:
+                return row
+
+    def labels(self, slot):
+        # Colunas de texto de um slot (o sensor_id nunca muda depois de alocado)
+        return self._read_string("sensor_id", slot), self._read_string("location", slot), self._read_string("unit", slot)
+
+    def get(self, sensor_id):
+        slot = self._find_slot(fit_sensor_id(sensor_id))
+        return self.read_slot(slot) if slot is not None else None
+
+    def snapshot(self):
+        rows = {}
+        for slot in range(len(self)):
+            row = self.read_slot(slot)
+            if row:
+                rows[row["sensor_id"]] = row
+        return rows
+
+
+def row_to_reading(row):
+    reading = SensorReading(
+        sensor_id=row["sensor_id"],
+        location=row["location"],
+        sensor_type=row["sensor_type"],
+        value=row["value"],
+        unit=row["unit"],
+        timestamp=row["timestamp"],
+        sequence=row["sequence"],
+        boot_id=row["boot_id"],
+    )
+    reading.metadata["address"] = row["address"]
+    reading.metadata["grpc_port"] = str(row["grpc_port"])
+    return reading
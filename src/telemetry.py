@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import uuid
+from concurrent.futures import Future, TimeoutError
+
+from proto import sensor_data_pb2
+from proto import sensor_data_pb2_grpc
+
+# Sessão de um dispositivo conectado por stream bidirecional ao gateway. O stream
+# roda como task no event loop do servidor grpc.aio; comandos chegam de outras
+# threads e entram na fila de saída via call_soon_threadsafe
+class TelemetrySession:
+    def __init__(self, peer, loop):
+        self.peer = peer
+        self.sensor_id = None
+        self.loop = loop
+        self.outbound = asyncio.Queue()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.closed = threading.Event()
+
+    @property
+    def address(self):
+        # peer do gRPC tem o formato "ipv4:127.0.0.1:54321" ou "ipv6:[::1]:54321"
+        host = self.peer.split(":", 1)[-1].rsplit(":", 1)[0]
+        return host.strip("[]")
+
+    def submit_command(self, command_str, params=None):
+        command_id = uuid.uuid4().hex
+        future = Future()
+        with self.pending_lock:
+            self.pending[command_id] = future
+
+        envelope = sensor_data_pb2.GatewayEnvelope(command_id=command_id)
+        if command_str == "send_tcp_data":
+            envelope.send_tcp_data.SetInParent()
+        else:
+            envelope.command.command = command_str
+            if params:
+                envelope.command.params.update({k: str(v) for k, v in params.items()})
+        self._push(envelope)
+        return command_id, future
+
+    def _push(self, envelope):
+        try:
+            self.loop.call_soon_threadsafe(self.outbound.put_nowait, envelope)
+        except RuntimeError:
+            # Loop do servidor já encerrado: o stream acabou junto
+            pass
+
+    def _forget(self, command_id):
+        with self.pending_lock:
+            self.pending.pop(command_id, None)
+
+    def send_command(self, command_str, params=None, timeout=10):
+        if self.closed.is_set():
+            return None
+
+        command_id, future = self.submit_command(command_str, params)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            return None
+        finally:
+            self._forget(command_id)
+
+    async def send_command_async(self, command_str, params=None, timeout=10):
+        if self.closed.is_set():
+            return None
+
+        command_id, future = self.submit_command(command_str, params)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._forget(command_id)
+
+    def resolve(self, command_result):
+        with self.pending_lock:
+            future = self.pending.get(command_result.command_id)
+        if future and not future.done():
+            future.set_result(command_result.response)
+
+    def close(self):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self._push(None)
+        with self.pending_lock:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_result(None)
+
+    async def outbound_messages(self):
+        while (envelope := await self.outbound.get()) is not None:
+            yield envelope
+
+
+# Servicer grpc.aio: cada stream é uma task lendo o request_iterator e um gerador
+# esvaziando a fila de saída, sem thread dedicada por dispositivo
+class GatewayTelemetryServicer(sensor_data_pb2_grpc.GatewayTelemetryServicer):
+    def __init__(self, gateway):
+        self.gateway = gateway
+
+    async def Connect(self, request_iterator, context):
+        session = TelemetrySession(context.peer(), asyncio.get_running_loop())
+        consumer = asyncio.create_task(self._consume(session, request_iterator))
+        try:
+            async for envelope in session.outbound_messages():
+                yield envelope
+        finally:
+            session.close()
+            consumer.cancel()
+
+    async def _consume(self, session, request_iterator):
+        try:
+            async for envelope in request_iterator:
+                kind = envelope.WhichOneof("payload")
+                if kind == "reading":
+                    reading = envelope.reading
+                    if session.sensor_id is None:
+                        # A primeira leitura identifica o dispositivo no stream
+                        session.sensor_id = reading.sensor_id
+                        self.gateway.register_telemetry_session(session)
+                    self.gateway.handle_stream_reading(reading, session)
+                elif kind == "command_result":
+                    session.resolve(envelope.command_result)
+        except Exception as e:
+            if not session.closed.is_set():
+                print(f"⚠️ Stream de telemetria de {session.peer} encerrado: {e}")
+        finally:
+            if session.sensor_id is not None:
+                self.gateway.unregister_telemetry_session(session)
+            session.close()
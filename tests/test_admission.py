@@ -0,0 +1,127 @@
+import threading
+
+from admission import AdmissionController, ADMITTED, RATE_LIMITED, QUEUE_FULL
+from gateway import Gateway
+from proto.sensor_data_pb2 import SensorReading
+
+
+def reading(sensor_id, sequence, value=None):
+    return SensorReading(sensor_id=sensor_id, sequence=sequence, boot_id=1, timestamp=1700000000 + sequence,
+                         value=float(sequence if value is None else value))
+
+
+def test_admits_until_burst_then_rate_limits():
+    admission = AdmissionController(queue_size=100, rate_per_source=1.0, burst=3)
+    verdicts = [admission.admit(i, "S1", "TCP")[0] for i in range(4)]
+    assert verdicts == [ADMITTED, ADMITTED, ADMITTED, RATE_LIMITED]
+
+    verdict, retry_after = admission.admit(4, "S1", "TCP")
+    assert verdict == RATE_LIMITED
+    assert 0 < retry_after <= 1.0
+    # Outra origem tem seu próprio bucket
+    assert admission.admit(5, "S2", "TCP")[0] == ADMITTED
+    assert admission.stats()["counters"]["TCP"] == {ADMITTED: 4, RATE_LIMITED: 2}
+
+
+def test_queue_full_returns_retry_after():
+    admission = AdmissionController(queue_size=2, rate_per_source=0, queue_retry_after=0.5)
+    assert admission.admit(1, "S1", "TCP") == (ADMITTED, 0)
+    assert admission.admit(2, "S1", "TCP") == (ADMITTED, 0)
+    assert admission.admit(3, "S1", "TCP") == (QUEUE_FULL, 0.5)
+
+
+def test_same_source_always_lands_on_same_shard():
+    admission = AdmissionController(queue_size=0, rate_per_source=0, shards=4)
+    for i in range(10):
+        admission.admit(("S1", i), "S1", "TCP")
+    depths = [q.qsize() for q in admission.queues]
+    assert sorted(depths) == [0, 0, 0, 10]
+
+
+def test_store_workers_keep_per_sensor_order():
+    # Vários workers: seq N e N+1 do mesmo sensor não podem ser gravadas fora de ordem
+    gateway = Gateway(transports=(), verbose=False, source_rate=0, ingest_queue_size=0, ingest_workers=4)
+    order = []
+    lock = threading.Lock()
+    store = gateway._store_reading
+
+    def recording_store(reading, *args):
+        stored = store(reading, *args)
+        if stored:
+            with lock:
+                order.append((reading.sensor_id, reading.sequence))
+        return stored
+
+    gateway._store_reading = recording_store
+    gateway.start_store_workers()
+    for sequence in range(1, 2001):
+        for sensor_id in ("A", "B", "C"):
+            gateway._admit(reading(sensor_id, sequence), "10.0.0.1", ("10.0.0.1", 0), "TCP")
+    gateway.drain_ingest()
+    gateway.stop()
+
+    for sensor_id in ("A", "B", "C"):
+        sequences = [seq for sid, seq in order if sid == sensor_id]
+        assert sequences == list(range(1, 2001))
+        assert gateway.get_sensor_reading(sensor_id).sequence == 2000
+
+
+class FakeConnection:
+    def __init__(self):
+        self.timers = []
+
+    def call_later(self, delay, callback):
+        self.timers.append((delay, callback))
+
+
+class FakeChannel:
+    def __init__(self):
+        self.connection = FakeConnection()
+        self.is_open = True
+        self.acks = []
+        self.nacks = []
+
+    def basic_ack(self, delivery_tag):
+        self.acks.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue):
+        self.nacks.append((delivery_tag, requeue))
+
+
+class Delivery:
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+
+
+def test_rabbitmq_rejected_messages_are_requeued_later_without_blocking():
+    gateway = Gateway(transports=(), verbose=False, source_rate=1.0, source_burst=1, rabbitmq_requeue_delay=2.0)
+    channel = FakeChannel()
+    body = reading("S1", 1).SerializeToString()
+
+    gateway._rabbitmq_callback(channel, Delivery(1), None, body)
+    gateway._rabbitmq_callback(channel, Delivery(2), None, reading("S1", 2).SerializeToString())
+    assert channel.acks == [1]
+    # Recusada: sem ack nem nack imediato, devolvida só quando o timer dispara
+    assert channel.nacks == []
+    assert [delay for delay, _ in channel.connection.timers] == [2.0]
+
+    channel.connection.timers[0][1]()
+    assert channel.nacks == [(2, True)]
+
+
+def test_rabbitmq_requeue_skipped_when_channel_closed():
+    gateway = Gateway(transports=(), verbose=False, source_rate=0, ingest_queue_size=1)
+    channel = FakeChannel()
+    gateway._rabbitmq_callback(channel, Delivery(1), None, reading("S1", 1).SerializeToString())
+    gateway._rabbitmq_callback(channel, Delivery(2), None, reading("S1", 2).SerializeToString())
+    channel.is_open = False
+    channel.connection.timers[0][1]()
+    assert channel.acks == [1]
+    assert channel.nacks == []
+
+
+def test_rabbitmq_malformed_message_is_acked():
+    gateway = Gateway(transports=(), verbose=False)
+    channel = FakeChannel()
+    gateway._rabbitmq_callback(channel, Delivery(7), None, b"\xff\xff\xff")
+    assert channel.acks == [7]
@@ -0,0 +1,57 @@
+from concurrent.futures import Future
+
+import pytest
+
+from devices.aio_runtime import shared_loop
+from devices.default_device import DeviceClient
+from gateway import Gateway, aio_target
+from liveness import OFFLINE
+from proto.sensor_data_pb2 import SensorReading
+
+
+def test_failed_aio_server_releases_waiters(capsys):
+    device = DeviceClient("TEMP-01", "Sala", aio_grpc=True)
+    device.sock.close()
+    future = Future()
+    future.add_done_callback(device._aio_server_done)
+    future.set_exception(RuntimeError("porta ocupada"))
+    assert device.grpc_server_started.is_set()
+    assert "porta ocupada" in capsys.readouterr().out
+
+
+class FakeChannel:
+    def __init__(self):
+        self.closed = Future()
+
+    async def close(self):
+        self.closed.set_result(True)
+
+
+@pytest.fixture
+def gateway():
+    gateway = Gateway(transports=(), verbose=False, history_capacity=0)
+    gateway.command_queue.loop = shared_loop()
+    reading = SensorReading(sensor_id="AC-01", timestamp=1700000000, sequence=1, boot_id=1)
+    reading.metadata["grpc_port"] = "50051"
+    gateway._store_reading(reading, "10.0.0.7", ("10.0.0.7", 40000), "UDP")
+    return gateway
+
+
+def test_offline_device_channel_is_closed_and_evicted(gateway):
+    target = aio_target(gateway.get_device_info("AC-01"))
+    channel = gateway._aio_channels[target] = FakeChannel()
+    gateway._aio_channels["10.0.0.8:50051"] = other = FakeChannel()
+
+    gateway._on_liveness_transition("AC-01", OFFLINE)
+    assert channel.closed.result(timeout=5)
+    assert target not in gateway._aio_channels
+    assert not other.closed.done()
+
+
+def test_next_command_opens_a_new_channel(gateway):
+    target = aio_target(gateway.get_device_info("AC-01"))
+    gateway._aio_channels[target] = FakeChannel()
+    gateway._on_liveness_transition("AC-01", OFFLINE)
+    gateway._aio_stub(gateway.get_device_info("AC-01"))
+    assert not isinstance(gateway._aio_channels[target], FakeChannel)
+    gateway._close_aio_channel("AC-01")
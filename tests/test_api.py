@@ -0,0 +1,66 @@
+from concurrent.futures import Future
+
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import api
+from proto.sensor_data_pb2 import CommandResponse
+
+# Sem o context manager o TestClient não dispara o startup: o gateway não sobe transportes
+client = TestClient(api.app)
+seen_inflight = []
+
+
+@api.app.get("/_test/stream")
+def slow_stream():
+    def body():
+        for chunk in (b"a", b"b", b"c"):
+            seen_inflight.append(api.api_inflight)
+            yield chunk
+    return StreamingResponse(body())
+
+
+def test_streaming_response_holds_inflight_slot_until_body_ends():
+    seen_inflight.clear()
+    response = client.get("/_test/stream")
+    assert response.content == b"abc"
+    assert seen_inflight == [1, 1, 1]
+    assert api.api_inflight == 0
+
+
+def test_sheds_load_above_limit_but_not_stats(monkeypatch):
+    monkeypatch.setattr(api, "API_MAX_INFLIGHT", 0)
+    response = client.get("/rules")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(api.API_RETRY_AFTER)
+    assert client.get("/ingest/stats").status_code == 200
+    assert api.gateway.admission.stats()["counters"]["API"]["load_shed"] >= 1
+
+
+def command_future(response=None):
+    future = Future()
+    if response is not None:
+        future.set_result(response)
+    return future
+
+
+def test_queue_command_returns_202_while_command_waits(monkeypatch):
+    monkeypatch.setattr(api, "COMMAND_TIMEOUT", 0.05)
+    monkeypatch.setattr(api.gateway, "enqueue_command", lambda *args: command_future())
+    response = client.post("/devices/AC-01/command", json={"command": "on"})
+    assert response.status_code == 202
+    assert response.json()["status"] == "queued"
+
+
+def test_queue_command_reports_device_response(monkeypatch):
+    monkeypatch.setattr(api.gateway, "enqueue_command",
+                        lambda *args: command_future(CommandResponse(success=True, message="ligado")))
+    response = client.post("/devices/AC-01/command", json={"command": "on"})
+    assert response.status_code == 200
+    assert response.json() == {"status": "success", "message": "ligado"}
+
+    monkeypatch.setattr(api.gateway, "enqueue_command",
+                        lambda *args: command_future(CommandResponse(success=False, message="Dispositivo 'AC-01' não encontrado")))
+    response = client.post("/devices/AC-01/command", json={"command": "on"})
+    assert response.status_code == 500
+    assert "não encontrado" in response.json()["detail"]
@@ -0,0 +1,52 @@
+import socket
+import threading
+
+import pytest
+
+from app_client import GatewayAppClient
+from gateway import Gateway
+from proto.sensor_data_pb2 import AppRequest, GatewayResponse, SensorReading
+
+
+def store(gateway, sensor_id, location, value):
+    reading = SensorReading(sensor_id=sensor_id, location=location, value=value, timestamp=1700000000,
+                            sequence=1, boot_id=1)
+    gateway._store_reading(reading, "10.0.0.9", ("10.0.0.9", 40000), "UDP")
+
+
+@pytest.fixture
+def client():
+    gateway = Gateway(transports=(), verbose=False, history_capacity=0)
+    gateway.running = True
+    gateway.command_queue.start()
+    store(gateway, "TEMP-01", "Cocó", 25.0)
+    store(gateway, "HUM-01", "Aldeota", 60.0)
+
+    client_sock, server_sock = socket.socketpair()
+    handler = threading.Thread(target=gateway.handle_app_client, args=(server_sock, ("app", 0)))
+    handler.start()
+    app = GatewayAppClient()
+    app.sock = client_sock
+    yield app
+    app.close()
+    handler.join(5)
+    gateway.stop()
+    assert not handler.is_alive()
+
+
+def test_several_requests_on_one_connection(client):
+    devices = {reading.sensor_id: reading.value for reading in client.list_devices()}
+    assert devices == {"TEMP-01": 25.0, "HUM-01": 60.0}
+    assert [reading.sensor_id for reading in client.stream_location_data("Aldeota")] == ["HUM-01"]
+    assert client.stream_location_data("Nenhum") == []
+
+
+def test_command_to_unknown_device_is_an_error(client):
+    response = client.queue_command("NAO-EXISTE", "on")
+    assert response.type == GatewayResponse.ERROR
+    assert "não encontrado" in response.error_message
+
+
+def test_unknown_request_type_is_an_error(client):
+    response = client.request(AppRequest(type=99))
+    assert response.type == GatewayResponse.ERROR
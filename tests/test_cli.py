@@ -0,0 +1,37 @@
+import argparse
+import os
+import subprocess
+import sys
+
+import pytest
+
+import run
+from gateway import TRANSPORTS
+
+SRC_DIR = os.path.dirname(run.__file__)
+
+
+def test_transports_are_validated_against_the_gateway_list():
+    assert run.parse_transports("tcp, telemetry") == ["tcp", "telemetry"]
+    with pytest.raises(argparse.ArgumentTypeError, match="foo"):
+        run.parse_transports("tcp,foo")
+
+
+def test_gateway_defaults_to_every_transport():
+    args = run.build_parser().parse_args(["gateway"])
+    assert args.transports == list(TRANSPORTS)
+    assert args.workers == 0
+
+
+def test_sensor_mode_options():
+    args = run.build_parser().parse_args(["sensor", "--type", "semaphore", "--stream"])
+    assert args.func is run.run_sensor
+    assert run.device_kwargs(args) == {"telemetry_stream": True, "aio_grpc": False}
+    assert run.load_sensor_class(args.type).__name__ == "Semaphore"
+
+
+def test_sensor_mode_does_not_import_grpc_or_pika():
+    code = ("import sys, run; run.load_sensor_class('temperature'); "
+            "print(sorted(m for m in ('grpc', 'pika') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
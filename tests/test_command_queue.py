@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from command_queue import CommandQueue, coalesce_key, PRIORITY_HIGH, PRIORITY_LOW
+from gateway import Gateway
+from proto.sensor_data_pb2 import CommandResponse
+
+
+def ok(device_id, command, params=None):
+    return CommandResponse(success=True, message=f"{device_id}:{command}")
+
+
+@pytest.fixture
+def queue_factory():
+    queues = []
+
+    def build(send_fn=ok, start=True, **kwargs):
+        queue = CommandQueue(send_fn, **kwargs)
+        if start:
+            queue.start()
+        queues.append(queue)
+        return queue
+
+    yield build
+    for queue in queues:
+        queue.stop()
+
+
+def test_coalesce_key_includes_params_of_generic_commands():
+    assert coalesce_key("set", {"zone": "a"}) != coalesce_key("set", {"zone": "b"})
+    assert coalesce_key("set", {"zone": "a", "level": 2}) == coalesce_key("set", {"level": "2", "zone": "a"})
+    assert coalesce_key("set") == "set"
+    # Comandos de estado se sobrepõem independentemente dos parâmetros
+    assert coalesce_key("verde", {"x": "1"}) == coalesce_key("vermelho")
+    assert coalesce_key("on", {"x": "1"}) == coalesce_key("off")
+
+
+def test_only_commands_with_same_params_are_coalesced(queue_factory):
+    queue = queue_factory(start=False)
+    first = queue.submit("AC-01", "set", {"zone": "a"})
+    queue.submit("AC-01", "set", {"zone": "b"})
+    queue.submit("AC-01", "set", {"zone": "a"})
+    stats = queue.stats()
+    assert stats["pending"] == 2
+    assert stats["coalesced"] == 1
+    assert not first.done()
+
+
+def test_higher_priority_is_dispatched_first(queue_factory):
+    queue = queue_factory(start=False)
+    queue.submit("AC-01", "set", {"zone": "a"}, PRIORITY_LOW)
+    queue.submit("AC-01", "alarm", None, PRIORITY_HIGH)
+    with queue.cond:
+        cmd, _ = queue._poll_command()
+    assert cmd.command == "alarm"
+
+
+def test_transport_failure_is_retried(queue_factory):
+    calls = []
+
+    def flaky(device_id, command, params=None):
+        calls.append(command)
+        return None if len(calls) == 1 else ok(device_id, command)
+
+    queue = queue_factory(flaky, base_backoff=0.01)
+    assert queue.submit("AC-01", "on").result(timeout=5).success
+    assert calls == ["on", "on"]
+    assert queue.stats()["retried"] == 1
+
+
+def test_unknown_device_fails_without_retry(queue_factory):
+    gateway = Gateway(transports=(), verbose=False, history_capacity=0)
+    queue = queue_factory(gateway.send_command_to_device, base_backoff=0.01)
+    response = queue.submit("NAO-EXISTE", "on").result(timeout=5)
+    assert not response.success
+    assert "não encontrado" in response.message
+    assert queue.stats()["retried"] == 0
+
+
+def test_idle_devices_are_forgotten(queue_factory):
+    queue = queue_factory(rate_per_second=1000.0, burst=2)
+    futures = [queue.submit(f"DEV-{i}", "on") for i in range(200)]
+    for future in futures:
+        future.result(timeout=5)
+    # Bucket cheio de novo depois de 1/rate por token gasto
+    time.sleep(0.05)
+    with queue.cond:
+        queue._poll_command()
+    assert queue.stats()["tracked_devices"] == 0
+
+
+def test_busy_device_is_kept(queue_factory):
+    release = threading.Event()
+
+    def slow(device_id, command, params=None):
+        release.wait(5)
+        return ok(device_id, command)
+
+    queue = queue_factory(slow, rate_per_second=1000.0, workers=1)
+    future = queue.submit("AC-01", "on")
+    time.sleep(0.05)
+    with queue.cond:
+        queue._poll_command()
+    assert "AC-01" in queue.states
+    release.set()
+    assert future.result(timeout=5).success
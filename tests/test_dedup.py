@@ -0,0 +1,47 @@
+from dedup import ReadingDeduplicator, NEW, LATE, DUPLICATE, WINDOW_BITS
+from proto.sensor_data_pb2 import SensorReading
+
+
+def reading(sequence=0, boot_id=1, timestamp=1700000000, value=1.0):
+    return SensorReading(sensor_id="TEMP-01", sequence=sequence, boot_id=boot_id, timestamp=timestamp, value=value)
+
+
+def test_same_reading_from_two_paths_is_a_duplicate():
+    dedup = ReadingDeduplicator()
+    assert dedup.check(reading(1)) == NEW
+    assert dedup.check(reading(1)) == DUPLICATE
+    assert dedup.counters == {NEW: 1, LATE: 0, DUPLICATE: 1}
+
+
+def test_out_of_order_reading_inside_window_is_late_once():
+    dedup = ReadingDeduplicator()
+    dedup.check(reading(5))
+    assert dedup.check(reading(3)) == LATE
+    assert dedup.check(reading(3)) == DUPLICATE
+    assert dedup.check(reading(6)) == NEW
+
+
+def test_reading_older_than_window_is_late():
+    dedup = ReadingDeduplicator()
+    dedup.check(reading(WINDOW_BITS + 10))
+    assert dedup.check(reading(5)) == LATE
+    # Salto maior que a janela zera o histórico de bits
+    assert dedup.check(reading(10 * WINDOW_BITS)) == NEW
+    assert dedup.check(reading(10 * WINDOW_BITS - 1)) == LATE
+
+
+def test_reboot_restarts_sequence():
+    dedup = ReadingDeduplicator()
+    dedup.check(reading(100, boot_id=1))
+    assert dedup.check(reading(1, boot_id=2)) == NEW
+    # Leitura atrasada do boot anterior
+    assert dedup.check(reading(101, boot_id=1)) == LATE
+
+
+def test_readings_without_sequence_use_timestamp_and_content():
+    dedup = ReadingDeduplicator()
+    assert dedup.check(reading(timestamp=10, value=1.0)) == NEW
+    assert dedup.check(reading(timestamp=10, value=1.0)) == DUPLICATE
+    assert dedup.check(reading(timestamp=10, value=2.0)) == NEW
+    assert dedup.check(reading(timestamp=9, value=3.0)) == LATE
+    assert dedup.check(reading(timestamp=11, value=1.0)) == NEW
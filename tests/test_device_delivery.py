@@ -0,0 +1,111 @@
+import socket
+import threading
+
+from devices.semaphore import Semaphore
+
+
+def device():
+    device = Semaphore("SEM-01", "Cruzamento")
+    device.sock.close()
+    device.grpc_server_started.set()
+    return device
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_tcp_failure_buffers_reading_under_delivery_lock():
+    dev = device()
+    dev.tcp_gateway_address = ("127.0.0.1", closed_port())
+
+    # Outra thread está no meio de um replay: o envio TCP espera para bufferizar
+    with dev.delivery_lock:
+        sender = threading.Thread(target=dev.send_tcp_data)
+        sender.start()
+        sender.join(0.2)
+        assert sender.is_alive()
+        assert len(dev.replay_buffer) == 0
+    sender.join(5)
+    assert len(dev.replay_buffer) == 1
+    assert dev.consecutive_failures == 1
+
+
+def test_buffered_readings_are_replayed_in_order():
+    dev = device()
+    sent = []
+    dev._send_reading = lambda reading: sent.append(reading.sequence) or True
+    for sequence in (1, 2, 3):
+        reading = dev._generate_reading()
+        reading.sequence = sequence
+        dev._buffer_reading(reading)
+    latest = dev._generate_reading()
+    latest.sequence = 4
+    dev.deliver_reading(latest)
+    assert sent == [1, 2, 3, 4]
+    assert not dev.replay_buffer
+
+
+def test_probe_answer_does_not_reset_failures():
+    dev = device()
+    dev._send_reading = lambda reading: False
+    dev._report_gateway_failure("teste")
+    dev._buffer_reading(dev._generate_reading())
+    dev._gateway_answered()
+    assert dev.consecutive_failures == 1
+
+    dev._send_reading = lambda reading: True
+    dev._gateway_answered()
+    assert dev.consecutive_failures == 0
+    assert not dev.replay_buffer
+
+
+def test_successful_delivery_resets_failures():
+    dev = device()
+    dev._report_gateway_failure("teste")
+    dev._send_reading = lambda reading: True
+    dev.deliver_reading(dev._generate_reading())
+    assert dev.consecutive_failures == 0
+
+
+class UnroutableChannel:
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, mandatory=False):
+        import pika
+        self.published.append(mandatory)
+        # Exchange sem fila ligada: nenhum gateway consumindo
+        raise pika.exceptions.UnroutableError([])
+
+
+def test_unroutable_publish_buffers_and_fails_over():
+    from proto.sensor_data_pb2 import GatewayAnnouncement
+
+    dev = device()
+    for gateway_id, load in (("A", 0), ("B", 5)):
+        dev.gateways.remember(GatewayAnnouncement(gateway_id=gateway_id, gateway_ip="10.0.0.1", tcp_port=6789,
+                                                  rabbitmq_host="10.0.0.1", rabbitmq_port=5672, load=load))
+    dev._use_gateway(dev.gateways.best())
+    assert dev.current_gateway_id == "A"
+
+    channel = UnroutableChannel()
+    dev.channel = channel
+    dev.deliver_reading(dev._generate_reading())
+    assert channel.published == [True]
+    assert len(dev.replay_buffer) == 1
+    assert dev.consecutive_failures == 1
+
+    dev.deliver_reading(dev._generate_reading())
+    assert len(dev.replay_buffer) == 2
+    assert dev.current_gateway_id == "B"
+    assert dev.channel is None
+
+
+def test_probe_answer_resets_failures_without_pending_readings():
+    dev = device()
+    dev._report_gateway_failure("sonda de saúde sem resposta")
+    dev._gateway_answered()
+    assert dev.consecutive_failures == 0
@@ -0,0 +1,66 @@
+from device_registry import DeviceRegistry
+from proto.sensor_data_pb2 import DeviceType, SensorReading
+
+
+def reading(sensor_id, location, value, sequence=1):
+    reading = SensorReading(sensor_id=sensor_id, location=location, sensor_type=DeviceType.TEMPERATURE,
+                            value=value, unit="°C", timestamp=1700000000 + sequence, sequence=sequence, boot_id=7)
+    reading.metadata["grpc_port"] = "50052"
+    reading.metadata["edge_mean"] = str(value)
+    return reading
+
+
+def test_updates_keep_a_stable_handle():
+    registry = DeviceRegistry()
+    first = registry.update(reading("TEMP-01", "Sala", 20.0), "10.0.0.1")
+    second = registry.update(reading("TEMP-01", "Sala", 21.0, sequence=2), "10.0.0.2")
+    assert first is second
+    assert registry.handle("TEMP-01") == first.handle == 0
+    assert len(registry) == 1
+    assert registry.device_info("TEMP-01") == {"address": "10.0.0.2", "grpc_port": 50052}
+
+
+def test_reading_round_trip():
+    registry = DeviceRegistry()
+    original = reading("TEMP-01", "Sala", 20.5)
+    registry.update(original, "10.0.0.1")
+    assert registry.reading("TEMP-01") == original
+    assert registry.reading("NAO-EXISTE") is None
+
+
+def test_repeated_strings_are_shared_between_records():
+    registry = DeviceRegistry()
+    a = registry.update(reading("TEMP-01", "".join(["Sa", "la"]), 20.0), "".join(["10.0.", "0.1"]))
+    b = registry.update(reading("TEMP-02", "".join(["Sal", "a"]), 21.0), "".join(["10.0.0", ".1"]))
+    assert a.location is b.location
+    assert a.address is b.address
+    assert not hasattr(a, "__dict__")
+
+
+def test_select_and_describe():
+    registry = DeviceRegistry()
+    registry.update(reading("TEMP-01", "Sala", 20.0), "10.0.0.1")
+    registry.update(reading("TEMP-02", "Cozinha", 21.0), "10.0.0.2")
+    assert registry.select(location="Cozinha") == {1}
+    assert registry.select(sensor_id="TEMP-01") == {0}
+    assert registry.describe({1, 99}) == {1: ("TEMP-02", "Cozinha", "°C", "10.0.0.2")}
+    assert set(registry.readings(location="Sala")) == {"TEMP-01"}
+    assert set(registry.readings(["TEMP-02", "NAO-EXISTE"])) == {"TEMP-02"}
+
+
+def test_readings_are_built_outside_the_lock(monkeypatch):
+    import device_registry
+
+    registry = DeviceRegistry()
+    for i in range(3):
+        registry.update(reading(f"TEMP-{i}", "Sala", 20.0 + i), "10.0.0.1")
+
+    build = device_registry.reading_from_fields
+    locked = []
+    monkeypatch.setattr(device_registry, "reading_from_fields",
+                        lambda fields: locked.append(registry.lock.locked()) or build(fields))
+    readings = registry.readings()
+    assert sorted(readings) == ["TEMP-0", "TEMP-1", "TEMP-2"]
+    assert readings["TEMP-2"] == reading("TEMP-2", "Sala", 22.0)
+    assert registry.reading("TEMP-1").value == 21.0
+    assert locked == [False] * 4
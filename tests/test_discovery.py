@@ -0,0 +1,104 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from devices.semaphore import Semaphore
+from gateway import Gateway
+from proto.sensor_data_pb2 import DiscoveryRequest, GatewayAnnouncement
+
+
+def udp_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(5)
+    return sock
+
+
+def announcement(gateway_id, nonce, load=0):
+    return GatewayAnnouncement(gateway_id=gateway_id, gateway_ip="127.0.0.1", tcp_port=6789, udp_port=6790,
+                               load=load, nonce=nonce).SerializeToString()
+
+
+def test_discovery_ignores_replies_to_other_requests():
+    device = Semaphore("SEM-01", "Cruzamento", discovery_jitter=0, discovery_collect=0.2)
+    device.sock.close()
+    device.grpc_server_started.set()
+    device.running = True
+
+    listen_sock, solicit_sock, fake_gateway = udp_socket(), udp_socket(), udp_socket()
+    device._discovery_sockets = lambda: (listen_sock, solicit_sock)
+    device.discovery_group = "127.0.0.1"
+    device.discovery_solicit_port = fake_gateway.getsockname()[1]
+
+    # Anúncio periódico (multicast) nunca carrega nonce
+    fake_gateway.sendto(announcement("Z", nonce=123), listen_sock.getsockname())
+
+    finder = threading.Thread(target=device.discover_gateway)
+    finder.start()
+    try:
+        data, addr = fake_gateway.recvfrom(1024)
+        request = DiscoveryRequest()
+        request.ParseFromString(data)
+        # Resposta a um pedido antigo: menos carregada, mas não responde a este nonce
+        fake_gateway.sendto(announcement("X", nonce=request.nonce + 1), addr)
+        fake_gateway.sendto(b"\xff\xff\xff", addr)
+        fake_gateway.sendto(announcement("Y", nonce=request.nonce, load=9), addr)
+        finder.join(5)
+    finally:
+        device.running = False
+        finder.join(5)
+        fake_gateway.close()
+
+    assert device.current_gateway_id == "Y"
+    assert set(device.gateways.gateways) == {"Y"}
+
+
+def test_gateway_echoes_request_nonce():
+    gateway = Gateway(transports=(), verbose=False, history_capacity=0)
+    reply = GatewayAnnouncement()
+    reply.ParseFromString(gateway.build_announcement(nonce=42).SerializeToString())
+    assert reply.nonce == 42
+    assert gateway.build_announcement().nonce == 0
+
+
+def test_health_probe_only_when_no_recent_delivery():
+    device = Semaphore("SEM-01", "Cruzamento", interval=45, health_interval=0.1)
+    device.sock.close()
+    device.running = True
+    assert Semaphore("SEM-02", "Cruzamento", interval=45).health_interval == 90.0
+
+    listen_sock, probe_sock, fake_gateway = udp_socket(), udp_socket(), udp_socket()
+    device._discovery_sockets = lambda: (listen_sock, probe_sock)
+    device.tcp_gateway_address = ("127.0.0.1", 6789)
+    device.discovery_solicit_port = fake_gateway.getsockname()[1]
+
+    delivering = threading.Event()
+    delivering.set()
+
+    def deliver():
+        while delivering.is_set():
+            device._delivery_ok()
+            time.sleep(0.02)
+
+    deliverer = threading.Thread(target=deliver)
+    deliverer.start()
+    watcher = threading.Thread(target=device.watch_gateways)
+    watcher.start()
+    try:
+        # Entregas frequentes: nenhuma sonda chega ao gateway
+        fake_gateway.settimeout(0.5)
+        with pytest.raises(socket.timeout):
+            fake_gateway.recvfrom(1024)
+        # Sem entregas por mais de health_interval: volta a sondar
+        delivering.clear()
+        deliverer.join(5)
+        fake_gateway.settimeout(5)
+        data, _ = fake_gateway.recvfrom(1024)
+        assert DiscoveryRequest.FromString(data).device_id == "SEM-01"
+    finally:
+        delivering.clear()
+        device.running = False
+        watcher.join(5)
+        fake_gateway.close()
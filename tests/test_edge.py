@@ -0,0 +1,50 @@
+from devices.edge import EdgeFilter
+from devices.semaphore import Semaphore
+from proto.sensor_data_pb2 import SensorReading
+
+
+def sample(value):
+    return SensorReading(sensor_id="TEMP-01", value=value)
+
+
+def test_deadband_suppresses_small_changes():
+    edge = EdgeFilter(deadband=0.5, heartbeat=0)
+    assert edge.process(sample(20.0), now=0) is not None
+    assert edge.process(sample(20.3), now=1) is None
+    assert edge.process(sample(19.6), now=2) is None
+    sent = edge.process(sample(20.6), now=3)
+    assert sent is not None
+    # Estatísticas cobrem as amostras desde o último envio, inclusive as suprimidas
+    assert sent.metadata["edge_count"] == "3"
+    assert sent.metadata["edge_min"] == "19.6"
+    assert sent.metadata["edge_max"] == "20.6"
+    assert edge.suppressed == 2
+
+
+def test_heartbeat_sends_without_change():
+    edge = EdgeFilter(deadband=1.0, heartbeat=60)
+    edge.process(sample(20.0), now=0)
+    assert edge.process(sample(20.0), now=59) is None
+    assert edge.process(sample(20.0), now=60) is not None
+
+
+def test_window_sends_mean_once_per_window():
+    edge = EdgeFilter(window=10, heartbeat=0)
+    assert edge.process(sample(1.0), now=0) is None
+    assert edge.process(sample(2.0), now=5) is None
+    sent = edge.process(sample(6.0), now=10)
+    assert sent.value == 3.0
+    assert edge.process(sample(100.0), now=11) is None
+
+
+def test_forced_publish_bypasses_filter_but_resets_baseline():
+    device = Semaphore("SEM-01", "Cruzamento", edge_filter=EdgeFilter(deadband=5, heartbeat=0))
+    device.sock.close()
+    sent = []
+    device._send_reading = lambda reading: sent.append(reading.value) or True
+
+    device.publish_reading(sample(10.0))
+    device.publish_reading(sample(12.0))
+    device.publish_reading(sample(30.0), force=True)
+    device.publish_reading(sample(33.0))
+    assert sent == [10.0, 30.0]
@@ -0,0 +1,90 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from admission import FRAME_TOO_LARGE
+from framing import HEADER, FrameTooLarge, encode_frame, recv_frame, recv_message, send_message
+from gateway import Gateway
+from proto.sensor_data_pb2 import Response, SensorReading
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+# Entrega o fluxo em pedaços de no máximo chunk bytes
+class ChunkedConn:
+    def __init__(self, data, chunk):
+        self.data = data
+        self.offset = 0
+        self.chunk = chunk
+
+    def recv(self, n):
+        count = min(n, self.chunk, len(self.data) - self.offset)
+        self.offset += count
+        return self.data[self.offset - count:self.offset]
+
+    def recv_into(self, buffer):
+        chunk = self.recv(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def reading(sequence=1):
+    return SensorReading(sensor_id="TEMP-01", value=21.5, timestamp=1700000000, sequence=sequence, boot_id=1)
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 7, 1 << 16])
+def test_recv_frame_reassembles_partial_reads(chunk):
+    frames = [encode_frame(reading(i)) for i in range(1, 4)] + [HEADER.pack(0)]
+    conn = ChunkedConn(b"".join(frames), chunk)
+    payloads = [recv_frame(conn) for _ in range(4)]
+    assert [type(p) for p in payloads] == [bytes] * 4
+    assert [SensorReading.FromString(p).sequence for p in payloads[:3]] == [1, 2, 3]
+    assert payloads[3] == b""
+    assert recv_frame(conn) is None
+
+
+def test_connection_closed_mid_frame_returns_none():
+    data = encode_frame(reading())
+    assert recv_frame(ChunkedConn(data[:-1], 4)) is None
+    assert recv_frame(ChunkedConn(data[:2], 4)) is None
+
+
+def test_oversized_frame_is_rejected_before_reading_body():
+    conn = ChunkedConn(HEADER.pack(1025) + b"x" * 1025, 1 << 16)
+    with pytest.raises(FrameTooLarge) as error:
+        recv_frame(conn, max_size=1024)
+    assert (error.value.size, error.value.max_size) == (1025, 1024)
+    assert conn.offset == HEADER.size
+
+
+def test_message_round_trip_over_socket():
+    a, b = socket.socketpair()
+    with a, b:
+        send_message(a, reading(7))
+        assert recv_message(b, SensorReading) == reading(7)
+
+
+def test_gateway_answers_oversized_frame_with_error():
+    gateway = Gateway(transports=(), verbose=False, history_capacity=0, max_frame_size=128)
+    client, server = socket.socketpair()
+    with client:
+        client.sendall(HEADER.pack(4096))
+        gateway.tcp_slots.acquire()
+        handler = threading.Thread(target=gateway.handle_tcp_client, args=(server, ("10.0.0.1", 1)))
+        handler.start()
+        response = recv_message(client, Response)
+        handler.join(5)
+    assert not response.success
+    assert gateway.ingest_stats()["counters"]["TCP"][FRAME_TOO_LARGE] == 1
+    assert gateway.tcp_connections == 0
+
+
+def test_fuzzer_finds_no_failures():
+    result = subprocess.run([sys.executable, os.path.join("benchmarks", "fuzz_framing.py"), "--seed", "1",
+                             "--iterations", "300", "--max-frame", "4096"],
+                            cwd=SRC_DIR, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stdout + result.stderr
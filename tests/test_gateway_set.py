@@ -0,0 +1,35 @@
+from devices.gateway_set import GatewaySet, gateway_key
+from proto.sensor_data_pb2 import GatewayAnnouncement
+
+
+def announcement(gateway_id, load=0):
+    return GatewayAnnouncement(gateway_id=gateway_id, gateway_ip="10.0.0.1", tcp_port=6789, load=load)
+
+
+def test_best_prefers_fewer_failures_then_rank():
+    gateways = GatewaySet(lambda a: a.load)
+    gateways.remember(announcement("A", load=1), now=0)
+    gateways.remember(announcement("B", load=5), now=0)
+    assert gateways.best(now=1).gateway_id == "A"
+    gateways.mark_failure("A")
+    assert gateways.best(now=1).gateway_id == "B"
+
+
+def test_announcement_does_not_clear_failures():
+    gateways = GatewaySet(lambda a: a.load)
+    gateways.remember(announcement("A", load=1), now=0)
+    gateways.remember(announcement("B", load=5), now=0)
+    gateways.mark_failure("A")
+    # A continua anunciando (vivo), mas segue sem entregar leituras
+    gateways.remember(announcement("A", load=1), now=1)
+    assert gateways.best(now=2).gateway_id == "B"
+    gateways.mark_success("A")
+    assert gateways.best(now=2).gateway_id == "A"
+
+
+def test_stale_gateways_leave_the_set():
+    gateways = GatewaySet(lambda a: a.load, ttl=10)
+    gateways.remember(announcement("A"), now=0)
+    assert gateways.best(now=5) is not None
+    assert gateways.best(now=11) is None
+    assert gateway_key(GatewayAnnouncement(gateway_ip="10.0.0.2", tcp_port=1)) == "10.0.0.2:1"
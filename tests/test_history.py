@@ -0,0 +1,103 @@
+import io
+
+import pytest
+
+from columnar import NpzReader
+from gateway import Gateway
+from history import HISTORY_COLUMNS, ReadingHistory
+from proto.sensor_data_pb2 import SensorReading
+
+NAMES = [name for name, _ in HISTORY_COLUMNS]
+
+
+def reading(sensor_id, location, sequence, value):
+    return SensorReading(sensor_id=sensor_id, location=location, unit="°C", value=value,
+                         timestamp=1700000000 + sequence, sequence=sequence, boot_id=1)
+
+
+def gateway_with_history(capacity=100):
+    gateway = Gateway(transports=(), verbose=False, history_capacity=capacity)
+    for sequence in range(1, 6):
+        gateway._store_reading(reading("TEMP-01", "Sala", sequence, 20.0 + sequence), "10.0.0.1", ("10.0.0.1", 0), "UDP")
+        gateway._store_reading(reading("HUM-01", "Cozinha", sequence, 50.0 + sequence), "10.0.0.2", ("10.0.0.2", 0), "UDP")
+    return gateway
+
+
+def export(gateway, **filters):
+    buffer = io.BytesIO()
+    rows = gateway.export_history(buffer, **filters)
+    buffer.seek(0)
+    return rows, NpzReader(buffer)
+
+
+def rows_of(reader):
+    sensor_ids = reader.strings("device_sensor_id")
+    rows = []
+    for chunk in reader.chunks(NAMES, chunk_rows=3):
+        for timestamp, value, _, sequence, _, device in zip(*(chunk[name] for name in NAMES)):
+            rows.append((sensor_ids[device], sequence, value))
+    return rows
+
+
+def test_export_round_trip():
+    rows, reader = export(gateway_with_history())
+    with reader:
+        assert rows == len(reader) == 10
+        assert reader.strings("device_location") == ["Sala", "Cozinha"]
+        assert rows_of(reader)[:3] == [("TEMP-01", 1, 21.0), ("HUM-01", 1, 51.0), ("TEMP-01", 2, 22.0)]
+
+
+def test_export_filters_by_sensor_and_time():
+    _, reader = export(gateway_with_history(), sensor_id="HUM-01", start=1700000002, end=1700000004)
+    with reader:
+        assert rows_of(reader) == [("HUM-01", 2, 52.0), ("HUM-01", 3, 53.0)]
+        # Só os dispositivos exportados entram no dicionário de strings
+        assert reader.strings("device_sensor_id") == ["HUM-01"]
+
+
+def test_full_ring_keeps_most_recent_readings():
+    _, reader = export(gateway_with_history(capacity=4))
+    with reader:
+        assert [(sensor_id, sequence) for sensor_id, sequence, _ in rows_of(reader)] == \
+            [("TEMP-01", 4), ("HUM-01", 4), ("TEMP-01", 5), ("HUM-01", 5)]
+
+
+def test_history_disabled():
+    gateway = Gateway(transports=(), verbose=False, history_capacity=0)
+    with pytest.raises(RuntimeError):
+        gateway.export_history(io.BytesIO())
+
+
+def test_chunks_skip_rows_overwritten_during_export():
+    history = ReadingHistory(capacity=4)
+    for sequence in range(1, 5):
+        history.append(0, reading("TEMP-01", "Sala", sequence, sequence))
+    chunks = history.chunks(chunk_rows=2)
+    first = next(chunks)
+    for sequence in range(5, 8):
+        history.append(0, reading("TEMP-01", "Sala", sequence, sequence))
+    rest = [sequence for chunk in chunks for sequence in chunk["sequence"]]
+    assert list(first["sequence"]) == [1, 2]
+    assert rest == [4]
+
+
+def test_numpy_reads_export():
+    numpy = pytest.importorskip("numpy")
+    _, reader = export(gateway_with_history())
+    reader.archive.fp.seek(0)
+    data = numpy.load(reader.archive.fp)
+    assert data["value"].tolist()[:2] == [21.0, 51.0]
+    assert data["device_sensor_id"].tolist() == ["TEMP-01", "HUM-01"]
+
+
+def test_replay_feeds_exported_readings_through_ingest(tmp_path, capsys):
+    import history_tool
+
+    path = tmp_path / "historico.npz"
+    with open(path, "wb") as f:
+        gateway_with_history().export_history(f)
+    args = history_tool.build_parser().parse_args(["replay", str(path), "--speed", "0", "--source-rate", "0"])
+    args.func(args)
+    out = capsys.readouterr().out
+    assert "10 leituras" in out
+    assert "Dispositivos: 2" in out
@@ -0,0 +1,83 @@
+from liveness import LivenessTracker, ONLINE, OFFLINE
+
+
+def tracker():
+    transitions = []
+    liveness = LivenessTracker(on_transition=lambda device_id, status: transitions.append((device_id, status)),
+                               default_interval=30.0, tolerance=3.0, grace=2.0, alpha=0.5)
+    return liveness, transitions
+
+
+def test_deadline_follows_observed_cadence():
+    liveness, transitions = tracker()
+    for t in (0, 10, 20, 30):
+        liveness.observe("TEMP-01", now=t)
+    assert liveness.expected_interval("TEMP-01") == 10
+    # Prazo = última leitura + 3 intervalos + carência
+    assert liveness.expire(now=61) == []
+    assert liveness.expire(now=62) == ["TEMP-01"]
+    assert liveness.status("TEMP-01") == OFFLINE
+    assert transitions == [("TEMP-01", OFFLINE)]
+
+
+def test_device_without_history_uses_default_interval():
+    liveness, _ = tracker()
+    liveness.observe("TEMP-01", now=0)
+    assert liveness.expire(now=91) == []
+    assert liveness.expire(now=92.5) == ["TEMP-01"]
+
+
+def test_new_readings_postpone_expiry():
+    liveness, _ = tracker()
+    liveness.observe("TEMP-01", now=0)
+    liveness.observe("TEMP-01", now=10)
+    liveness.observe("TEMP-01", now=50)
+    # A entrada antiga do heap sai e é reagendada para o prazo novo
+    assert liveness.expire(now=92) == []
+    assert liveness.status("TEMP-01") == ONLINE
+
+
+def test_reading_after_offline_brings_device_back():
+    liveness, transitions = tracker()
+    liveness.observe("TEMP-01", now=0)
+    liveness.expire(now=100)
+    liveness.observe("TEMP-01", now=101)
+    assert transitions == [("TEMP-01", OFFLINE), ("TEMP-01", ONLINE)]
+    assert liveness.devices(ONLINE) == {"TEMP-01"}
+    assert liveness.devices(OFFLINE) == set()
+
+
+def test_mark_offline_notifies_once():
+    liveness, transitions = tracker()
+    liveness.observe("TEMP-01", now=0)
+    liveness.mark_offline("TEMP-01")
+    liveness.mark_offline("TEMP-01")
+    liveness.mark_offline("DESCONHECIDO")
+    assert transitions == [("TEMP-01", OFFLINE)]
+    assert liveness.expire(now=1000) == []
+
+
+def test_online_count_excludes_devices_that_stopped_reporting():
+    liveness, _ = tracker()
+    for device_id in ("TEMP-01", "TEMP-02", "TEMP-03"):
+        liveness.observe(device_id, now=0)
+    liveness.mark_offline("TEMP-02")
+    assert liveness.online_count() == 2
+    liveness.expire(now=100)
+    assert liveness.online_count() == 0
+    liveness.observe("TEMP-03", now=101)
+    assert liveness.online_count() == 1
+
+
+def test_gateway_load_counts_only_online_devices():
+    from gateway import Gateway
+    from proto.sensor_data_pb2 import SensorReading
+
+    gateway = Gateway(transports=(), verbose=False, history_capacity=0, source_rate=0)
+    for sensor_id in ("TEMP-01", "TEMP-02"):
+        gateway._store_reading(SensorReading(sensor_id=sensor_id, sequence=1, boot_id=1), "10.0.0.1", None, "TCP")
+    assert gateway.build_announcement().load == 2
+    # Dispositivo que trocou de gateway para de reportar e sai da carga anunciada
+    gateway.liveness.mark_offline("TEMP-01")
+    assert gateway.build_announcement().load == 1
+    assert len(gateway.registry) == 2
@@ -0,0 +1,38 @@
+import threading
+
+import pytest
+
+from liveness import ONLINE
+from multiprocess_gateway import MultiProcessGateway
+from proto.sensor_data_pb2 import SensorReading
+from rules import Rule
+from shm_store import SharedReadingStore
+
+
+@pytest.fixture
+def gateway():
+    gateway = MultiProcessGateway(workers=1, transports=(), verbose=False, history_capacity=64)
+    gateway.store = SharedReadingStore(capacity=16, create=True, lock=threading.Lock(), changes_capacity=64)
+    yield gateway
+    gateway.store.close()
+
+
+def test_consumer_sees_every_reading_between_polls(gateway):
+    # Outro processo grava várias leituras do mesmo sensor entre duas consultas
+    for sequence in range(1, 6):
+        gateway.store.write(SensorReading(sensor_id="TEMP-01", location="Sala", value=20.0 + sequence,
+                                          timestamp=1700000000 + sequence, sequence=sequence, boot_id=1), "a")
+    assert gateway.consume_changes() == 5
+    assert gateway.history.written == 5
+    assert gateway.liveness.status("TEMP-01") == ONLINE
+    assert gateway.consume_changes() == 0
+
+
+def test_rules_see_location_from_the_store(gateway):
+    commands = []
+    gateway.enqueue_command = lambda device_id, command, params=None, priority=None: commands.append((device_id, command))
+    gateway.rules.add(Rule(">", 30, "AC-01", "on", location="Sala"))
+    gateway.store.write(SensorReading(sensor_id="TEMP-01", location="Sala", value=35.0, timestamp=1700000000,
+                                      sequence=1, boot_id=1), "a")
+    gateway.consume_changes()
+    assert commands == [("AC-01", "on")]
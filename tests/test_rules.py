@@ -0,0 +1,75 @@
+import pytest
+
+from proto.sensor_data_pb2 import DeviceType, SensorReading
+from rules import Rule, RuleEngine
+
+
+def reading(value, timestamp=1700000000, sensor_id="TEMP-01", location="Sala"):
+    return SensorReading(sensor_id=sensor_id, location=location, sensor_type=DeviceType.TEMPERATURE,
+                         value=value, timestamp=timestamp)
+
+
+def engine():
+    triggered = []
+    rules = RuleEngine(on_trigger=lambda rule, r: triggered.append((rule.name, r.value)))
+    return rules, triggered
+
+
+def test_rule_fires_once_until_condition_clears():
+    rules, triggered = engine()
+    rules.add(Rule(">", 30, "AC-01", "on", sensor_type="TEMPERATURE", name="quente"))
+    rules.evaluate(reading(31))
+    rules.evaluate(reading(32))
+    rules.evaluate(reading(29))
+    rules.evaluate(reading(33))
+    assert triggered == [("quente", 31), ("quente", 33)]
+
+
+def test_duration_requires_condition_to_hold():
+    rules, triggered = engine()
+    rules.add(Rule(">=", 30, "AC-01", "on", location="Sala", duration=60, name="sustentado"))
+    rules.evaluate(reading(30, timestamp=0))
+    rules.evaluate(reading(31, timestamp=59))
+    assert triggered == []
+    rules.evaluate(reading(31, timestamp=60))
+    assert triggered == [("sustentado", 31)]
+
+
+def test_filters_select_candidate_rules():
+    rules, triggered = engine()
+    rules.add(Rule(">", 0, "X", "on", sensor_id="TEMP-02", name="outro-sensor"))
+    rules.add(Rule(">", 0, "X", "on", location="Cozinha", name="outra-sala"))
+    rules.add(Rule(">", 0, "X", "on", sensor_type="HUMIDITY", name="outro-tipo"))
+    rules.add(Rule(">", 0, "X", "on", name="todas"))
+    rules.evaluate(reading(1))
+    assert triggered == [("todas", 1)]
+
+
+def test_removed_rule_stops_firing():
+    rules, triggered = engine()
+    rule = rules.add(Rule("<", 10, "AQ-01", "on"))
+    assert rules.remove(rule.id)
+    assert not rules.remove(rule.id)
+    rules.evaluate(reading(5))
+    assert triggered == []
+
+
+def test_invalid_operator_is_rejected():
+    with pytest.raises(ValueError):
+        Rule("=>", 10, "AC-01", "on")
+
+
+def test_rules_api_round_trip():
+    from fastapi.testclient import TestClient
+    import api
+
+    client = TestClient(api.app)
+    created = client.post("/rules", json={"op": ">", "threshold": 30, "target_device": "AC-01", "command": "on",
+                                          "sensor_type": "TEMPERATURE"})
+    assert created.status_code == 201
+    rule_id = created.json()["id"]
+    assert any(rule["id"] == rule_id for rule in client.get("/rules").json())
+    assert client.post("/rules", json={"op": ">", "threshold": 30, "target_device": "AC-01", "command": "on",
+                                       "sensor_type": "NAO-EXISTE"}).status_code == 400
+    assert client.delete(f"/rules/{rule_id}").status_code == 200
+    assert client.delete(f"/rules/{rule_id}").status_code == 404
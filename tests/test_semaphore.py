@@ -0,0 +1,97 @@
+import pytest
+
+from devices.control_server import DeviceControlServicer
+from devices.semaphore import Semaphore
+from semaphore_timing import SignalTiming, PLAN_COMMAND
+from proto.sensor_data_pb2 import CommandRequest, DeviceEnvelope, GatewayEnvelope
+from semaphore_scheduler import SemaphoreGroupPlan
+
+
+def semaphore():
+    device = Semaphore("SEM-01", "Cruzamento", interval=30)
+    device.sock.close()
+    return device
+
+
+def test_send_command_propagates_invalid_plan():
+    device = semaphore()
+    servicer = DeviceControlServicer(device)
+    request = CommandRequest(command=PLAN_COMMAND)
+    request.params["verde"] = "abc"
+    response = servicer.SendCommand(request, None)
+    assert not response.success
+    assert "Plano inválido" in response.message
+
+
+def test_send_command_propagates_applied_plan():
+    device = semaphore()
+    servicer = DeviceControlServicer(device)
+    timing = SignalTiming(20, 25, 5, offset=10, epoch=1000.0, plan_id="onda-1")
+    request = CommandRequest(command=PLAN_COMMAND)
+    request.params.update(timing.to_params())
+    response = servicer.SendCommand(request, None)
+    assert response.success
+    assert response.message == "Plano onda-1 aplicado"
+    assert device.timing.plan_id == "onda-1"
+
+
+def test_send_command_without_own_result_is_received():
+    servicer = DeviceControlServicer(semaphore())
+    response = servicer.SendCommand(CommandRequest(command="desconhecido"), None)
+    assert response.success
+    assert response.message == "Comando recebido"
+
+
+def test_telemetry_envelope_propagates_response():
+    device = semaphore()
+    envelope = GatewayEnvelope(command_id="7", command=CommandRequest(command=PLAN_COMMAND))
+    device._handle_gateway_envelope(envelope)
+    result = device.telemetry_outbound.get_nowait()
+    assert isinstance(result, DeviceEnvelope)
+    assert result.command_result.command_id == "7"
+    assert not result.command_result.response.success
+
+
+@pytest.mark.parametrize("verde, vermelho, amarelo", [
+    (0, 30, 3), (-10, 30, 3), (30, 30, -1), ("nan", 30, 3), ("inf", 30, 3),
+])
+def test_signal_timing_rejects_invalid_durations(verde, vermelho, amarelo):
+    with pytest.raises(ValueError):
+        SignalTiming(verde, vermelho, amarelo)
+
+
+@pytest.mark.parametrize("offset, epoch", [("nan", 0), (0, "inf")])
+def test_signal_timing_rejects_non_finite_offset_and_epoch(offset, epoch):
+    with pytest.raises(ValueError):
+        SignalTiming(20, 25, 5, offset=offset, epoch=epoch)
+
+
+def test_from_params_reports_missing_phase_as_value_error():
+    with pytest.raises(ValueError, match="amarelo"):
+        SignalTiming.from_params({"verde": "20", "vermelho": "25"})
+
+
+def test_group_plan_rejects_invalid_durations():
+    with pytest.raises(ValueError):
+        SemaphoreGroupPlan("av-1", ["SEM-01"], verde=20, vermelho=-25, amarelo=5)
+    with pytest.raises(ValueError):
+        SemaphoreGroupPlan("av-1", ["SEM-01", "SEM-02"], verde=20, vermelho=25, amarelo=5, travel_time=float("inf"))
+
+
+def test_phase_follows_shared_clock():
+    timing = SignalTiming(20, 25, 5, offset=10, epoch=1000.0)
+    assert timing.phase(1010.0) == ("verde", 20.0)
+    assert timing.phase(1035.0) == ("vermelho", 20.0)
+    assert timing.phase(1057.0) == ("amarelo", 3.0)
+    # Um ciclo depois o estado se repete
+    assert timing.phase(1060.0) == timing.phase(1010.0)
+
+
+def test_invalid_interval_keeps_current_plan():
+    device = semaphore()
+    device.intervals["amarelo"] = 0
+    timing = device.timing
+    response = device.handle_command(CommandRequest(command="15"))
+    assert not response.success
+    assert device.timing is timing
+    assert device.intervals["verde"] == 30
@@ -0,0 +1,74 @@
+from gateway import Gateway
+from proto.sensor_data_pb2 import SensorReading, DeviceType
+from semaphore_scheduler import SemaphoreGroupPlan, SemaphoreScheduler
+from semaphore_timing import PLAN_COMMAND
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, device_id, command, params=None, priority=None):
+        self.calls.append((device_id, command, dict(params or {})))
+        return len(self.calls)
+
+
+def scheduler_with_plan():
+    enqueue = Recorder()
+    scheduler = SemaphoreScheduler(enqueue)
+    plan = SemaphoreGroupPlan("av-1", ["SEM-01", "SEM-02"], verde=20, vermelho=25, amarelo=5, travel_time=10, epoch=1000)
+    scheduler.apply(plan)
+    enqueue.calls.clear()
+    return scheduler, enqueue, plan
+
+
+def test_offsets_follow_travel_time():
+    _, _, plan = scheduler_with_plan()
+    assert [t.offset for t in plan.timings.values()] == [0.0, 10.0]
+    assert {t.epoch for t in plan.timings.values()} == {1000.0}
+
+
+def test_boot_change_resends_plan():
+    scheduler, enqueue, plan = scheduler_with_plan()
+    assert scheduler.observe("SEM-01", 111) is None
+    assert scheduler.observe("SEM-01", 111) is None
+    assert enqueue.calls == []
+
+    scheduler.observe("SEM-01", 222)
+    assert enqueue.calls == [("SEM-01", PLAN_COMMAND, plan.timings["SEM-01"].to_params())]
+
+
+def test_devices_without_plan_are_ignored():
+    scheduler, enqueue, _ = scheduler_with_plan()
+    scheduler.observe("TEMP-01", 1)
+    scheduler.observe("TEMP-01", 2)
+    assert enqueue.calls == []
+    assert "TEMP-01" not in scheduler.boot_ids
+
+
+def test_removed_plan_forgets_boots():
+    scheduler, enqueue, _ = scheduler_with_plan()
+    scheduler.observe("SEM-01", 111)
+    assert scheduler.remove("av-1")
+    scheduler.observe("SEM-01", 222)
+    assert enqueue.calls == []
+    assert scheduler.boot_ids == {}
+
+
+def test_gateway_resends_plan_when_semaphore_reboots():
+    gateway = Gateway(transports=(), verbose=False, history_capacity=0, source_rate=0, ingest_queue_size=0)
+    enqueue = Recorder()
+    gateway.semaphores.enqueue_fn = enqueue
+    gateway.semaphores.apply(SemaphoreGroupPlan("av-1", ["SEM-01"], verde=20, vermelho=25, amarelo=5, epoch=1000))
+
+    def store(boot_id, sequence):
+        reading = SensorReading(sensor_id="SEM-01", sensor_type=DeviceType.SEMAPHORE, timestamp=1700000000 + sequence,
+                                sequence=sequence, boot_id=boot_id)
+        gateway._store_reading(reading, "10.0.0.5:50051", ("10.0.0.5", 40000), "UDP")
+
+    store(111, 1)
+    store(111, 2)
+    enqueue.calls.clear()
+    # Reinício rápido: a sequência recomeça com boot novo e o dispositivo nunca ficou OFFLINE
+    store(222, 1)
+    assert [call[:2] for call in enqueue.calls] == [("SEM-01", PLAN_COMMAND)]
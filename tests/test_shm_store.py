@@ -0,0 +1,131 @@
+import threading
+
+import pytest
+
+from proto.sensor_data_pb2 import SensorReading
+from shm_store import SharedReadingStore, SENSOR_ID_WIDTH
+
+
+def reading(sensor_id, sequence=1, value=1.0, boot_id=1):
+    return SensorReading(sensor_id=sensor_id, value=value, timestamp=1700000000 + sequence,
+                         sequence=sequence, boot_id=boot_id)
+
+
+@pytest.fixture
+def store():
+    store = SharedReadingStore(capacity=64, create=True, lock=threading.Lock())
+    yield store
+    store.close()
+
+
+def attach(store):
+    return SharedReadingStore(name=store.name, lock=store.lock)
+
+
+def test_other_process_finds_sensor_through_shared_index(store):
+    for i in range(50):
+        assert store.write(reading(f"S-{i}", value=i), "10.0.0.1:50051")
+
+    other = attach(store)
+    try:
+        # Cache local vazio: cada busca passa pelo índice compartilhado
+        assert other.index == {}
+        for i in range(50):
+            assert other.get(f"S-{i}")["value"] == i
+        assert other.get("S-desconhecido") is None
+        # O outro processo também insere pelo índice, sem duplicar o slot
+        assert other.write(reading("S-7", sequence=2, value=70), "10.0.0.1:50051")
+        assert store.get("S-7")["value"] == 70
+        assert len(store) == 50
+    finally:
+        other.close()
+
+
+def test_find_slot_does_not_scan_the_column(store, monkeypatch):
+    for i in range(60):
+        store.write(reading(f"S-{i}"), "a")
+    other = attach(store)
+    reads = []
+    original = other._read_string
+    monkeypatch.setattr(other, "_read_string", lambda column, slot: reads.append(slot) or original(column, slot))
+    try:
+        other.get("S-59")
+        assert len(reads) < 10
+    finally:
+        other.close()
+
+
+def test_long_sensor_id_is_found_by_full_name(store):
+    sensor_id = "Ç" * SENSOR_ID_WIDTH
+    assert store.write(reading(sensor_id), "a")
+    other = attach(store)
+    try:
+        assert other.get(sensor_id) is not None
+    finally:
+        other.close()
+
+
+def test_full_store_rejects_new_sensors():
+    store = SharedReadingStore(capacity=2, create=True, lock=threading.Lock())
+    try:
+        assert store.write(reading("A"), "a")
+        assert store.write(reading("B"), "a")
+        assert not store.write(reading("C"), "a")
+        assert store.write(reading("A", sequence=2), "a")
+    finally:
+        store.close()
+
+
+def test_older_reading_is_ignored(store):
+    assert store.write(reading("A", sequence=5, value=5), "a")
+    assert not store.write(reading("A", sequence=4, value=4), "a")
+    # Reinício: boot_id maior vale mesmo com a sequência recomeçando
+    assert store.write(reading("A", sequence=1, value=1, boot_id=2), "a")
+    assert store.get("A")["value"] == 1
+
+
+def test_read_gives_up_on_slot_left_mid_write(store):
+    store.write(reading("A"), "a")
+    store.write(reading("B"), "a")
+    # Escritor morreu entre os dois incrementos da versão
+    store.columns["version"][0] += 1
+    assert store.read_slot(0) is None
+    assert store.torn_reads == 1
+    assert list(store.snapshot()) == ["B"]
+
+
+def test_read_waits_for_write_in_progress(store):
+    store.write(reading("A", value=1), "a")
+    store.columns["version"][0] += 1
+    store.columns["value"][0] = 2
+    timer = threading.Timer(0.01, lambda: store.columns["version"].__setitem__(0, store.columns["version"][0] + 1))
+    timer.start()
+    assert store.read_slot(0)["value"] == 2
+    timer.join()
+    assert store.torn_reads == 0
+
+
+def test_change_ring_keeps_every_accepted_write(store):
+    store.write(reading("A", sequence=1, value=1), "a")
+    store.write(reading("A", sequence=2, value=2), "a")
+    store.write(reading("A", sequence=1, value=9), "a")  # recusada: mais antiga
+    store.write(reading("B", sequence=1, value=3), "a")
+
+    cursor, changes, dropped = store.read_changes(0)
+    assert (cursor, dropped) == (3, 0)
+    assert [(slot, value, sequence) for slot, value, _, sequence, _, _ in changes] == [(0, 1, 1), (0, 2, 2), (1, 3, 1)]
+    assert store.read_changes(cursor) == (3, [], 0)
+
+
+def test_change_ring_reports_overwritten_entries():
+    store = SharedReadingStore(capacity=4, create=True, lock=threading.Lock(), changes_capacity=8)
+    try:
+        for sequence in range(1, 21):
+            store.write(reading("A", sequence=sequence, value=sequence), "a")
+        cursor, changes, dropped = store.read_changes(0)
+        assert cursor == 20
+        # A entrada que o próximo escritor vai ocupar não é entregue
+        assert dropped == 13
+        assert [change[1] for change in changes] == list(range(14, 21))
+    finally:
+        store.close()
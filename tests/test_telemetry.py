@@ -0,0 +1,101 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from devices.semaphore import Semaphore
+from gateway import Gateway
+from liveness import OFFLINE, ONLINE
+from proto.sensor_data_pb2 import CommandResult, CommandResponse
+from semaphore_timing import PLAN_COMMAND
+from telemetry import TelemetrySession
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_session_address_from_grpc_peer(loop):
+    assert TelemetrySession("ipv4:10.0.0.3:54321", loop).address == "10.0.0.3"
+    assert TelemetrySession("ipv6:[::1]:54321", loop).address == "::1"
+
+
+def test_closed_session_answers_pending_commands_with_none(loop):
+    session = TelemetrySession("ipv4:10.0.0.3:1", loop)
+    command_id, future = session.submit_command("verde")
+    session.resolve(CommandResult(command_id="outro", response=CommandResponse(success=True)))
+    assert not future.done()
+    session.close()
+    assert future.result(timeout=1) is None
+    assert session.send_command("verde") is None
+
+
+@pytest.fixture
+def connected():
+    gateway = Gateway(host="127.0.0.1", telemetry_port=free_port(), transports=("telemetry",), verbose=False,
+                      history_capacity=0)
+    gateway.running = True
+    gateway.start_store_workers()
+    gateway.start_telemetry_server()
+
+    device = Semaphore("SEM-01", "Cruzamento", telemetry_stream=True)
+    device.sock.close()
+    device.running = True
+    device.telemetry_gateway_address = ("127.0.0.1", gateway.telemetry_port)
+    stream = threading.Thread(target=device.run_telemetry_stream, daemon=True)
+    stream.start()
+    wait_for(lambda: "SEM-01" in gateway.telemetry_sessions)
+    yield gateway, device
+    # O dispositivo espera 5 s antes de reconectar; a thread é daemon
+    device.running = False
+    gateway.stop()
+
+
+def test_reading_and_commands_share_the_stream(connected):
+    gateway, device = connected
+    wait_for(lambda: gateway.get_sensor_reading("SEM-01") is not None)
+    assert gateway.liveness.status("SEM-01") == ONLINE
+
+    response = gateway.send_command_to_device("SEM-01", "verde")
+    assert response.success
+    assert device.state == "verde"
+
+    # Resposta de falha do dispositivo chega ao gateway pelo mesmo stream
+    response = gateway.send_command_to_device("SEM-01", PLAN_COMMAND, {"verde": "nan"})
+    assert not response.success
+
+
+def test_stream_drop_marks_device_offline(connected):
+    gateway, device = connected
+    gateway.stop_telemetry_server()
+    wait_for(lambda: "SEM-01" not in gateway.telemetry_sessions)
+    assert gateway.liveness.status("SEM-01") == OFFLINE
+
+
+def test_gateway_stops_announcing_telemetry_at_stream_cap(connected):
+    gateway, device = connected
+    assert gateway.build_announcement().telemetry_port == gateway.telemetry_port
+    gateway.telemetry_max_streams = 1
+    assert gateway.build_announcement().telemetry_port == 0
+
+    # Sem porta de telemetria no anúncio o dispositivo cai para o RabbitMQ
+    device._use_gateway(gateway.build_announcement())
+    assert device.telemetry_gateway_address is None